@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Import time of npbcharger entry modules, each measured in a fresh interpreter.
+
+Uses `python -X importtime` and reports the cumulative time of the imported
+module and whether python-can and asyncio got loaded on the way.
+
+Run from repository root: python benchmarks/bench_import_time.py [--runs N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+MODULES = (
+    "npbcharger.commands",
+    "npbcharger.parsers",
+    "npbcharger.cli",
+    "npbcharger.driver",
+    "npbcharger.profiles",
+    "npbcharger.services",
+    "npbcharger.mirror",
+    "can",
+)
+WATCHED = ("can", "asyncio")
+
+
+def measure(module: str) -> Tuple[float, Dict[str, bool]]:
+    """Cumulative import time of module in ms and which watched modules it loaded"""
+    code = f"import sys, {module}; print(','.join(name for name in {WATCHED!r} if name in sys.modules))"
+    env = dict(os.environ, PYTHONPATH=SRC)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env,
+                            capture_output=True, text=True, check=True)
+    cumulative_us = 0
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative_us = int(parts[1])
+    loaded = set(filter(None, result.stdout.strip().split(",")))
+    return cumulative_us / 1000, {name: name in loaded for name in WATCHED}
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module")
+    args = parser.parse_args(argv)
+
+    print(f"{'module':<24}{'median ms':>10}{'min ms':>9}  loads")
+    for module in MODULES:
+        times = []
+        loaded: Dict[str, bool] = {}
+        for _ in range(args.runs):
+            elapsed, loaded = measure(module)
+            times.append(elapsed)
+        names = ", ".join(name for name, present in loaded.items() if present) or "-"
+        print(f"{module:<24}{statistics.median(times):>10.1f}{min(times):>9.1f}  {names}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Per-call overhead of NPB1700Service getters/setters without bus I/O.
+
+Compares the previous decorators (branching on method_type and resolving the
+parser through ParserFactory on every call) with the current ones
+(path chosen at class definition, parser taken from per-service table).
+
+Run from repository root: python benchmarks/bench_service_dispatch.py
+"""
+import logging
+import os
+import sys
+import timeit
+from functools import wraps
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from can import Message  # noqa: E402
+
+from npbcharger.commands import NPB1700Commands  # noqa: E402
+from npbcharger.services import NPB1700Service  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+class NullDriver:
+    """Driver which answers instantly with canned frames"""
+    is_broadcast = False
+
+    def __init__(self):
+        self.replies = {
+            command: Message(data=command.value + bytearray(b'\x60\x09'))
+            for command in NPB1700Commands
+        }
+
+    def read(self, command: NPB1700Commands) -> Message:
+        return self.replies[command]
+
+    def write(self, command: NPB1700Commands, params: bytearray) -> Message:
+        return self.replies[command]
+
+
+def legacy_command_reader(command: NPB1700Commands, method_type: str = 'electric'):
+    """Decorator as it was before the flat dispatch"""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if self.driver.is_broadcast:
+                logger.warning("Skipping read")
+                return None
+            if not self.driver.is_broadcast:
+                if method_type == 'electric':
+                    return self._legacy_read(command)
+                elif method_type == 'bytes':
+                    raw = self._legacy_read(command)
+                    return func(self, raw, *args, **kwargs)
+                elif method_type == 'status':
+                    return self._legacy_read(command)
+                elif method_type == 'config':
+                    return self._legacy_read(command)
+                else:
+                    raise ValueError(f"Unknown read method type: {method_type}")
+        return wrapper
+    return decorator
+
+
+def legacy_command_writer(command: NPB1700Commands, method_type: str = 'electric'):
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(self, value: Any, *args, **kwargs):
+            if method_type == 'electric':
+                return self._legacy_write(command, value)
+            raise ValueError(f"Unknown write method type: {method_type}")
+        return wrapper
+    return decorator
+
+
+class LegacyService(NPB1700Service):
+
+    def _legacy_read(self, command: NPB1700Commands):
+        response = self.driver.read(command)
+        parser = self.parser_factory.get_parser(command)
+        return parser.parse_read(response)
+
+    def _legacy_write(self, command: NPB1700Commands, value: float) -> None:
+        parser = self.parser_factory.get_parser(command)
+        self.driver.write(command, parser.parse_write(value))
+
+    @legacy_command_reader(NPB1700Commands.READ_VOUT)
+    def get_voltage_current(self): pass
+
+    @legacy_command_reader(NPB1700Commands.FAULT_STATUS, method_type='status')
+    def get_fault_status(self): pass
+
+    @legacy_command_writer(NPB1700Commands.CURVE_CC)
+    def set_constant_current_curve(self, current: float) -> None: pass
+
+
+def bench(label: str, call: Callable, number: int) -> float:
+    best = min(timeit.repeat(call, number=number, repeat=5)) / number
+    print(f"  {label:<28}{best * 1e9:10.0f} ns/call")
+    return best
+
+
+def main(number: int = 200000) -> None:
+    services = {"before": LegacyService(NullDriver()), "after": NPB1700Service(NullDriver())}
+    cases = {
+        "get_voltage_current()": lambda service: service.get_voltage_current,
+        "get_fault_status()": lambda service: service.get_fault_status,
+        "set_constant_current_curve()": lambda service: (lambda: service.set_constant_current_curve(20.0)),
+    }
+    for name, make_call in cases.items():
+        print(name)
+        timings = {label: bench(label, make_call(service), number) for label, service in services.items()}
+        print(f"  {'speedup':<28}{timings['before'] / timings['after']:10.2f} x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import math
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from .commands import NPB1700Commands
+from .events import STATUS_COMMANDS
+from .telemetry_log import LogRecord, sample_value
+
+DEFAULT_WINDOW: float = 60.0
+
+Point = Tuple[float, float]
+
+
+class WindowSummary(NamedTuple):
+    """
+    Aggregate of one register of one device over [start, end).
+    Status registers have rollup (OR of raw words, every flag seen in the window)
+    and no minimum, maximum or mean
+    """
+    key: Hashable
+    command: NPB1700Commands
+    start: float
+    end: float
+    count: int
+    minimum: Optional[float]
+    maximum: Optional[float]
+    mean: Optional[float]
+    last: float
+    rollup: Optional[int]
+
+
+WindowCallback = Callable[[WindowSummary], None]
+
+
+class _OpenWindow:
+    __slots__ = ("start", "count", "minimum", "maximum", "total", "last", "rollup")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.count = 0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.total = 0.0
+        self.last = 0.0
+        self.rollup = 0
+
+
+class WindowAggregator:
+    """
+    Streaming min/max/mean/last per device, register and time window (aligned to
+    multiples of window seconds). Only the open window of each series is kept,
+    it is emitted when a sample of a later window arrives or on flush().
+
+    :param on_window: called with every completed WindowSummary
+    """
+
+    def __init__(self, window: float = DEFAULT_WINDOW, on_window: Optional[WindowCallback] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if window <= 0:
+            raise ValueError("Window must be positive")
+        self.window = window
+        self.on_window = on_window
+        self._clock = clock
+        self._open: Dict[Tuple[Hashable, NPB1700Commands], _OpenWindow] = {}
+
+    def update(self, key: Hashable, command: NPB1700Commands, timestamp: float, value: Any) -> List[WindowSummary]:
+        """Add sample, returns windows it completed"""
+        series = (key, command)
+        start = math.floor(timestamp / self.window) * self.window
+        completed: List[WindowSummary] = []
+        current = self._open.get(series)
+        if current is not None and start > current.start:
+            completed.append(self._close(series, current))
+            current = None
+        if current is None:
+            current = self._open[series] = _OpenWindow(start)
+
+        value = sample_value(value)
+        current.count += 1
+        current.last = value
+        if command in STATUS_COMMANDS:
+            current.rollup |= int(value)
+        else:
+            if value < current.minimum:
+                current.minimum = value
+            if value > current.maximum:
+                current.maximum = value
+            current.total += value
+        return completed
+
+    def on_sample(self, key: Hashable, command: NPB1700Commands, value: Any) -> None:
+        """PollingScheduler sample callback, Readings give the timestamp, plain values get clock time"""
+        timestamp = value.received_at if hasattr(value, 'received_at') else self._clock()
+        self.update(key, command, timestamp, value)
+
+    def flush(self, now: Optional[float] = None) -> List[WindowSummary]:
+        """Emit windows which ended before now (all open windows if now is None)"""
+        completed: List[WindowSummary] = []
+        for series, current in list(self._open.items()):
+            if now is None or current.start + self.window <= now:
+                completed.append(self._close(series, current))
+        return completed
+
+    def _close(self, series: Tuple[Hashable, NPB1700Commands], current: _OpenWindow) -> WindowSummary:
+        del self._open[series]
+        key, command = series
+        if command in STATUS_COMMANDS:
+            summary = WindowSummary(key, command, current.start, current.start + self.window, current.count,
+                                    None, None, None, current.last, current.rollup)
+        else:
+            summary = WindowSummary(key, command, current.start, current.start + self.window, current.count,
+                                    current.minimum, current.maximum, current.total / current.count,
+                                    current.last, None)
+        if self.on_window is not None:
+            self.on_window(summary)
+        return summary
+
+
+def aggregate_log(records: Iterable[LogRecord], window: float = DEFAULT_WINDOW) -> Iterable[WindowSummary]:
+    """Window summaries of binary log records (see read_binary_log), keyed by device id"""
+    aggregator = WindowAggregator(window)
+    for record in records:
+        yield from aggregator.update(record.device_id, record.command, record.timestamp, record.value)
+    yield from aggregator.flush()
+
+
+def _triangle_area(a: Point, b: Point, c: Point) -> float:
+    return abs((a[0] - c[0]) * (b[1] - a[1]) - (a[0] - b[0]) * (c[1] - a[1])) / 2
+
+
+def _select(anchor: Point, bucket: Sequence[Point], target: Point) -> Point:
+    """Point of bucket forming the largest triangle with anchor and target"""
+    return max(bucket, key=lambda point: _triangle_area(anchor, point, target))
+
+
+def _average(bucket: Sequence[Point]) -> Point:
+    return (sum(point[0] for point in bucket) / len(bucket), sum(point[1] for point in bucket) / len(bucket))
+
+
+def lttb(points: Sequence[Point], threshold: int) -> List[Point]:
+    """
+    Largest-Triangle-Three-Buckets downsampling of (x, y) points to threshold points,
+    keeps first and last point and the visual extremes in between
+    """
+    if threshold >= len(points) or threshold < 3:
+        return list(points)
+    sampled = [points[0]]
+    bucket_size = (len(points) - 2) / (threshold - 2)
+    for index in range(threshold - 2):
+        start = int(index * bucket_size) + 1
+        end = int((index + 1) * bucket_size) + 1
+        next_end = min(int((index + 2) * bucket_size) + 1, len(points))
+        next_bucket = points[end:next_end] or points[-1:]
+        sampled.append(_select(sampled[-1], points[start:end], _average(next_bucket)))
+    sampled.append(points[-1])
+    return sampled
+
+
+class StreamingLTTB:
+    """
+    LTTB over an unbounded stream: one point out of every bucket_size points,
+    holding at most two buckets in memory
+    """
+
+    def __init__(self, bucket_size: int):
+        if bucket_size < 1:
+            raise ValueError("Bucket size must be positive")
+        self.bucket_size = bucket_size
+        self._anchor: Optional[Point] = None
+        self._bucket: List[Point] = []
+        self._next: List[Point] = []
+
+    def push(self, x: float, y: float) -> List[Point]:
+        """Add point, returns points selected for output"""
+        point = (x, y)
+        if self._anchor is None:
+            self._anchor = point
+            return [point]
+        if len(self._bucket) < self.bucket_size:
+            self._bucket.append(point)
+            return []
+        self._next.append(point)
+        if len(self._next) < self.bucket_size:
+            return []
+        selected = _select(self._anchor, self._bucket, _average(self._next))
+        self._anchor = selected
+        self._bucket, self._next = self._next, []
+        return [selected]
+
+    def flush(self) -> List[Point]:
+        """Select from buffered points and end with the last one"""
+        selected: List[Point] = []
+        if self._next:
+            selected.append(_select(self._anchor, self._bucket, _average(self._next)))
+            selected.append(self._next[-1])
+        elif self._bucket:
+            selected.append(self._bucket[-1])
+        self._anchor = None
+        self._bucket, self._next = [], []
+        return selected
@@ -0,0 +1,316 @@
+import math
+import time
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Sequence
+from .commands import NPB1700Commands
+from .parsers.fault_status import FaultStatus
+
+# Internal temperature warned about ahead of time, degC. Set it below the
+# protection point of the unit (FaultStatus.OTP / HI_TEMP) with some margin
+DEFAULT_TEMPERATURE_LIMIT: float = 80.0
+# Warn when the trend reaches the limit within this many seconds
+DEFAULT_HORIZON: float = 300.0
+# Time constants of the temperature baseline and of slope smoothing, seconds
+DEFAULT_BASELINE_TAU: float = 600.0
+DEFAULT_SLOPE_TAU: float = 60.0
+# Slopes below this (degC/s) are noise, no trend warning
+DEFAULT_MIN_SLOPE: float = 0.5 / 60
+# CUSUM of temperature above baseline: allowance (degC) and alarm level (degC * s)
+DEFAULT_CUSUM_ALLOWANCE: float = 2.0
+DEFAULT_CUSUM_THRESHOLD: float = 120.0
+# Active warnings clear only below these (hysteresis against a signal hovering at the threshold):
+# limit lowered by degC, slope below degC/s, CUSUM below degC * s
+DEFAULT_LIMIT_HYSTERESIS: float = 2.0
+DEFAULT_MIN_SLOPE_CLEAR: float = 0.25 / 60
+DEFAULT_CUSUM_CLEAR: float = 60.0
+# Rising output current (A/s) explains heating, CUSUM is held meanwhile
+DEFAULT_CURRENT_TOLERANCE: float = 0.05
+# Longer pauses between samples restart the estimate, seconds
+DEFAULT_MAX_GAP: float = 30.0
+
+# Faults the detector should precede
+THERMAL_FAULTS: int = FaultStatus.OTP.value | FaultStatus.HI_TEMP.value
+
+TREND = "trend"
+DRIFT = "drift"
+
+
+class ThermalWarning(NamedTuple):
+    """
+    Start of an early warning.
+    kind is TREND (temperature heads for the limit within the horizon) or
+    DRIFT (temperature stays above its baseline without rising load)
+    """
+    key: Hashable
+    kind: str
+    timestamp: float
+    temperature: float
+    # degC per minute
+    slope: float
+    # Seconds until the limit at current slope, None when not rising
+    time_to_limit: Optional[float]
+
+
+WarningCallback = Callable[[ThermalWarning], None]
+
+
+class _Scalar:
+    """Operations of the detector step on floats, numpy provides the same on arrays"""
+    exp = staticmethod(math.exp)
+    maximum = staticmethod(max)
+
+    @staticmethod
+    def where(condition, if_true, if_false):
+        return if_true if condition else if_false
+
+
+class _ThermalState:
+    __slots__ = ("time", "temperature", "baseline", "slope", "current", "step_current", "current_slope",
+                 "cusum", "trend", "drift")
+
+    def __init__(self):
+        self.time: Optional[float] = None
+        self.temperature = 0.0
+        self.baseline = 0.0
+        self.slope = 0.0
+        # Latest current sample and the one used by the last step
+        self.current: Optional[float] = None
+        self.step_current = 0.0
+        self.current_slope = 0.0
+        self.cusum = 0.0
+        self.trend = False
+        self.drift = False
+
+
+class ThermalDetector:
+    """
+    Early warning of charger overheating from READ_TEMPERATURE_1 and READ_IOUT streams,
+    before the charger's own protection trips. Constant state per device:
+    EWMA baseline and slope of temperature (irregular sampling aware),
+    EWMA slope of current and one-sided CUSUM of temperature above baseline.
+    Warnings are edge triggered: one ThermalWarning when a condition starts.
+    A started condition ends only past its clear threshold (limit_hysteresis,
+    min_slope_clear, cusum_clear), so noise around the warning threshold doesn't re-trigger it.
+
+    Use on_sample() as PollingScheduler callback or feed update() directly.
+    """
+
+    def __init__(self, limit: float = DEFAULT_TEMPERATURE_LIMIT, horizon: float = DEFAULT_HORIZON,
+                 baseline_tau: float = DEFAULT_BASELINE_TAU, slope_tau: float = DEFAULT_SLOPE_TAU,
+                 min_slope: float = DEFAULT_MIN_SLOPE,
+                 cusum_allowance: float = DEFAULT_CUSUM_ALLOWANCE,
+                 cusum_threshold: float = DEFAULT_CUSUM_THRESHOLD,
+                 limit_hysteresis: float = DEFAULT_LIMIT_HYSTERESIS,
+                 min_slope_clear: float = DEFAULT_MIN_SLOPE_CLEAR,
+                 cusum_clear: float = DEFAULT_CUSUM_CLEAR,
+                 current_tolerance: float = DEFAULT_CURRENT_TOLERANCE,
+                 max_gap: float = DEFAULT_MAX_GAP,
+                 on_warning: Optional[WarningCallback] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.limit = limit
+        self.horizon = horizon
+        self.baseline_tau = baseline_tau
+        self.slope_tau = slope_tau
+        self.min_slope = min_slope
+        self.cusum_allowance = cusum_allowance
+        self.cusum_threshold = cusum_threshold
+        self.limit_hysteresis = limit_hysteresis
+        self.min_slope_clear = min_slope_clear
+        self.cusum_clear = cusum_clear
+        self.current_tolerance = current_tolerance
+        self.max_gap = max_gap
+        self.on_warning = on_warning
+        self._clock = clock
+        self._devices: Dict[Hashable, _ThermalState] = {}
+
+    def update(self, key: Hashable, timestamp: float, temperature: Optional[float] = None,
+               current: Optional[float] = None) -> List[ThermalWarning]:
+        """Add temperature and/or current sample, returns warnings which started"""
+        state = self._devices.get(key)
+        if state is None:
+            state = self._devices[key] = _ThermalState()
+        if current is not None:
+            # Held until the next temperature sample advances the estimate
+            state.current = current
+        if temperature is None:
+            return []
+
+        if state.time is None:
+            self._restart(state, timestamp, temperature)
+            return []
+        elapsed = timestamp - state.time
+        if elapsed <= 0:
+            return []
+        if elapsed > self.max_gap:
+            self._restart(state, timestamp, temperature)
+            return []
+
+        current = state.step_current if state.current is None else state.current
+        (state.baseline, state.slope, state.current_slope, state.cusum, trend, drift) = self._step(
+            _Scalar, elapsed, temperature, state.temperature, state.baseline, state.slope,
+            current, state.step_current, state.current_slope, state.cusum, state.trend, state.drift)
+        state.time = timestamp
+        state.temperature = temperature
+        state.step_current = current
+
+        warnings: List[ThermalWarning] = []
+        if trend and not state.trend:
+            warnings.append(self._warning(key, TREND, state))
+        if drift and not state.drift:
+            warnings.append(self._warning(key, DRIFT, state))
+        state.trend = trend
+        state.drift = drift
+        if self.on_warning is not None:
+            for warning in warnings:
+                self.on_warning(warning)
+        return warnings
+
+    def on_sample(self, key: Hashable, command: NPB1700Commands, value: Any) -> None:
+        """PollingScheduler sample callback, Readings give the timestamp, plain values get clock time"""
+        if hasattr(value, 'received_at'):
+            timestamp, value = value.received_at, value.value
+        else:
+            timestamp = self._clock()
+        if command == NPB1700Commands.READ_TEMPERATURE_1:
+            self.update(key, timestamp, temperature=value)
+        elif command == NPB1700Commands.READ_IOUT:
+            self.update(key, timestamp, current=value)
+
+    def state(self, key: Hashable) -> Dict[str, Any]:
+        """Current estimate of device: baseline, slope (degC/min), time_to_limit, active warnings"""
+        state = self._devices[key]
+        return {
+            "temperature": state.temperature,
+            "baseline": state.baseline,
+            "slope": state.slope * 60,
+            "time_to_limit": self._time_to_limit(state.temperature, state.slope),
+            "cusum": state.cusum,
+            "warnings": [kind for kind, active in ((TREND, state.trend), (DRIFT, state.drift)) if active],
+        }
+
+    def remove(self, key: Hashable) -> None:
+        self._devices.pop(key, None)
+
+    def _restart(self, state: _ThermalState, timestamp: float, temperature: float) -> None:
+        state.time = timestamp
+        state.temperature = state.baseline = temperature
+        state.slope = state.current_slope = state.cusum = 0.0
+        state.step_current = state.current if state.current is not None else 0.0
+        state.trend = state.drift = False
+
+    def _time_to_limit(self, temperature: float, slope: float) -> Optional[float]:
+        if slope <= 0:
+            return None
+        return max(0.0, (self.limit - temperature) / slope)
+
+    def _warning(self, key: Hashable, kind: str, state: _ThermalState) -> ThermalWarning:
+        return ThermalWarning(key, kind, state.time, state.temperature, state.slope * 60,
+                              self._time_to_limit(state.temperature, state.slope))
+
+    def _step(self, xp, elapsed, temperature, previous, baseline, slope, current, previous_current,
+              current_slope, cusum, trend, drift):
+        """
+        One detector step over elapsed seconds, on floats (xp=_Scalar) or arrays of devices (xp=numpy).
+        trend, drift are the conditions so far, active ones are held until their clear thresholds.
+        Returns new baseline, slope, current slope, cusum and trend, drift conditions
+        """
+        slope_weight = 1 - xp.exp(-elapsed / self.slope_tau)
+        slope = slope + slope_weight * ((temperature - previous) / elapsed - slope)
+        current_slope = current_slope + slope_weight * ((current - previous_current) / elapsed - current_slope)
+        excess = (temperature - baseline - self.cusum_allowance) * elapsed
+        cusum = xp.where(current_slope > self.current_tolerance, cusum, xp.maximum(cusum + excess, 0.0))
+        baseline = baseline + (1 - xp.exp(-elapsed / self.baseline_tau)) * (temperature - baseline)
+        limit = xp.where(trend, self.limit - self.limit_hysteresis, self.limit)
+        min_slope = xp.where(trend, self.min_slope_clear, self.min_slope)
+        trend = (temperature >= limit) | ((slope > min_slope) & (limit - temperature < slope * self.horizon))
+        drift = cusum > xp.where(drift, self.cusum_clear, self.cusum_threshold)
+        return baseline, slope, current_slope, cusum, trend, drift
+
+
+def backtest(timestamps: Sequence[float], temperatures: Sequence[Sequence[float]],
+             currents: Optional[Sequence[Sequence[float]]] = None,
+             faults: Optional[Sequence[Sequence[int]]] = None,
+             detector: Optional[ThermalDetector] = None) -> List[Dict[str, Any]]:
+    """
+    Replay recorded logs of several devices through detector settings (defaults if None).
+    temperatures, currents and raw FAULT_STATUS words are rows per timestamp with one column
+    per device. With numpy installed all devices advance together as arrays.
+    Returns per device: number of warnings, time of first warning and of first thermal
+    fault (OTP, HI_TEMP) and lead time of the first warning before that fault
+    """
+    detector = detector or ThermalDetector()
+    if not timestamps:
+        return []
+    devices = len(temperatures[0])
+    currents = currents if currents is not None else [[0.0] * devices for _ in timestamps]
+    if not len(timestamps) == len(temperatures) == len(currents):
+        raise ValueError("Timestamps, temperatures and currents must have the same length")
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    if numpy is None:
+        warnings = _replay_python(detector, timestamps, temperatures, currents, devices)
+    else:
+        warnings = _replay_numpy(numpy, detector, timestamps, temperatures, currents, devices)
+
+    results: List[Dict[str, Any]] = []
+    for device in range(devices):
+        first_fault = None
+        if faults is not None:
+            first_fault = next((timestamp for timestamp, row in zip(timestamps, faults)
+                                if int(row[device]) & THERMAL_FAULTS), None)
+        times = warnings[device]
+        before_fault = [t for t in times if first_fault is None or t <= first_fault]
+        results.append({
+            "warnings": len(times),
+            "first_warning": times[0] if times else None,
+            "first_fault": first_fault,
+            "lead_time": first_fault - before_fault[0] if first_fault is not None and before_fault else None,
+        })
+    return results
+
+
+def _replay_python(detector: ThermalDetector, timestamps, temperatures, currents, devices) -> List[List[float]]:
+    replay = ThermalDetector(**_settings(detector))
+    warnings: List[List[float]] = [[] for _ in range(devices)]
+    for timestamp, row, current_row in zip(timestamps, temperatures, currents):
+        for device in range(devices):
+            replay.update(device, timestamp, current=current_row[device])
+            for warning in replay.update(device, timestamp, temperature=row[device]):
+                warnings[device].append(warning.timestamp)
+    return warnings
+
+
+def _replay_numpy(numpy, detector: ThermalDetector, timestamps, temperatures, currents, devices) -> List[List[float]]:
+    temperatures = numpy.asarray(temperatures, dtype=float)
+    currents = numpy.asarray(currents, dtype=float)
+    warnings: List[List[float]] = [[] for _ in range(devices)]
+    previous_time = None
+    for index, timestamp in enumerate(timestamps):
+        temperature, current = temperatures[index], currents[index]
+        elapsed = None if previous_time is None else timestamp - previous_time
+        if elapsed is not None and elapsed <= 0:
+            continue
+        if elapsed is None or elapsed > detector.max_gap:
+            baseline = previous = temperature
+            slope = current_slope = cusum = numpy.zeros(devices)
+            step_current = current
+            active = numpy.zeros(devices, dtype=bool), numpy.zeros(devices, dtype=bool)
+            previous_time = timestamp
+            continue
+        baseline, slope, current_slope, cusum, trend, drift = detector._step(
+            numpy, elapsed, temperature, previous, baseline, slope, current, step_current, current_slope, cusum,
+            *active)
+        # Both kinds of one device at one time count as separate warnings, as in streaming mode
+        for started in (trend & ~active[0], drift & ~active[1]):
+            for device in numpy.flatnonzero(started):
+                warnings[device].append(timestamp)
+        active = trend, drift
+        previous, step_current, previous_time = temperature, current, timestamp
+    return warnings
+
+
+def _settings(detector: ThermalDetector) -> Dict[str, Any]:
+    return {name: getattr(detector, name) for name in (
+        "limit", "horizon", "baseline_tau", "slope_tau", "min_slope", "cusum_allowance",
+        "cusum_threshold", "limit_hysteresis", "min_slope_clear", "cusum_clear", "current_tolerance", "max_gap")}
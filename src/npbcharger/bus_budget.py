@@ -0,0 +1,164 @@
+import time
+from collections import deque
+from typing import Callable, Dict, Hashable, Iterable, Mapping, Optional
+from .commands import COMMAND_DATA_LEN, COMMAND_LEN, NPB1700Commands
+from .driver import DEFAULT_BITRATE, MIN_REQUEST_PERIOD
+from .exceptions import NPBBusOverloadError
+
+# Extended (29-bit id) data frame without payload: SOF, id, SRR, IDE, RTR,
+# reserved bits, DLC, CRC with delimiter, ACK, EOF and interframe space
+EXTENDED_FRAME_OVERHEAD_BITS: int = 67
+# Part of the frame header which is subject to bit stuffing (SOF .. CRC)
+EXTENDED_STUFFED_HEADER_BITS: int = 54
+
+# Share of the bus which polling plans may use by default
+DEFAULT_TARGET_LOAD: float = 0.5
+
+# device -> {command: reads per second}
+PollingPlan = Mapping[Hashable, Mapping[NPB1700Commands, float]]
+
+
+def frame_bits(dlc: int, stuffing: bool = True) -> int:
+    """Length of extended CAN data frame on the wire, worst case stuffing by default"""
+    bits = EXTENDED_FRAME_OVERHEAD_BITS + 8 * dlc
+    if stuffing:
+        bits += (EXTENDED_STUFFED_HEADER_BITS + 8 * dlc - 1) // 4
+    return bits
+
+
+def request_dlc(command: NPB1700Commands, write: bool = False) -> int:
+    """DLC of controller -> charger frame"""
+    if write:
+        return COMMAND_LEN + COMMAND_DATA_LEN[command]
+    return COMMAND_LEN
+
+
+def reply_dlc(command: NPB1700Commands) -> int:
+    """DLC of charger -> controller reply to a read"""
+    return COMMAND_LEN + COMMAND_DATA_LEN[command]
+
+
+def transaction_bits(command: NPB1700Commands, write: bool = False) -> int:
+    """Bus bits of one read (request + reply) or one write (request only)"""
+    if write:
+        return frame_bits(request_dlc(command, write=True))
+    return frame_bits(request_dlc(command)) + frame_bits(reply_dlc(command))
+
+
+class BusBudget:
+    """
+    Admission control for polling plans and live bus load accounting.
+
+    :param bitrate: CAN bitrate, bits per second
+    :param target_load: share of bitrate which admitted plans may occupy (0..1]
+    :param window: length of sliding window for live utilization, seconds
+    """
+
+    def __init__(self, bitrate: int = DEFAULT_BITRATE, target_load: float = DEFAULT_TARGET_LOAD,
+                 window: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        if not 0 < target_load <= 1:
+            raise ValueError("Target load must be in (0, 1]")
+        self.bitrate = bitrate
+        self.target_load = target_load
+        self.window = window
+        self._clock = clock
+        self._traffic = deque()
+        self._traffic_bits: int = 0
+
+    @property
+    def capacity(self) -> float:
+        """Bits per second available to admitted plans"""
+        return self.bitrate * self.target_load
+
+    # Planning
+    def cycle_bits(self, commands: Iterable[NPB1700Commands]) -> int:
+        """Bus bits needed to read every command once"""
+        return sum(transaction_bits(command) for command in commands)
+
+    def utilization(self, plan: PollingPlan) -> float:
+        """Share of bus bitrate a polling plan consumes"""
+        bits_per_second = sum(
+            rate * transaction_bits(command)
+            for rates in plan.values()
+            for command, rate in rates.items()
+        )
+        return bits_per_second / self.bitrate
+
+    def device_overloads(self, plan: PollingPlan) -> Dict[Hashable, float]:
+        """Devices asked for more requests than MIN_REQUEST_PERIOD allows, with their request rate"""
+        max_rate = 1 / MIN_REQUEST_PERIOD
+        overloads = {}
+        for device, rates in plan.items():
+            total = sum(rates.values())
+            if total > max_rate + 1e-9:
+                overloads[device] = total
+        return overloads
+
+    def check(self, plan: PollingPlan) -> None:
+        """Raise NPBBusOverloadError if plan does not fit the bus or device request period"""
+        overloads = self.device_overloads(plan)
+        if overloads:
+            names = ", ".join(f"{device!r}: {rate:.1f}/s" for device, rate in overloads.items())
+            raise NPBBusOverloadError(
+                f"Request rate exceeds {1 / MIN_REQUEST_PERIOD:.0f}/s per device ({names})")
+        load = self.utilization(plan)
+        if load > self.target_load + 1e-9:
+            raise NPBBusOverloadError(
+                f"Plan needs {load:.1%} of the bus, target load is {self.target_load:.1%}")
+
+    def scale(self, plan: PollingPlan) -> Dict[Hashable, Dict[NPB1700Commands, float]]:
+        """Proportionally slow down plan so that it fits both the bus and per-device limits"""
+        max_rate = 1 / MIN_REQUEST_PERIOD
+        scaled: Dict[Hashable, Dict[NPB1700Commands, float]] = {}
+        for device, rates in plan.items():
+            total = sum(rates.values())
+            factor = min(1.0, max_rate / total) if total else 1.0
+            scaled[device] = {command: rate * factor for command, rate in rates.items()}
+
+        load = self.utilization(scaled)
+        if load > self.target_load:
+            factor = self.target_load / load
+            for rates in scaled.values():
+                for command in rates:
+                    rates[command] *= factor
+        return scaled
+
+    def admit(self, plan: PollingPlan, allow_scaling: bool = True) -> Dict[Hashable, Dict[NPB1700Commands, float]]:
+        """Return plan which may be run: unchanged, scaled down, or raise if scaling is not allowed"""
+        if not allow_scaling:
+            self.check(plan)
+            return {device: dict(rates) for device, rates in plan.items()}
+        return self.scale(plan)
+
+    # Live accounting
+    def record(self, msg, timestamp: Optional[float] = None) -> None:
+        """Account frame seen on the bus (sent or received)"""
+        self.charge(frame_bits(msg.dlc), timestamp)
+
+    def charge(self, bits: int, timestamp: Optional[float] = None) -> None:
+        """Account traffic not seen as frames, e.g. reads planned by RegisterMirror.refresh"""
+        if timestamp is None:
+            timestamp = self._clock()
+        self._traffic.append((timestamp, bits))
+        self._traffic_bits += bits
+        self._expire(timestamp)
+
+    def available_bits(self, now: Optional[float] = None) -> float:
+        """Bits which still fit into target load during the current window"""
+        if now is None:
+            now = self._clock()
+        self._expire(now)
+        return self.bitrate * self.target_load * self.window - self._traffic_bits
+
+    def live_utilization(self, now: Optional[float] = None) -> float:
+        """Share of bitrate used by recorded frames during the last window"""
+        if now is None:
+            now = self._clock()
+        self._expire(now)
+        return self._traffic_bits / (self.bitrate * self.window)
+
+    def _expire(self, now: float) -> None:
+        horizon = now - self.window
+        while self._traffic and self._traffic[0][0] <= horizon:
+            _, bits = self._traffic.popleft()
+            self._traffic_bits -= bits
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Command line access to NPB-1700 chargers.
+
+Imports are kept to the driver and command table until a reply has to be decoded,
+so short-lived health checks reach the bus without loading services or parsers.
+Fleet subcommands talk to many addresses per channel through pipelined reads,
+channels are served in parallel and records are streamed as NDJSON or CSV.
+"""
+import argparse
+import os
+import sys
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence
+
+# Controller -> charger id without address byte
+REQUEST_ID_BASE: int = 0x000C0100
+DEFAULT_INTERFACE: str = "slcan"
+DEFAULT_CHANNEL: str = "COM3@1000000" if os.name == "nt" else "/dev/ttyACM0"
+# Addresses settable by NPB-1700 address pins
+DISCOVERY_ADDRESSES: str = "0-7"
+TELEMETRY_REGISTERS: str = "READ_VOUT,READ_IOUT,READ_TEMPERATURE_1,CHG_STATUS,FAULT_STATUS"
+# Records waiting for output; channel workers block when it is full
+OUTPUT_QUEUE_SIZE: int = 1024
+
+Record = Dict[str, Any]
+Emit = Callable[[Record], None]
+
+
+# Argument types
+def _address(value: str) -> int:
+    address = int(value, 0)
+    if not 0 <= address <= 0xFF:
+        raise argparse.ArgumentTypeError("Address must be in 0..255 (0xFF is broadcast)")
+    return address
+
+
+def _charger_address(value: str) -> int:
+    """Single address which gets replies, broadcast can't answer reads"""
+    address = _address(value)
+    if address == 0xFF:
+        raise argparse.ArgumentTypeError("Address must name a charger, not broadcast")
+    return address
+
+
+def parse_addresses(spec: str) -> List[int]:
+    """Address list like "3", "0-7" or "1,3,5-6", order kept and duplicates removed"""
+    addresses: List[int] = []
+    try:
+        for part in filter(None, (item.strip() for item in spec.split(","))):
+            if "-" in part:
+                first, last = (_address(bound) for bound in part.split("-", 1))
+                addresses.extend(range(first, last + 1))
+            else:
+                addresses.append(_address(part))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid address list '{spec}'") from None
+    if not addresses or 0xFF in addresses:
+        raise argparse.ArgumentTypeError("Address list must name chargers, not broadcast")
+    return list(dict.fromkeys(addresses))
+
+
+def _command(name: str):
+    from .commands import NPB1700Commands
+    try:
+        return NPB1700Commands[name.strip().upper()]
+    except KeyError:
+        raise argparse.ArgumentTypeError(f"Unknown command '{name}'") from None
+
+
+def _commands(spec: str) -> list:
+    return [_command(name) for name in spec.split(",") if name.strip()]
+
+
+# Value conversion
+def _flag_names(flag) -> List[str]:
+    return [member.name for member in type(flag) if member.value and member in flag]
+
+
+def _plain(value: Any) -> Any:
+    """JSON compatible copy of decoded value"""
+    from enum import Enum, Flag
+    if isinstance(value, Mapping):
+        return {str(key): _plain(item) for key, item in value.items()}
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    if isinstance(value, (set, frozenset)):
+        return sorted(_plain(item) for item in value)
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, Flag):
+        return "|".join(_flag_names(value))
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _cell(value: Any) -> Any:
+    """CSV cell of decoded value: raw word for status/config registers"""
+    if isinstance(value, Mapping):
+        return value.get("raw_value", "")
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    if isinstance(value, (list, tuple)):
+        return "|".join(str(item) for item in value)
+    return "" if value is None else value
+
+
+class Decoder:
+    """Decodes replies with default parsers, registers without one are given as payload hex"""
+
+    def __init__(self):
+        from .parsers import ParserFactory
+        self._factory = ParserFactory
+        self._parsers: Dict[Any, Any] = {}
+
+    def __call__(self, command, msg) -> Any:
+        from .commands import COMMAND_DATA_LEN, COMMAND_LEN
+        if command not in self._parsers:
+            try:
+                self._parsers[command] = self._factory.get_parser(command)
+            except ValueError:
+                self._parsers[command] = None
+        parser = self._parsers[command]
+        if parser is None:
+            return bytes(msg.data[COMMAND_LEN:COMMAND_LEN + COMMAND_DATA_LEN[command]])
+        value = parser.parse_read(msg)
+        if isinstance(value, Mapping) and "active_states" in value:
+            # Status registers: names of active flags instead of full metadata
+            return {
+                "raw_value": value["raw_value"],
+                "active": [state["state"].name for state in value["active_states"]],
+                "has_warnings": value["has_warnings"],
+                "has_critical": value["has_critical"],
+            }
+        return value
+
+
+# Output
+class RecordWriter:
+    """Writes records one per line (NDJSON) or row (CSV with given columns), flushing each"""
+
+    def __init__(self, stream, output_format: str, columns: Sequence[str]):
+        self.stream = stream
+        self.output_format = output_format
+        self._csv = None
+        if output_format == "csv":
+            import csv
+            self._csv = csv.DictWriter(stream, fieldnames=list(columns), extrasaction="ignore")
+            self._csv.writeheader()
+
+    def write(self, record: Record) -> None:
+        if self._csv is not None:
+            self._csv.writerow({key: _cell(value) for key, value in record.items()})
+        else:
+            import json
+            self.stream.write(json.dumps(_plain(record), separators=(",", ":")) + "\n")
+        self.stream.flush()
+
+
+def _rounds(count: int, interval: float, stop) -> Iterator[int]:
+    """Round numbers paced by interval, forever when count is 0"""
+    from time import monotonic, sleep
+    number = 0
+    next_start = monotonic()
+    while not stop.is_set() and (count == 0 or number < count):
+        yield number
+        number += 1
+        next_start += interval
+        sleep(max(0.0, next_start - monotonic()))
+
+
+# Subcommand workers, one call per channel in its own thread
+def _poll_worker(driver, channel: str, args: argparse.Namespace, emit: Emit, stop) -> None:
+    from time import time
+    decode = Decoder()
+    device_ids = [REQUEST_ID_BASE | address for address in args.addresses]
+    for _ in _rounds(args.count, args.interval, stop):
+        replies = driver.read_fleet(device_ids, args.registers)
+        now = time()
+        for address, device_id in zip(args.addresses, device_ids):
+            device_replies = replies[device_id]
+            record: Record = {"time": now, "channel": channel, "address": address,
+                              "online": bool(device_replies)}
+            for command, msg in device_replies.items():
+                record[command.name] = decode(command, msg)
+            emit(record)
+
+
+def _discover_worker(driver, channel: str, args: argparse.Namespace, emit: Emit, stop) -> None:
+    from .commands import NPB1700Commands
+    from .parsers.factories.base_factory import normalize_model_id
+    commands = [NPB1700Commands.MFR_MODEL_B0B5, NPB1700Commands.MFR_MODEL_B6B11]
+    device_ids = [REQUEST_ID_BASE | address for address in args.addresses]
+    replies = driver.read_fleet(device_ids, commands)
+    for address, device_id in zip(args.addresses, device_ids):
+        device_replies = replies[device_id]
+        if not device_replies:
+            continue
+        raw = b"".join(bytes(device_replies[command].data[2:8]) for command in commands
+                       if command in device_replies)
+        emit({"channel": channel, "address": address,
+              "model": normalize_model_id(raw.decode("ascii", errors="replace"))})
+
+
+def _apply_worker(driver, channel: str, args: argparse.Namespace, emit: Emit, stop) -> None:
+    from .exceptions import NPBCommunicationError, NPBVerificationError
+    from .services import NPB1700Service
+    for address in args.addresses:
+        if stop.is_set():
+            return
+        record: Record = {"channel": channel, "address": address}
+        try:
+            service = NPB1700Service(driver.sibling(REQUEST_ID_BASE | address))
+            written = service.apply_profile(args.profile, verify=not args.no_verify)
+        except (NPBCommunicationError, NPBVerificationError, ValueError) as e:
+            record.update(status="error", error=str(e))
+        else:
+            record.update(status="ok", written=[command.name for command in written])
+        emit(record)
+
+
+def _watch_worker(driver, channel: str, args: argparse.Namespace, emit: Emit, stop) -> None:
+    from time import time
+    from .events import STATUS_COMMANDS, StatusChangeTracker
+    from .parsers import ParserFactory
+    parsers = {command: ParserFactory.get_parser(command) for command in STATUS_COMMANDS}
+    device_ids = [REQUEST_ID_BASE | address for address in args.addresses]
+    trackers = {device_id: StatusChangeTracker() for device_id in device_ids}
+    for _ in _rounds(args.count, args.interval, stop):
+        replies = driver.read_fleet(device_ids, STATUS_COMMANDS)
+        now = time()
+        for address, device_id in zip(args.addresses, device_ids):
+            for command, msg in replies[device_id].items():
+                word = int.from_bytes(msg.data[2:4], byteorder="little")
+                for event in trackers[device_id].update(command, word, parsers[command]):
+                    emit({"time": now, "channel": channel, "address": address,
+                          "register": command.name, "state": event.state.name,
+                          "active": event.active,
+                          "severity": event.severity.value if event.severity else None,
+                          "name": event.name, "raw_value": event.raw_value})
+
+
+def _run_fleet(args: argparse.Namespace, worker, columns: Sequence[str]) -> int:
+    """Run worker on every channel in parallel and stream records from a bounded queue"""
+    import queue
+    import threading
+    from .driver import NPB1700
+
+    records: "queue.Queue" = queue.Queue(maxsize=OUTPUT_QUEUE_SIZE)
+    stop = threading.Event()
+    done = object()
+
+    def serve(channel: str) -> None:
+        try:
+            with NPB1700(channel=channel, interface=args.interface, tty_baudrate=args.tty_baudrate,
+                         device_id=REQUEST_ID_BASE | args.addresses[0]) as driver:
+                worker(driver, channel, args, records.put, stop)
+        except Exception as e:  # Reported once all channels finished
+            records.put(RuntimeError(f"{channel}: {e}"))
+        finally:
+            records.put(done)
+
+    threads = [threading.Thread(target=serve, args=(channel,), daemon=True) for channel in args.channels]
+    for thread in threads:
+        thread.start()
+
+    writer = RecordWriter(sys.stdout, args.format, columns)
+    status = 0
+    remaining = len(threads)
+    try:
+        while remaining:
+            item = records.get()
+            if item is done:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                print(f"npbcharger: {item}", file=sys.stderr)
+                status = 1
+            else:
+                writer.write(item)
+    except KeyboardInterrupt:
+        stop.set()
+        # Let workers finish their round and shut their buses down
+        while remaining:
+            if records.get() is done:
+                remaining -= 1
+    return status
+
+
+# Subcommand handlers
+def _read(args: argparse.Namespace) -> int:
+    from .commands import COMMAND_LEN
+    from .driver import NPB1700
+
+    with NPB1700(channel=args.channels[0], interface=args.interface, tty_baudrate=args.tty_baudrate,
+                 device_id=REQUEST_ID_BASE | args.address) as driver:
+        reply = driver.read(args.register)
+
+    if args.raw:
+        print(bytes(reply.data[COMMAND_LEN:]).hex())
+        return 0
+    # Parsers are only needed once the reply is here
+    from .parsers import ParserFactory
+    print(ParserFactory.get_parser(args.register).parse_read(reply))
+    return 0
+
+
+def _serve(args: argparse.Namespace) -> int:
+    from .driver import NPB1700
+    from .rpc import DEFAULT_SOCKET, serve
+
+    with NPB1700(channel=args.channels[0], interface=args.interface, tty_baudrate=args.tty_baudrate,
+                 device_id=REQUEST_ID_BASE) as driver:
+        serve(driver, args.socket or DEFAULT_SOCKET, 0o660 if args.group else 0o600)
+    return 0
+
+
+def _poll(args: argparse.Namespace) -> int:
+    columns = ["time", "channel", "address", "online"] + [command.name for command in args.registers]
+    return _run_fleet(args, _poll_worker, columns)
+
+
+def _snapshot(args: argparse.Namespace) -> int:
+    from .commands import COMMAND_DATA_LEN
+    args.registers = list(COMMAND_DATA_LEN)
+    args.count, args.interval = 1, 0.0
+    return _poll(args)
+
+
+def _discover(args: argparse.Namespace) -> int:
+    return _run_fleet(args, _discover_worker, ["channel", "address", "model"])
+
+
+def _apply_profile(args: argparse.Namespace) -> int:
+    from .profiles import ChargingProfile, ProfileStore
+    if args.name is None:
+        with open(args.profile_file, "r", encoding="utf-8") as file:
+            args.profile = ChargingProfile.from_json(file.read())
+    else:
+        args.profile = ProfileStore.load(args.profile_file).get(args.name)
+    return _run_fleet(args, _apply_worker, ["channel", "address", "status", "written", "error"])
+
+
+def _watch(args: argparse.Namespace) -> int:
+    columns = ["time", "channel", "address", "register", "state", "active", "severity", "name", "raw_value"]
+    return _run_fleet(args, _watch_worker, columns)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="npbcharger", description="Mean Well NPB-1700 CAN tool")
+    parser.add_argument("--channel", dest="channels", action="append",
+                        help=f"CAN adapter channel, may be repeated (default: {DEFAULT_CHANNEL})")
+    parser.add_argument("--interface", default=DEFAULT_INTERFACE,
+                        help=f"python-can interface, or socketcan_native for raw SocketCAN sockets "
+                             f"(default: {DEFAULT_INTERFACE})")
+    parser.add_argument("--tty-baudrate", type=int, default=1000000,
+                        help="Baudrate of serial CAN adapters (default: 1000000)")
+    subcommands = parser.add_subparsers(dest="subcommand", required=True)
+
+    read = subcommands.add_parser("read", help="Read one register of one charger")
+    read.add_argument("register", type=_command, help="Register name, e.g. READ_VOUT")
+    read.add_argument("--address", type=_charger_address, default=3, help="Charger address (default: 3)")
+    read.add_argument("--raw", action="store_true", help="Print payload as hex without decoding")
+    read.set_defaults(handler=_read)
+
+    serve = subcommands.add_parser("serve", help="Share the bus with local processes over a Unix socket")
+    serve.add_argument("--socket", help="Socket path (default: npbcharger.sock in $XDG_RUNTIME_DIR, or /run)")
+    serve.add_argument("--group", action="store_true", help="Let the owner's group connect, not only the owner")
+    serve.set_defaults(handler=_serve)
+
+    def fleet_command(name: str, help_text: str, handler, addresses: str = "3"):
+        command = subcommands.add_parser(name, help=help_text)
+        command.add_argument("--addresses", type=parse_addresses, default=parse_addresses(addresses),
+                             help=f"Charger addresses, e.g. 0-7 or 1,3 (default: {addresses})")
+        command.add_argument("--format", choices=("ndjson", "csv"), default="ndjson",
+                             help="Output format (default: ndjson)")
+        command.set_defaults(handler=handler)
+        return command
+
+    def repeated(command, count: int, interval: float) -> None:
+        command.add_argument("--count", type=int, default=count,
+                             help=f"Rounds to run, 0 runs until interrupted (default: {count})")
+        command.add_argument("--interval", type=float, default=interval,
+                             help=f"Seconds between round starts (default: {interval})")
+
+    poll = fleet_command("poll", "Read registers from every charger", _poll)
+    poll.add_argument("--registers", type=_commands, default=_commands(TELEMETRY_REGISTERS),
+                      help=f"Comma separated register names (default: {TELEMETRY_REGISTERS})")
+    repeated(poll, 1, 1.0)
+
+    fleet_command("snapshot", "Read every register from every charger", _snapshot)
+    fleet_command("discover", "List chargers answering on the bus", _discover, DISCOVERY_ADDRESSES)
+
+    apply = fleet_command("apply-profile", "Write charging profile to every charger", _apply_profile)
+    apply.add_argument("profile_file", help="Profile JSON, or profile store JSON when --name is given")
+    apply.add_argument("--name", help="Name of the profile in the store")
+    apply.add_argument("--no-verify", action="store_true", help="Don't read registers back after writing")
+
+    watch = fleet_command("watch", "Stream status flag changes", _watch)
+    repeated(watch, 0, 0.5)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if not args.channels:
+        args.channels = [DEFAULT_CHANNEL]
+    from .exceptions import NPBCommunicationError
+    try:
+        return args.handler(args)
+    except NPBCommunicationError as e:
+        print(f"npbcharger: no reply from charger: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -68,3 +68,40 @@ class NPB1700Commands(enum.Enum):
     SCALING_FACTOR = bytearray([0xC0, 0x00])   # R, 2 - Scaling ratio
     SYSTEM_STATUS = bytearray([0xC1, 0x00])    # R, 2 - System status
     SYSTEM_CONFIG = bytearray([0xC2, 0x00])    # R/W, 2 - System configuration
+
+
+# Payload length (without command code) of every register as listed above
+COMMAND_DATA_LEN = {
+    NPB1700Commands.OPERATION: 1,
+    NPB1700Commands.FAULT_STATUS: 2,
+    NPB1700Commands.READ_VOUT: 2,
+    NPB1700Commands.READ_IOUT: 2,
+    NPB1700Commands.READ_TEMPERATURE_1: 2,
+    NPB1700Commands.MFR_ID_B0B5: 6,
+    NPB1700Commands.MFR_ID_B6B11: 6,
+    NPB1700Commands.MFR_MODEL_B0B5: 6,
+    NPB1700Commands.MFR_MODEL_B6B11: 6,
+    NPB1700Commands.MFR_REVISION_B0B5: 6,
+    NPB1700Commands.MFR_LOCATION_B0B2: 3,
+    NPB1700Commands.MFR_DATE_B0B5: 6,
+    NPB1700Commands.MFR_SERIAL_B0B5: 6,
+    NPB1700Commands.MFR_SERIAL_B6B11: 6,
+    NPB1700Commands.CURVE_CC: 2,
+    NPB1700Commands.CURVE_CV: 2,
+    NPB1700Commands.CURVE_FV: 2,
+    NPB1700Commands.CURVE_TC: 2,
+    NPB1700Commands.CURVE_CONFIG: 2,
+    NPB1700Commands.CURVE_CC_TIMEOUT: 2,
+    NPB1700Commands.CURVE_CV_TIMEOUT: 2,
+    NPB1700Commands.CURVE_FV_TIMEOUT: 2,
+    NPB1700Commands.CHG_STATUS: 2,
+    NPB1700Commands.CHG_RST_VBAT: 2,
+    NPB1700Commands.SCALING_FACTOR: 2,
+    NPB1700Commands.SYSTEM_STATUS: 2,
+    NPB1700Commands.SYSTEM_CONFIG: 2,
+}
+
+# Command by its code as little endian integer, e.g. in binary formats
+COMMANDS_BY_CODE = {
+    int.from_bytes(command.value, byteorder='little'): command for command in NPB1700Commands
+}
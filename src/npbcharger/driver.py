@@ -1,9 +1,13 @@
-import sys
-from time import sleep
-import can
-from can import BusABC
-from .commands import NPB1700Commands
-from .exceptions import NPBCommunicationError
+import logging
+from time import monotonic, sleep
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Sequence, Tuple
+from .commands import COMMAND_LEN, NPB1700Commands
+from .exceptions import NPBCommunicationError, NPBMissingReplyError
+from .timing import ClockAligner
+
+if TYPE_CHECKING:
+    import can
+    from .transports.base import Transport
 
 # Max. response time (PSU/CHG to Controller): 5mSec
 MAX_RESPONCE_TIME: float = 0.005
@@ -14,14 +18,25 @@ MIN_REQUEST_PERIOD: float = 0.02
 # Min. packet margin time (Controller to PSU/CHG): 5mSec
 MIN_MARGIN_TIME: float = 0.005
 
+logger = logging.getLogger(__name__)
+
+# CAN bus bitrate used by NPB-1700
+DEFAULT_BITRATE: int = 250000
+
+# Controller -> PSU/CHG ids are 0x000C01XX, replies come from 0x000C00XX
+REPLY_ID_MASK: int = ~0x00000100
+
+# interface name selecting SocketCanTransport (raw kernel socket) instead of python-can
+NATIVE_SOCKETCAN_INTERFACE: str = "socketcan_native"
+
 class NPB1700:
     # Private can communication related
     __interface: str
     __channel: str = "/dev/ttyACMx"
     __tty_baudrate: int = 1000000
-    __bitrate: int = 250000
+    __bitrate: int = DEFAULT_BITRATE
     __device_id: int = 0x000C0103
-    __can_bus: BusABC
+    transport: 'Transport'
     is_broadcast: bool = False
 
     """ Initializes npb1700 can bus instance & id
@@ -29,28 +44,48 @@ class NPB1700:
     :param channel: path to device which connected by CAN to NPB-1700
     :param tty_baudrate: baudrate of your device -> CAN adapter
     :param device_id: id of NPB-1700 read documentation to set correct id
+    :param traffic_monitor: optional object with record(msg) (e.g. BusBudget) which sees every frame
+    :param transport: already opened Transport to use instead of python-can bus on channel.
+        It stays owned by the caller and is not shut down with the driver
+    :raises NPBTransportError: if CAN bus can't be opened
     """
 
-    def __init__(self, channel: str, interface: str, tty_baudrate: int = 1000000 , device_id: int = 0x000C0103):
+    def __init__(self, channel: Optional[str] = None, interface: Optional[str] = None,
+                 tty_baudrate: int = 1000000, device_id: int = 0x000C0103,
+                 traffic_monitor=None, transport: Optional['Transport'] = None):
         self.__channel = channel
         self.__tty_baudrate = tty_baudrate
         self.__device_id = device_id
         self.__interface = interface
+        self.traffic_monitor = traffic_monitor
+        # Adapter clock of frame timestamps -> host monotonic, shared with siblings
+        self.clock_aligner = ClockAligner()
+        # Host monotonic time of last request and last reply
+        self.last_sent_at: float = 0.0
+        self.last_received_at: float = 0.0
 
         # Handle broadcast drivers
         addressMask: int = 0x000000FF
         self.is_broadcast = (self.__device_id & addressMask) == 0xFF
 
-        try:
-            self.__can_bus = can.Bus(interface=self.__interface, channel=self.__channel,
-                                     ttyBaudrate=self.__tty_baudrate, bitrate=self.__bitrate)
-        except can.exceptions.CanInitializationError as e:
-            print(f"Failed to initialize CAN bus on {self.__channel}: {e}")
-            sys.exit(1)
-        except Exception as e:  # Catch any other unexpected error during instantiation
-            print(
-                f"An unexpected error occurred while creating NPB1700 instance: {e}")
-            sys.exit(1)
+        # python-can is loaded on first driver creation: importing it dominates startup time
+        import can
+        self._message_type = can.Message
+        # Siblings and drivers on injected transports don't shut the bus down
+        self._owns_bus = transport is None
+        if transport is None and self.__interface == NATIVE_SOCKETCAN_INTERFACE:
+            from .transports.socketcan import SocketCanTransport
+            transport = SocketCanTransport(self.__channel)
+        elif transport is None:
+            from .transports.python_can import PythonCanTransport
+            transport = PythonCanTransport(self.__interface, self.__channel, self.__bitrate,
+                                           ttyBaudrate=self.__tty_baudrate)
+        self.transport = transport
+        # Receive filters of the transport follow reply ids of its reading drivers
+        from .transports.filters import AcceptanceFilter
+        self.acceptance_filter = AcceptanceFilter.for_transport(transport)
+        self._attached = False
+        self.attach()
 
     def __enter__(self):
         """Context manager entry point."""
@@ -58,43 +93,224 @@ class NPB1700:
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit point (shuts down the bus)."""
-        if hasattr(self, '_NPB1700__can_bus'):
-            print(f"Shutting down CAN bus on {self.__channel}...")
-            self.__can_bus.shutdown()
+        self.detach()
+        if self._owns_bus:
+            logger.info(f"Shutting down CAN bus on {self.__channel}...")
+            self.transport.shutdown()
         # Return False to propagate any exceptions that occurred
         return False
 
-    def spin(self, msg: can.Message, have_response: bool = True) -> can.Message:
-        self.__can_bus.send(msg)
+    @property
+    def device_id(self) -> int:
+        return self.__device_id
+
+    @property
+    def reply_id(self) -> int:
+        """Arbitration id which device uses for replies"""
+        return self.__device_id & REPLY_ID_MASK
+
+    def sibling(self, device_id: int) -> 'NPB1700':
+        """
+        Driver of another charger on the same bus. Bus stays owned by this driver,
+        so siblings must not outlive it
+        """
+        other = object.__new__(type(self))
+        other.__dict__.update(self.__dict__)
+        other.__device_id = device_id
+        other.is_broadcast = (device_id & 0x000000FF) == 0xFF
+        other._owns_bus = False
+        other._attached = False
+        other.attach()
+        return other
+
+    def attach(self) -> None:
+        """Accept replies of this device in transport receive filters (done on creation)"""
+        if not self._attached and not self.is_broadcast:
+            self._attached = True
+            self.acceptance_filter.add(self.reply_id)
+
+    def detach(self) -> None:
+        """Stop accepting replies of this device, e.g. when it leaves the polling set"""
+        if self._attached:
+            self._attached = False
+            self.acceptance_filter.remove(self.reply_id)
+
+    def _send(self, msg: 'can.Message') -> None:
+        self.transport.send(msg)
+        self.last_sent_at = monotonic()
+        if self.traffic_monitor is not None:
+            self.traffic_monitor.record(msg)
+
+    def _recv(self, timeout: float) -> Optional['can.Message']:
+        rec_msg: Optional['can.Message'] = self.transport.recv(timeout)
+        if rec_msg is None:
+            return None
+        self.last_received_at = monotonic()
+        if rec_msg.timestamp:
+            self.clock_aligner.observe(rec_msg.timestamp, self.last_received_at)
+        if self.traffic_monitor is not None:
+            self.traffic_monitor.record(rec_msg)
+        return rec_msg
+
+    def received_at(self, msg: 'can.Message') -> float:
+        """
+        Host monotonic time when reply reached the adapter, comparable between devices
+        of a fleet read. Frames without timestamp get the time of the last receive
+        """
+        if msg.timestamp and self.clock_aligner.offset is not None:
+            return self.clock_aligner.to_host(msg.timestamp)
+        return self.last_received_at
+
+    def spin(self, msg: 'can.Message', have_response: bool = True) -> 'can.Message':
+        self._send(msg)
         # For debug purposes
-        # print(f"Message sent on {self.__can_bus.channel_info}")
+        # print(f"Message sent on {self.__channel}")
         if have_response:
-            rec_msg: can.Message | None = self.__can_bus.recv(timeout=MAX_RESPONCE_TIME)
+            rec_msg: Optional['can.Message'] = self._await_reply(msg, monotonic() + MAX_RESPONCE_TIME)
             if rec_msg is not None:
                 # For debug purposes
-                # print(f"Message received on {self.__can_bus.channel_info}")
+                # print(f"Message received on {self.__channel}")
                 sleep(MIN_MARGIN_TIME)
                 return rec_msg
             raise NPBCommunicationError
         sleep(MIN_MARGIN_TIME)
-        return can.Message()
+        return self._message_type()
+
+    def _await_reply(self, request: 'can.Message', deadline: float) -> Optional['can.Message']:
+        """
+        Receive until the reply to request arrives, matched by reply id and command code.
+        Other frames (late replies to earlier requests) are dropped
+        """
+        reply_id = request.arbitration_id & REPLY_ID_MASK
+        code = bytes(request.data[:COMMAND_LEN])
+        while True:
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                return None
+            rec_msg = self._recv(remaining)
+            if rec_msg is None:
+                return None
+            if rec_msg.arbitration_id == reply_id and bytes(rec_msg.data[:COMMAND_LEN]) == code:
+                return rec_msg
+            logger.debug(f"Dropped unexpected frame 0x{rec_msg.arbitration_id:08X} {bytes(rec_msg.data).hex()}")
 
-    def _create_msg(self, command: NPB1700Commands, params: bytearray = bytearray()) -> can.Message:
+    def _create_msg(self, command: NPB1700Commands, params: bytearray = bytearray(),
+                    device_id: Optional[int] = None) -> 'can.Message':
         dlc: int = len(command.value) + len(params)
         data: bytearray = command.value + params
-        return can.Message(arbitration_id=self.__device_id, dlc=dlc, data=data, is_extended_id=True, check=True)
+        if device_id is None:
+            device_id = self.__device_id
+        return self._message_type(arbitration_id=device_id, dlc=dlc, data=data, is_extended_id=True, check=True)
 
-    def read(self, command: NPB1700Commands) -> can.Message:
-        can_msg: can.Message = self._create_msg(command)
-        # Send message and check if it failed
-        # Max. response time (PSU/CHG to Controller): 5mSec
-        rec_msg: can.Message = self.spin(can_msg, not(self.is_broadcast))
-        return rec_msg
+    def build_frame(self, command: NPB1700Commands, params: bytearray = bytearray()) -> 'can.Message':
+        """Request frame addressed to this device, may be kept and sent repeatedly"""
+        return self._create_msg(command, params)
 
-    def write(self, command: NPB1700Commands, params: bytearray) -> can.Message:
-        can_msg: can.Message = self._create_msg(command, params)
-        # Max. response time (PSU/CHG to Controller): 5mSec
-        rec_msg: can.Message = self.spin(can_msg, False)
+    def send_frame(self, msg: 'can.Message') -> 'can.Message':
+        """Send prebuilt write frame (see build_frame)"""
+        rec_msg: 'can.Message' = self.spin(msg, False)
         if rec_msg.error_state_indicator:
             raise NPBCommunicationError
         return rec_msg
+
+    def read(self, command: NPB1700Commands) -> 'can.Message':
+        can_msg: 'can.Message' = self._create_msg(command)
+        # Send message and check if it failed
+        # Max. response time (PSU/CHG to Controller): 5mSec
+        rec_msg: 'can.Message' = self.spin(can_msg, not(self.is_broadcast))
+        return rec_msg
+
+    def write(self, command: NPB1700Commands, params: bytearray) -> 'can.Message':
+        return self.send_frame(self._create_msg(command, params))
+
+    def read_burst(self, commands: Sequence[NPB1700Commands],
+                   period: float = MIN_REQUEST_PERIOD) -> Dict[NPB1700Commands, 'can.Message']:
+        """
+        Read several registers in one burst. Requests are paced by period while
+        replies are collected in between, matched by reply id and command code.
+
+        :raises NPBMissingReplyError: if some registers didn't answer, carrying the replies which did
+        """
+        if self.is_broadcast:
+            raise NPBCommunicationError("Cannot read when Driver is in Broadcast mode")
+
+        pending: Dict[bytes, NPB1700Commands] = {bytes(command.value): command for command in commands}
+        replies: Dict[NPB1700Commands, 'can.Message'] = {}
+        for command in commands:
+            self._send(self._create_msg(command))
+            self._collect_replies(pending, replies, monotonic() + period)
+        self._collect_replies(pending, replies, monotonic() + MAX_RESPONCE_TIME)
+
+        if pending:
+            names = ", ".join(command.name for command in pending.values())
+            raise NPBMissingReplyError(f"No reply for {names}", replies, list(pending.values()))
+        return replies
+
+    def write_burst(self, writes: Iterable[Tuple[NPB1700Commands, bytearray]],
+                    period: float = MIN_REQUEST_PERIOD) -> None:
+        """
+        Send several writes paced by period, each checked like a single write
+
+        :raises NPBCommunicationError: on the first frame the adapter flags as failed
+        """
+        for index, (command, params) in enumerate(writes):
+            if index:
+                # send_frame already waited the margin after the previous frame
+                sleep(max(period - MIN_MARGIN_TIME, 0.0))
+            self.send_frame(self._create_msg(command, params))
+
+    def read_fleet(self, device_ids: Sequence[int], commands: Sequence[NPB1700Commands],
+                   period: float = MIN_REQUEST_PERIOD) -> Dict[int, Dict[NPB1700Commands, 'can.Message']]:
+        """
+        Read the same registers from several chargers on this bus in one pipelined pass.
+        Each round requests one command from every device back to back, rounds are paced
+        by period, so every device still sees at most one request per period.
+        Returns replies by device id, devices which didn't answer have missing entries
+        """
+        pending: Dict[Tuple[int, bytes], Tuple[int, NPB1700Commands]] = {}
+        replies: Dict[int, Dict[NPB1700Commands, 'can.Message']] = {device_id: {} for device_id in device_ids}
+        with self.acceptance_filter.accepting(device_id & REPLY_ID_MASK for device_id in device_ids):
+            for command in commands:
+                for device_id in device_ids:
+                    pending[(device_id & REPLY_ID_MASK, bytes(command.value))] = (device_id, command)
+                    self._send(self._create_msg(command, device_id=device_id))
+                self._collect_fleet_replies(pending, replies, monotonic() + period)
+            self._collect_fleet_replies(pending, replies, monotonic() + MAX_RESPONCE_TIME)
+        return replies
+
+    def _collect_fleet_replies(self, pending: Dict[Tuple[int, bytes], Tuple[int, NPB1700Commands]],
+                               replies: Dict[int, Dict[NPB1700Commands, 'can.Message']],
+                               deadline: float) -> None:
+        while pending:
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                return
+            rec_msg = self._recv(remaining)
+            if rec_msg is None:
+                return
+            awaited = pending.pop((rec_msg.arbitration_id, bytes(rec_msg.data[:2])), None)
+            if awaited is not None:
+                device_id, command = awaited
+                replies[device_id][command] = rec_msg
+        sleep(max(0.0, deadline - monotonic()))
+
+    def _collect_replies(self, pending: Dict[bytes, NPB1700Commands],
+                         replies: Dict[NPB1700Commands, 'can.Message'], deadline: float) -> None:
+        """Receive replies until deadline, storing the ones which are awaited"""
+        reply_id = self.reply_id
+        while True:
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                return
+            rec_msg = self._recv(remaining if pending else 0)
+            if rec_msg is None:
+                if not pending:
+                    # Keep request pacing even when everything has arrived
+                    sleep(max(0.0, deadline - monotonic()))
+                    return
+                continue
+            if rec_msg.arbitration_id != reply_id:
+                continue
+            command = pending.pop(bytes(rec_msg.data[:2]), None)
+            if command is not None:
+                replies[command] = rec_msg
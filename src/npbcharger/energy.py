@@ -0,0 +1,231 @@
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence
+from .commands import NPB1700Commands
+from .parsers.charge_status import ChargeStatus
+
+# Charge stages totals are split by, checked in this order. None is outside of any stage
+STAGES = (ChargeStatus.CCM, ChargeStatus.CVM, ChargeStatus.FVM, ChargeStatus.FULLM)
+# Intervals between samples longer than this are not integrated (lost charger, stopped poller).
+# Well above the slowest stage poll period of PollingScheduler
+DEFAULT_MAX_GAP: float = 15.0
+
+SECONDS_PER_HOUR: float = 3600.0
+
+Stage = Optional[ChargeStatus]
+
+
+def stage_of(status: Any) -> Stage:
+    """Charge stage of raw CHG_STATUS word, decoded status dict or ChargeStatus flags"""
+    if isinstance(status, int):
+        status = ChargeStatus(status & sum(stage.value for stage in STAGES))
+    elif isinstance(status, dict) or hasattr(status, 'keys'):
+        status = status["status"]
+    for stage in STAGES:
+        if stage in status:
+            return stage
+    return None
+
+
+class EnergyTotals:
+    """Delivered charge and energy over integrated time"""
+
+    __slots__ = ("amp_hours", "watt_hours", "seconds")
+
+    def __init__(self):
+        self.amp_hours: float = 0.0
+        self.watt_hours: float = 0.0
+        self.seconds: float = 0.0
+
+    def add(self, amp_seconds: float, watt_seconds: float, seconds: float) -> None:
+        self.amp_hours += amp_seconds / SECONDS_PER_HOUR
+        self.watt_hours += watt_seconds / SECONDS_PER_HOUR
+        self.seconds += seconds
+
+    def as_dict(self) -> Dict[str, float]:
+        return {"amp_hours": self.amp_hours, "watt_hours": self.watt_hours, "seconds": self.seconds}
+
+
+class _DeviceEnergy:
+    """Integration state of one charger: last point and running totals"""
+
+    def __init__(self):
+        self.time: Optional[float] = None
+        self.voltage: Optional[float] = None
+        self.current: Optional[float] = None
+        self.stage: Stage = None
+        self.session = EnergyTotals()
+        self.stages: Dict[Stage, EnergyTotals] = {}
+        self.gap_seconds: float = 0.0
+
+
+class EnergyIntegrator:
+    """
+    Streaming amp-hour and watt-hour counter per charger.
+    Samples may arrive at irregular times: each interval between consecutive samples
+    is integrated with the trapezoid rule, the quantity not sampled at a point
+    (VOUT and IOUT are read one after another) is held from its last value.
+    Intervals longer than max_gap are skipped and counted in gap seconds.
+    An interval is attributed to the charge stage known at its start.
+
+    Feed it with update() or use on_sample() as PollingScheduler callback
+    (with timestamps=True samples carry the time of each reply).
+    """
+
+    def __init__(self, max_gap: float = DEFAULT_MAX_GAP, clock: Callable[[], float] = time.monotonic):
+        self.max_gap = max_gap
+        self._clock = clock
+        self._devices: Dict[Hashable, _DeviceEnergy] = {}
+
+    def update(self, key: Hashable, timestamp: float, voltage: Optional[float] = None,
+               current: Optional[float] = None, stage: Any = ...) -> None:
+        """
+        Add sample of device key taken at timestamp (seconds).
+        stage is a ChargeStatus (or None outside of stages), omitted keeps the last one
+        """
+        device = self._devices.get(key)
+        if device is None:
+            device = self._devices[key] = _DeviceEnergy()
+        new_voltage = device.voltage if voltage is None else voltage
+        new_current = device.current if current is None else current
+
+        if device.time is not None and device.voltage is not None and device.current is not None \
+                and new_voltage is not None and new_current is not None:
+            elapsed = timestamp - device.time
+            if elapsed > self.max_gap:
+                device.gap_seconds += elapsed
+            elif elapsed > 0:
+                amp_seconds = (device.current + new_current) * elapsed / 2
+                watt_seconds = (device.voltage * device.current + new_voltage * new_current) * elapsed / 2
+                device.session.add(amp_seconds, watt_seconds, elapsed)
+                totals = device.stages.get(device.stage)
+                if totals is None:
+                    totals = device.stages[device.stage] = EnergyTotals()
+                totals.add(amp_seconds, watt_seconds, elapsed)
+
+        if device.time is None or timestamp >= device.time:
+            device.time = timestamp
+        device.voltage = new_voltage
+        device.current = new_current
+        if stage is not ...:
+            device.stage = stage
+
+    def on_sample(self, key: Hashable, command: NPB1700Commands, value: Any) -> None:
+        """PollingScheduler sample callback: VOUT, IOUT and CHG_STATUS are used, plain values get clock time"""
+        if hasattr(value, 'received_at'):
+            timestamp, value = value.received_at, value.value
+        else:
+            timestamp = self._clock()
+        if command == NPB1700Commands.READ_VOUT:
+            self.update(key, timestamp, voltage=value)
+        elif command == NPB1700Commands.READ_IOUT:
+            self.update(key, timestamp, current=value)
+        elif command == NPB1700Commands.CHG_STATUS:
+            self.set_stage(key, stage_of(value))
+
+    def set_stage(self, key: Hashable, stage: Stage) -> None:
+        """Attribute intervals starting from now to stage"""
+        device = self._devices.get(key)
+        if device is None:
+            device = self._devices[key] = _DeviceEnergy()
+        device.stage = stage
+
+    def session(self, key: Hashable) -> Dict[str, float]:
+        """Totals since first sample or last reset_session() with gap seconds"""
+        device = self._devices[key]
+        return dict(device.session.as_dict(), gap_seconds=device.gap_seconds)
+
+    def stages(self, key: Hashable) -> Dict[Stage, Dict[str, float]]:
+        """Session totals by charge stage"""
+        return {stage: totals.as_dict() for stage, totals in self._devices[key].stages.items()}
+
+    def reset_session(self, key: Hashable) -> Dict[str, float]:
+        """Start new session (e.g. new battery), returns totals of the finished one"""
+        finished = self.session(key)
+        device = self._devices[key]
+        device.session = EnergyTotals()
+        device.stages = {}
+        device.gap_seconds = 0.0
+        return finished
+
+    def remove(self, key: Hashable) -> None:
+        self._devices.pop(key, None)
+
+
+def integrate_batch(timestamps: Sequence[float], voltages: Sequence[float], currents: Sequence[float],
+                    stages: Optional[Sequence[Stage]] = None,
+                    max_gap: float = DEFAULT_MAX_GAP) -> Dict[str, Any]:
+    """
+    Integrate historical log of one charger with the same rules as EnergyIntegrator.
+    Sequences are aligned per sample, timestamps ascending. Uses numpy when installed.
+    Returns session totals with gap seconds and "stages": {stage: totals}
+    """
+    if not len(timestamps) == len(voltages) == len(currents):
+        raise ValueError("Timestamps, voltages and currents must have the same length")
+    if stages is not None and len(stages) != len(timestamps):
+        raise ValueError("Stages must have the same length as timestamps")
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    if numpy is None:
+        return _integrate_python(timestamps, voltages, currents, stages, max_gap)
+    return _integrate_numpy(numpy, timestamps, voltages, currents, stages, max_gap)
+
+
+def _batch_result(total: EnergyTotals, gap_seconds: float, by_stage: Dict[Stage, EnergyTotals]) -> Dict[str, Any]:
+    return dict(total.as_dict(), gap_seconds=gap_seconds,
+                stages={stage: totals.as_dict() for stage, totals in by_stage.items()})
+
+
+def _integrate_python(timestamps, voltages, currents, stages, max_gap) -> Dict[str, Any]:
+    total = EnergyTotals()
+    by_stage: Dict[Stage, EnergyTotals] = {}
+    gap_seconds = 0.0
+    powers = [voltage * current for voltage, current in zip(voltages, currents)]
+    for index in range(1, len(timestamps)):
+        elapsed = timestamps[index] - timestamps[index - 1]
+        if elapsed > max_gap:
+            gap_seconds += elapsed
+            continue
+        if elapsed <= 0:
+            continue
+        amp_seconds = (currents[index - 1] + currents[index]) * elapsed / 2
+        watt_seconds = (powers[index - 1] + powers[index]) * elapsed / 2
+        total.add(amp_seconds, watt_seconds, elapsed)
+        stage = None if stages is None else stages[index - 1]
+        totals = by_stage.get(stage)
+        if totals is None:
+            totals = by_stage[stage] = EnergyTotals()
+        totals.add(amp_seconds, watt_seconds, elapsed)
+    return _batch_result(total, gap_seconds, by_stage)
+
+
+def _integrate_numpy(numpy, timestamps, voltages, currents, stages, max_gap) -> Dict[str, Any]:
+    times = numpy.asarray(timestamps, dtype=float)
+    current = numpy.asarray(currents, dtype=float)
+    power = numpy.asarray(voltages, dtype=float) * current
+    elapsed = numpy.diff(times)
+    gaps = elapsed > max_gap
+    used = (elapsed > 0) & ~gaps
+    elapsed = numpy.where(used, elapsed, 0.0)
+    amp_seconds = (current[:-1] + current[1:]) * elapsed / 2
+    watt_seconds = (power[:-1] + power[1:]) * elapsed / 2
+
+    total = EnergyTotals()
+    total.add(float(amp_seconds.sum()), float(watt_seconds.sum()), float(elapsed.sum()))
+    gap_seconds = float(numpy.diff(times)[gaps].sum())
+
+    by_stage: Dict[Stage, EnergyTotals] = {}
+    codes = [None] + list(STAGES)
+    if stages is None:
+        interval_codes = numpy.zeros(len(elapsed), dtype=int)
+    else:
+        interval_codes = numpy.fromiter((codes.index(stage) for stage in stages[:-1]), dtype=int,
+                                        count=len(elapsed))
+    for code, stage in enumerate(codes):
+        selected = used & (interval_codes == code)
+        if selected.any():
+            by_stage[stage] = totals = EnergyTotals()
+            totals.add(float(amp_seconds[selected].sum()), float(watt_seconds[selected].sum()),
+                       float(elapsed[selected].sum()))
+    return _batch_result(total, gap_seconds, by_stage)
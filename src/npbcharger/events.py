@@ -0,0 +1,102 @@
+from enum import Flag
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+from .commands import NPB1700Commands
+from .parsers.factories.status_factory import Severity
+
+# Status registers which may be watched for changes
+STATUS_COMMANDS = (
+    NPB1700Commands.FAULT_STATUS,
+    NPB1700Commands.CHG_STATUS,
+    NPB1700Commands.SYSTEM_STATUS,
+)
+
+
+class StatusEvent(NamedTuple):
+    """Single edge of a status flag (set or cleared)"""
+    command: NPB1700Commands
+    state: Flag
+    # True - flag became active, False - flag was cleared
+    active: bool
+    name: str
+    description: str
+    severity: Optional[Severity]
+    raw_value: int
+    previous_raw: Optional[int]
+
+
+StatusCallback = Callable[[StatusEvent], None]
+
+
+class StatusChangeTracker:
+    """
+    Keeps last raw word of every watched status register and converts
+    new words into edge events. Decoding happens only when the word changed.
+    """
+
+    def __init__(self):
+        self._last_words: Dict[NPB1700Commands, int] = {}
+        self._subscribers: Dict[int, tuple] = {}
+        self._next_token: int = 0
+
+    def subscribe(self, callback: StatusCallback,
+                  commands: Iterable[NPB1700Commands] = STATUS_COMMANDS) -> Callable[[], None]:
+        """
+        Register callback for events of given status commands.
+        Returns function which removes the subscription.
+        """
+        commands = frozenset(commands)
+        unknown = commands.difference(STATUS_COMMANDS)
+        if unknown:
+            names = ", ".join(command.name for command in unknown)
+            raise ValueError(f"Commands are not status registers: {names}")
+
+        token = self._next_token
+        self._next_token += 1
+        self._subscribers[token] = (callback, commands)
+
+        def unsubscribe() -> None:
+            self._subscribers.pop(token, None)
+        return unsubscribe
+
+    @property
+    def watched_commands(self) -> List[NPB1700Commands]:
+        """Status commands with at least one subscriber, in poll order"""
+        watched = set()
+        for _, commands in self._subscribers.values():
+            watched |= commands
+        return [command for command in STATUS_COMMANDS if command in watched]
+
+    def last_word(self, command: NPB1700Commands) -> Optional[int]:
+        return self._last_words.get(command)
+
+    def reset(self) -> None:
+        """Forget previous words so the next update reports full state again"""
+        self._last_words.clear()
+
+    def update(self, command: NPB1700Commands, status_word: int, parser) -> List[StatusEvent]:
+        """Store new raw word and dispatch events for every changed flag"""
+        previous_word = self._last_words.get(command)
+        if previous_word == status_word:
+            return []
+        self._last_words[command] = status_word
+
+        events = [
+            StatusEvent(
+                command=command,
+                state=transition["state"],
+                active=transition["active"],
+                name=transition["name"],
+                description=transition["description"],
+                severity=transition["severity"],
+                raw_value=status_word,
+                previous_raw=previous_word,
+            )
+            for transition in parser.parse_transitions(previous_word, status_word)
+        ]
+
+        for callback, commands in list(self._subscribers.values()):
+            if command not in commands:
+                continue
+            for event in events:
+                callback(event)
+        return events
@@ -3,3 +3,41 @@ class NPBCommunicationError(Exception):
     Exception which handles loss of communication with NPB-1700
     """
     pass
+
+
+class NPBMissingReplyError(NPBCommunicationError):
+    """
+    Exception which is raised when some reads of a burst got no reply.
+    replies maps command to reply frames which did arrive, missing lists the others
+    """
+
+    def __init__(self, message: str, replies=None, missing=None):
+        super().__init__(message)
+        self.replies = replies or {}
+        self.missing = missing or []
+
+
+class NPBBusOverloadError(Exception):
+    """
+    Exception which is raised when requested traffic does not fit into CAN bus budget
+    """
+    pass
+
+
+class NPBVerificationError(Exception):
+    """
+    Exception which is raised when registers read back after write differ from written values.
+    mismatches maps command to (expected, actual) payload bytes
+    """
+
+    def __init__(self, message: str, mismatches=None):
+        super().__init__(message)
+        self.mismatches = mismatches or {}
+
+
+class NPBTransportError(NPBCommunicationError):
+    """
+    Exception which is raised when CAN transport can't be opened or fails while in use
+    (adapter unplugged, serial port lost, bus-off)
+    """
+    pass
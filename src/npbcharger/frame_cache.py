@@ -0,0 +1,66 @@
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Hashable, Optional
+
+if TYPE_CHECKING:
+    from can import Message
+
+# Distinct setpoints a control loop cycles through times devices times registers
+DEFAULT_FRAME_CACHE_SIZE: int = 1024
+
+
+class FrameCache:
+    """
+    Bounded LRU of fully encoded write frames.
+    Keys are (device id, command, parser, quantized value), so repeated setpoint
+    writes skip clamping, rounding, to_bytes and message creation.
+    Cached messages are shared and must not be modified.
+    Safe to share between threads (e.g. CLI workers of several channels).
+
+    :param maxsize: number of frames kept, least recently used ones are dropped first
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_FRAME_CACHE_SIZE):
+        if maxsize < 1:
+            raise ValueError("Cache size must be positive")
+        self.maxsize = maxsize
+        self.hits: int = 0
+        self.misses: int = 0
+        self._frames: 'OrderedDict[Hashable, Message]' = OrderedDict()
+        # Eviction by another thread between lookup and move_to_end would raise KeyError
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._frames
+
+    def get(self, key: Hashable) -> Optional['Message']:
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is None:
+                self.misses += 1
+                return None
+            self._frames.move_to_end(key)
+            self.hits += 1
+            return frame
+
+    def put(self, key: Hashable, frame: 'Message') -> 'Message':
+        """Store frame, returns it for chaining"""
+        with self._lock:
+            self._frames[key] = frame
+            self._frames.move_to_end(key)
+            if len(self._frames) > self.maxsize:
+                self._frames.popitem(last=False)
+        return frame
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Cache shared by every service unless one is passed explicitly
+FRAME_CACHE = FrameCache()
@@ -0,0 +1,186 @@
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+from .commands import NPB1700Commands
+from .driver import NPB1700, MIN_REQUEST_PERIOD
+from .parsers.electric_data import FIXED_POINT_SCALE
+from .services import NPB1700Service
+
+logger = logging.getLogger(__name__)
+
+# Setpoint changes smaller than this are not written, amps
+DEFAULT_DEADBAND: float = 0.2
+# Current above the measured one granted to units which are not CC limited, amps
+DEFAULT_HEADROOM: float = 1.0
+# Unit drawing this share of its CC setpoint is CC limited and wants more
+DEFAULT_SATURATION: float = 0.95
+# Loop periods kept for statistics
+LOOP_HISTORY: int = 256
+
+
+class SiteCurrentLimiter:
+    """
+    Keeps the summed output current of chargers on one bus under a site limit by
+    adjusting their CURVE_CC. Each step reads READ_IOUT of every unit in one pipelined
+    fleet read, shares the limit between units (water filling: CC limited units may
+    grow, units below their setpoint keep headroom above what they draw), and writes
+    setpoints which moved by more than the deadband using cached frames.
+    Setpoints stay within CURVE_CC limits of the model. Units which don't reply
+    keep their last setpoint reserved (maximal CC if it was never read).
+    All arithmetic is in centiamps.
+
+    :param site_limit: summed output current allowed, amps
+    :param model_id: model whose CURVE_CC limits apply, see NPB1700Service
+    :param calibrate: calibrate services of units on construction, see NPB1700Service
+    :raises ValueError: if device_ids is empty
+    """
+
+    def __init__(self, driver: NPB1700, device_ids: Sequence[int], site_limit: float,
+                 model_id: Optional[str] = None, calibrate: bool = False,
+                 deadband: float = DEFAULT_DEADBAND, headroom: float = DEFAULT_HEADROOM,
+                 saturation: float = DEFAULT_SATURATION, period: float = MIN_REQUEST_PERIOD,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.driver = driver
+        self.device_ids = list(device_ids)
+        if not self.device_ids:
+            raise ValueError("SiteCurrentLimiter needs at least one device id")
+        self.site_limit = site_limit
+        self.deadband = round(deadband * FIXED_POINT_SCALE)
+        self.headroom = round(headroom * FIXED_POINT_SCALE)
+        self.saturation = saturation
+        self.period = period
+        self._clock = clock
+        self._sleep = sleep
+        self.services: Dict[int, NPB1700Service] = {
+            device_id: NPB1700Service(driver.sibling(device_id), model_id=model_id, calibrate=calibrate)
+            for device_id in self.device_ids
+        }
+        factory = self.services[self.device_ids[0]].parser_factory
+        self._setpoint_parser = factory.get_parser(NPB1700Commands.CURVE_CC)
+        self._current_parser = factory.get_parser(NPB1700Commands.READ_IOUT)
+        self.min_setpoint = round(self._setpoint_parser.constraints['min'] * FIXED_POINT_SCALE)
+        self.max_setpoint = round(self._setpoint_parser.constraints['max'] * FIXED_POINT_SCALE)
+
+        # Last setpoint known to be on each unit, centiamps
+        self.setpoints: Dict[int, int] = {}
+        self.steps: int = 0
+        self.writes: int = 0
+        self.skipped_writes: int = 0
+        self.missing_replies: int = 0
+        self.loop_periods: Deque[float] = deque(maxlen=LOOP_HISTORY)
+        self.last_duration: Optional[float] = None
+        self._last_start: Optional[float] = None
+        # Next read must not reach a unit sooner than period after its write
+        self._quiet_until: float = 0.0
+
+    @property
+    def site_limit(self) -> float:
+        return self._site_limit / FIXED_POINT_SCALE
+
+    @site_limit.setter
+    def site_limit(self, amps: float) -> None:
+        self._site_limit = round(amps * FIXED_POINT_SCALE)
+
+    def read_setpoints(self) -> Dict[int, int]:
+        """Read CURVE_CC of every unit (done before the first step)"""
+        replies = self.driver.read_fleet(self.device_ids, [NPB1700Commands.CURVE_CC], self.period)
+        for device_id, device_replies in replies.items():
+            msg = device_replies.get(NPB1700Commands.CURVE_CC)
+            if msg is not None:
+                self.setpoints[device_id] = self._setpoint_parser.parse_read_fixed(msg)
+        return dict(self.setpoints)
+
+    def allocate(self, measured: Dict[int, int]) -> Dict[int, int]:
+        """Setpoints of responding units for measured currents (centiamps)"""
+        reserved = sum(self.setpoints.get(device_id, self.max_setpoint) for device_id in self.device_ids
+                       if device_id not in measured)
+        available = self._site_limit - reserved
+        if not measured:
+            return {}
+        allocation = {device_id: self.min_setpoint for device_id in measured}
+        remaining = available - self.min_setpoint * len(measured)
+        if remaining < 0:
+            logger.warning(f"Site limit {self.site_limit} A is below minimal CC of responding units")
+            return allocation
+
+        wants: Dict[int, int] = {}
+        for device_id, current in measured.items():
+            setpoint = self.setpoints.get(device_id, self.max_setpoint)
+            if current >= setpoint * self.saturation:
+                demand = self.max_setpoint
+            else:
+                demand = min(max(current + self.headroom, self.min_setpoint), self.max_setpoint)
+            wants[device_id] = demand - self.min_setpoint
+
+        # Smallest wants are satisfied first, the rest is shared equally
+        pending = sorted(wants, key=wants.get)
+        while pending and remaining > 0:
+            share = remaining // len(pending)
+            device_id = pending.pop(0)
+            grant = min(wants[device_id], share)
+            allocation[device_id] += grant
+            remaining -= grant
+        return allocation
+
+    def step(self) -> Dict[str, Any]:
+        """One control cycle. Returns measured currents, setpoints and written units"""
+        delay = self._quiet_until - self._clock()
+        if delay > 0:
+            self._sleep(delay)
+        started = self._clock()
+        if self._last_start is not None:
+            self.loop_periods.append(started - self._last_start)
+        self._last_start = started
+        if not self.setpoints:
+            self.read_setpoints()
+
+        replies = self.driver.read_fleet(self.device_ids, [NPB1700Commands.READ_IOUT], self.period)
+        measured = {
+            device_id: self._current_parser.parse_read_fixed(device_replies[NPB1700Commands.READ_IOUT])
+            for device_id, device_replies in replies.items() if device_replies
+        }
+        missing = [device_id for device_id in self.device_ids if device_id not in measured]
+        self.missing_replies += len(missing)
+
+        setpoints = self.allocate(measured)
+        written: List[int] = []
+        for device_id, setpoint in setpoints.items():
+            last = self.setpoints.get(device_id)
+            if last is not None and abs(setpoint - last) < self.deadband:
+                self.skipped_writes += 1
+                continue
+            self.services[device_id].write_fixed(NPB1700Commands.CURVE_CC, setpoint)
+            self.setpoints[device_id] = setpoint
+            written.append(device_id)
+        if written:
+            self.writes += len(written)
+            self._quiet_until = self._clock() + self.period
+
+        self.steps += 1
+        self.last_duration = self._clock() - started
+        return {"measured": measured, "setpoints": setpoints, "written": written, "missing": missing}
+
+    def run(self, should_stop: Callable[[], bool] = lambda: False) -> None:
+        """Run control steps back to back until should_stop() returns True"""
+        while not should_stop():
+            self.step()
+
+    def stats(self) -> Dict[str, Any]:
+        """Loop period statistics over recent steps (seconds) and counters"""
+        periods = sorted(self.loop_periods)
+        result: Dict[str, Any] = {
+            "steps": self.steps,
+            "writes": self.writes,
+            "skipped_writes": self.skipped_writes,
+            "missing_replies": self.missing_replies,
+            "last_duration": self.last_duration,
+        }
+        if periods:
+            result.update({
+                "period_mean": sum(periods) / len(periods),
+                "period_min": periods[0],
+                "period_max": periods[-1],
+                "period_p95": periods[min(len(periods) - 1, int(len(periods) * 0.95))],
+            })
+        return result
@@ -0,0 +1,240 @@
+import math
+import time
+from array import array
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Mapping, Optional
+from .bus_budget import transaction_bits
+from .commands import COMMAND_DATA_LEN, COMMAND_LEN, NPB1700Commands
+from .exceptions import NPBMissingReplyError
+
+if TYPE_CHECKING:
+    from can import Message
+
+# Table size: command codes are single byte (high byte of every code is 0)
+CODE_SPACE: int = 256
+
+# How old a value may get before it is due for refresh, seconds
+DEFAULT_MAX_AGES: Dict[NPB1700Commands, float] = {
+    NPB1700Commands.FAULT_STATUS: 0.5,
+    NPB1700Commands.CHG_STATUS: 0.5,
+    NPB1700Commands.SYSTEM_STATUS: 1.0,
+    NPB1700Commands.READ_VOUT: 1.0,
+    NPB1700Commands.READ_IOUT: 1.0,
+    NPB1700Commands.READ_TEMPERATURE_1: 5.0,
+    NPB1700Commands.OPERATION: 5.0,
+}
+# Setpoints and configuration only change when written
+SETTINGS_MAX_AGE: float = 60.0
+# Manufacturer information never changes
+IDENTITY_MAX_AGE: float = math.inf
+
+NEVER: float = -math.inf
+
+# Registers which didn't answer are not read again for this long, doubling per miss, seconds
+MISSING_BACKOFF_INITIAL: float = 1.0
+MISSING_BACKOFF_MAX: float = 60.0
+
+
+def command_code(command: NPB1700Commands) -> int:
+    """Index of command in mirror tables"""
+    return command.value[0]
+
+
+def _default_max_age(command: NPB1700Commands) -> float:
+    if command in DEFAULT_MAX_AGES:
+        return DEFAULT_MAX_AGES[command]
+    if command.name.startswith("MFR_") or command == NPB1700Commands.SCALING_FACTOR:
+        return IDENTITY_MAX_AGE
+    return SETTINGS_MAX_AGE
+
+
+class RegisterMirror:
+    """
+    In-memory image of every readable register of one charger.
+    Raw values are kept in tables indexed by command code, decoded lazily on access
+    through the service parsers and refreshed incrementally, stalest first.
+
+    :param service: NPB1700Service of the charger
+    :param max_ages: overrides of refresh interval per command
+    """
+
+    def __init__(self, service, max_ages: Optional[Mapping[NPB1700Commands, float]] = None,
+                 commands: Optional[List[NPB1700Commands]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.service = service
+        self._clock = clock
+        self.commands: List[NPB1700Commands] = list(commands or COMMAND_DATA_LEN)
+
+        self._raw: List[Optional[int]] = [None] * CODE_SPACE
+        self._updated = array('d', [NEVER] * CODE_SPACE)
+        self._max_age = array('d', [math.inf] * CODE_SPACE)
+        self._decoded: List[Any] = [None] * CODE_SPACE
+        self._by_code: List[Optional[NPB1700Commands]] = [None] * CODE_SPACE
+        # Unanswered reads in a row and time before which the register is not due
+        self._misses = array('I', [0] * CODE_SPACE)
+        self._retry_at = array('d', [NEVER] * CODE_SPACE)
+
+        max_ages = max_ages or {}
+        for command in self.commands:
+            code = command_code(command)
+            self._by_code[code] = command
+            self._max_age[code] = max_ages.get(command, _default_max_age(command))
+
+    # Access
+    def raw(self, command: NPB1700Commands) -> Optional[int]:
+        """Raw little-endian value of the register, None if never read"""
+        return self._raw[command_code(command)]
+
+    def payload(self, command: NPB1700Commands) -> Optional[bytearray]:
+        raw = self._raw[command_code(command)]
+        if raw is None:
+            return None
+        return bytearray(raw.to_bytes(COMMAND_DATA_LEN[command], byteorder='little'))
+
+    def get(self, command: NPB1700Commands) -> Any:
+        """Decoded value from the image, the bus is not touched. None if never read"""
+        code = command_code(command)
+        raw = self._raw[code]
+        if raw is None:
+            return None
+        decoded = self._decoded[code]
+        if decoded is None:
+            payload = raw.to_bytes(COMMAND_DATA_LEN[command], byteorder='little')
+            try:
+                parser = self.service.parser_factory.get_parser(command)
+            except ValueError:
+                # No parser for this register, hand out raw payload
+                decoded = bytearray(payload)
+            else:
+                from can import Message
+                decoded = parser.parse_read(Message(data=command.value + payload))
+            self._decoded[code] = decoded
+        return decoded
+
+    def __getitem__(self, command: NPB1700Commands) -> Any:
+        return self.get(command)
+
+    def age(self, command: NPB1700Commands, now: Optional[float] = None) -> float:
+        """Seconds since the value was refreshed, inf if never read"""
+        if now is None:
+            now = self._clock()
+        return now - self._updated[command_code(command)]
+
+    def image(self) -> Dict[NPB1700Commands, bytearray]:
+        """Raw payloads of every known register, e.g. for ChargingProfile.diff"""
+        image = {}
+        for command in self.commands:
+            payload = self.payload(command)
+            if payload is not None:
+                image[command] = payload
+        return image
+
+    # Updating
+    def store(self, command: NPB1700Commands, payload: bytes, timestamp: Optional[float] = None) -> None:
+        """Put raw payload into the image (after a read or a confirmed write)"""
+        code = command_code(command)
+        raw = int.from_bytes(payload[:COMMAND_DATA_LEN[command]], byteorder='little')
+        if raw != self._raw[code]:
+            self._raw[code] = raw
+            self._decoded[code] = None
+        self._updated[code] = self._clock() if timestamp is None else timestamp
+        self._misses[code] = 0
+        self._retry_at[code] = NEVER
+
+    def missed(self, command: NPB1700Commands, now: Optional[float] = None) -> None:
+        """Register didn't answer: keep it out of due() for a backoff doubling with every miss"""
+        if now is None:
+            now = self._clock()
+        code = command_code(command)
+        backoff = min(MISSING_BACKOFF_INITIAL * 2 ** self._misses[code], MISSING_BACKOFF_MAX)
+        self._misses[code] += 1
+        self._retry_at[code] = now + backoff
+
+    def store_message(self, msg: 'Message', timestamp: Optional[float] = None) -> bool:
+        """Put reply frame into the image, returns False if its command is not mirrored"""
+        if len(msg.data) < COMMAND_LEN or msg.data[1] != 0:
+            return False
+        command = self._by_code[msg.data[0]]
+        if command is None or len(msg.data) < COMMAND_LEN + COMMAND_DATA_LEN[command]:
+            return False
+        self.store(command, msg.data[COMMAND_LEN:], timestamp)
+        return True
+
+    def invalidate(self, command: Optional[NPB1700Commands] = None) -> None:
+        """Mark one or every register as due for refresh"""
+        commands = self.commands if command is None else [command]
+        for item in commands:
+            self._updated[command_code(item)] = NEVER
+
+    def invalidate_volatile(self, recovery: Optional[float] = None) -> None:
+        """
+        Mark telemetry and status registers due while keeping settings and identity,
+        e.g. as SupervisedTransport reconnect subscriber: warm restart without full re-read
+
+        :param recovery: reconnect duration passed to subscribers, unused
+        """
+        for command in self.commands:
+            code = command_code(command)
+            if self._max_age[code] < SETTINGS_MAX_AGE:
+                self._updated[code] = NEVER
+
+    def staleness(self, command: NPB1700Commands, now: Optional[float] = None) -> float:
+        """Age relative to allowed age: >= 1 means the value is due"""
+        code = command_code(command)
+        max_age = self._max_age[code]
+        age = self.age(command, now)
+        if math.isinf(age):
+            return math.inf
+        if math.isinf(max_age):
+            return 0.0
+        return age / max_age
+
+    def due(self, now: Optional[float] = None) -> List[NPB1700Commands]:
+        """Registers due for refresh, stalest first"""
+        if now is None:
+            now = self._clock()
+        ranked = []
+        for command in self.commands:
+            if self._retry_at[command_code(command)] > now:
+                continue
+            staleness = self.staleness(command, now)
+            if staleness >= 1.0:
+                ranked.append((staleness, command))
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        return [command for _, command in ranked]
+
+    def refresh(self, max_reads: Optional[int] = None, budget=None) -> List[NPB1700Commands]:
+        """
+        Read the stalest due registers in one burst.
+        Limited by max_reads and/or the bits left in a BusBudget window, which the reads are
+        charged to (unless the budget already sees driver frames as its traffic monitor).
+        Registers which don't answer are backed off, replies of the others are kept.
+        Returns refreshed commands.
+        """
+        selected = self.due()
+        if max_reads is not None:
+            selected = selected[:max_reads]
+        if budget is not None:
+            allowed = budget.available_bits()
+            limited = []
+            for command in selected:
+                allowed -= transaction_bits(command)
+                if allowed < 0:
+                    break
+                limited.append(command)
+            selected = limited
+            if getattr(self.service.driver, 'traffic_monitor', None) is not budget:
+                budget.charge(sum(transaction_bits(command) for command in selected))
+        if not selected:
+            return []
+
+        try:
+            replies = self.service.driver.read_burst(selected)
+            missing = []
+        except NPBMissingReplyError as e:
+            replies, missing = e.replies, e.missing
+        now = self._clock()
+        for msg in replies.values():
+            self.store_message(msg, now)
+        for command in missing:
+            self.missed(command, now)
+        return list(replies)
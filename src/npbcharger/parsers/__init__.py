@@ -1,9 +1,51 @@
-from .factories.base_factory import ParserFactory
-from .curve_config import CurveConfigParser
-from .electric_data import ElectricDataParser
-from .fault_status import FaultStatusParser, FaultStatus
-from .charge_status import ChargeStatusParser, ChargeStatus
-from .system_config import SystemConfigParser
-from .system_status import SystemStatusParser, SystemStatus
-from .base import BaseParser
-from .bytes_forward import BytesForward
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+# Public name -> submodule which defines it.
+# Submodules are imported on first attribute access, so importing the
+# package (or only ParserFactory) doesn't build every parser class
+_LAZY_ATTRIBUTES = {
+    "ParserFactory": ".factories.base_factory",
+    "ParserRegistry": ".factories.base_factory",
+    "CurveConfigParser": ".curve_config",
+    "ElectricDataParser": ".electric_data",
+    "FaultStatusParser": ".fault_status",
+    "FaultStatus": ".fault_status",
+    "ChargeStatusParser": ".charge_status",
+    "ChargeStatus": ".charge_status",
+    "SystemConfigParser": ".system_config",
+    "SystemStatusParser": ".system_status",
+    "SystemStatus": ".system_status",
+    "ScalingFactorParser": ".scaling_factor",
+    "scaling_from_fields": ".scaling_factor",
+    "BaseParser": ".base",
+    "BytesForward": ".bytes_forward",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+if TYPE_CHECKING:
+    from .factories.base_factory import ParserFactory, ParserRegistry
+    from .curve_config import CurveConfigParser
+    from .electric_data import ElectricDataParser
+    from .fault_status import FaultStatusParser, FaultStatus
+    from .charge_status import ChargeStatusParser, ChargeStatus
+    from .system_config import SystemConfigParser
+    from .system_status import SystemStatusParser, SystemStatus
+    from .scaling_factor import ScalingFactorParser, scaling_from_fields
+    from .base import BaseParser
+    from .bytes_forward import BytesForward
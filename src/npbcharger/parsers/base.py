@@ -1,14 +1,16 @@
 from abc import ABC, abstractmethod
 from enum import Flag
-from typing import Any, Dict, List
-from can import Message
+from typing import TYPE_CHECKING, Any, Dict, List
+
+if TYPE_CHECKING:
+    from can import Message
 
 
 class BaseParser(ABC):
     """Abstract base class for all parsers"""
 
     @abstractmethod
-    def parse_read(self, msg: Message) -> Any:
+    def parse_read(self, msg: 'Message') -> Any:
         """Parse response message into meaningful data"""
         pass
 
@@ -1,8 +1,10 @@
-from typing import Any
-from can import Message
+from typing import TYPE_CHECKING, Any
 from .base import BaseParser
 from ..commands import COMMAND_LEN
 
+if TYPE_CHECKING:
+    from can import Message
+
 
 class BytesForward(BaseParser):
     """
@@ -14,7 +16,7 @@ class BytesForward(BaseParser):
     def __init__(self, data_len: int = 6):
         self.raw_data_len = COMMAND_LEN + data_len
 
-    def parse_read(self, msg: Message) -> bytearray:
+    def parse_read(self, msg: 'Message') -> bytearray:
         # Check total message length
         if len(msg.data) < self.raw_data_len:
             raise ValueError(
@@ -1,8 +1,14 @@
-from typing import Any, Dict, Optional
-from can import Message
+from fractions import Fraction
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
 from .base import BaseParser
 from ..commands import COMMAND_LEN, CURVE_F
 
+if TYPE_CHECKING:
+    from can import Message
+
+# Fixed point values are integers in hundredths of unit (centivolts, centiamps, ...)
+FIXED_POINT_SCALE: int = 100
+
 
 class ElectricDataParser(BaseParser):
     scaling_factor: float
@@ -15,7 +21,16 @@ class ElectricDataParser(BaseParser):
         self.constraints = constraints or {}
         self.raw_data_len = raw_data_len
 
-    def parse_read(self, msg: Message) -> float:
+        # Register LSB in fixed point units as exact fraction (0.01 -> 1, 0.1 -> 10, 0.001 -> 1/10)
+        lsb = Fraction(str(scaling_factor)) * FIXED_POINT_SCALE
+        self._lsb_num = lsb.numerator
+        self._lsb_den = lsb.denominator
+        min_v = self.constraints.get('min')
+        max_v = self.constraints.get('max')
+        self._min_fixed = None if min_v is None else round(min_v * FIXED_POINT_SCALE)
+        self._max_fixed = None if max_v is None else round(max_v * FIXED_POINT_SCALE)
+
+    def parse_read(self, msg: 'Message') -> float:
         raw_data_address = msg.data
         if len(raw_data_address) < self.raw_data_len:
             raise ValueError("Fault status data too short")
@@ -35,5 +50,52 @@ class ElectricDataParser(BaseParser):
             data = min(data, max_v)
 
         data = round(data, 2)
-        raw_value = int(data / self.scaling_factor)
+        # Round instead of truncating: 0.29 / 0.01 is 28.999999999999996
+        raw_value = int(round(data / self.scaling_factor))
         return bytearray(raw_value.to_bytes(self.raw_data_len - COMMAND_LEN, byteorder='little'))
+
+    # Fixed point API: integers in 1/FIXED_POINT_SCALE units, no float math
+    def parse_read_fixed(self, msg: 'Message') -> int:
+        """Parse response message into value in hundredths of unit"""
+        if len(msg.data) < self.raw_data_len:
+            raise ValueError("Electric data too short")
+        return self.decode_fixed(msg.data[COMMAND_LEN:self.raw_data_len])
+
+    def parse_write_fixed(self, value: int) -> bytearray:
+        """Encode value given in hundredths of unit, clamped to constraints"""
+        if self._min_fixed is not None and value < self._min_fixed:
+            value = self._min_fixed
+        if self._max_fixed is not None and value > self._max_fixed:
+            value = self._max_fixed
+        # Round half up to the nearest register LSB
+        raw_value = (2 * value * self._lsb_den + self._lsb_num) // (2 * self._lsb_num)
+        return bytearray(raw_value.to_bytes(self.raw_data_len - COMMAND_LEN, byteorder='little'))
+
+    def decode_fixed(self, payload: bytes) -> int:
+        """Decode raw payload (without command code) into hundredths of unit"""
+        raw_value = int.from_bytes(payload, byteorder='little')
+        return raw_value * self._lsb_num // self._lsb_den
+
+    def encode_batch_fixed(self, values: Iterable[int]) -> List[bytearray]:
+        """Encode many setpoints in hundredths of unit"""
+        size = self.raw_data_len - COMMAND_LEN
+        low, high = self._min_fixed, self._max_fixed
+        num2, den2 = 2 * self._lsb_num, 2 * self._lsb_den
+        num = self._lsb_num
+        encoded = []
+        for value in values:
+            if low is not None and value < low:
+                value = low
+            if high is not None and value > high:
+                value = high
+            raw_value = (value * den2 + num) // num2
+            encoded.append(bytearray(raw_value.to_bytes(size, byteorder='little')))
+        return encoded
+
+    def decode_batch_fixed(self, payloads: Iterable[bytes]) -> List[int]:
+        """Decode many raw payloads (without command code) into hundredths of unit"""
+        num = self._lsb_num
+        den = self._lsb_den
+        if den == 1:
+            return [int.from_bytes(payload, byteorder='little') * num for payload in payloads]
+        return [int.from_bytes(payload, byteorder='little') * num // den for payload in payloads]
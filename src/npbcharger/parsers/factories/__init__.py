@@ -1,3 +1,3 @@
-from .base_factory import ParserFactory
+from .base_factory import ParserFactory, ParserRegistry, MODEL_LIMITS
 from .status_factory import StatusParserFactory, Severity, Polarity
 from .config_factory import ConfigParserFactory, FieldType
@@ -1,59 +1,171 @@
-from typing import Dict, Optional
-from ...commands import NPB1700Commands
+from typing import Dict, Optional, Tuple
+from ...commands import CURVE_F, NPB1700Commands
 from ..base import BaseParser
 
+# Limits of electric registers per model: command -> (min, max).
+# Only models whose ranges are verified against the datasheet are shipped, they clamp
+# write setpoints. Other models (e.g. NPB-1700-12, -48) are registered by the
+# application with ParserFactory.register_model(), unregistered models are rejected
+MODEL_LIMITS: Dict[str, Dict[NPB1700Commands, Tuple[float, float]]] = {
+    "NPB-1700-24": {
+        NPB1700Commands.CURVE_CC: (10.0, 50.0),
+        NPB1700Commands.CURVE_TC: (2.0, 15.0),
+        NPB1700Commands.READ_IOUT: (0.0, 60.0),
+        NPB1700Commands.CHG_RST_VBAT: (21.0, 42.0),
+        NPB1700Commands.CURVE_CV: (21.0, 42.0),
+        NPB1700Commands.CURVE_FV: (21.0, 42.0),
+        NPB1700Commands.READ_VOUT: (0.0, 42.0),
+    },
+}
+DEFAULT_MODEL = "NPB-1700-24"
+# Registers every model's limits must cover
+LIMITED_COMMANDS: Tuple[NPB1700Commands, ...] = tuple(MODEL_LIMITS[DEFAULT_MODEL])
+
+
+def normalize_model_id(model_id: str) -> str:
+    """Strip padding which MFR_MODEL registers carry"""
+    return model_id.replace("\x00", "").strip().upper()
+
+
+def build_parsers(limits: Dict[NPB1700Commands, Tuple[float, float]],
+                  voltage_factor: float = CURVE_F,
+                  current_factor: float = CURVE_F) -> Dict[NPB1700Commands, BaseParser]:
+    """
+    Create parser instances for every supported command from model limits
+    and voltage/current scaling factors (see SCALING_FACTOR register)
+    """
+    # Local imports prevent circular dependency errors during module load
+    from ..electric_data import ElectricDataParser
+    from ..fault_status import FaultStatusParser
+    from ..charge_status import ChargeStatusParser
+    from ..curve_config import CurveConfigParser
+    from ..system_config import SystemConfigParser
+    from ..system_status import SystemStatusParser
+    from ..bytes_forward import BytesForward
+    from ..scaling_factor import ScalingFactorParser
+
+    def electric(command: NPB1700Commands, scaling_factor: float) -> ElectricDataParser:
+        min_v, max_v = limits[command]
+        return ElectricDataParser(constraints={'min': min_v, 'max': max_v}, scaling_factor=scaling_factor)
+
+    return {
+        # Electric data read/write
+        NPB1700Commands.CURVE_CC: electric(NPB1700Commands.CURVE_CC, current_factor),
+        NPB1700Commands.CURVE_TC: electric(NPB1700Commands.CURVE_TC, current_factor),
+        NPB1700Commands.READ_IOUT: electric(NPB1700Commands.READ_IOUT, current_factor),
+
+        NPB1700Commands.CHG_RST_VBAT: electric(NPB1700Commands.CHG_RST_VBAT, voltage_factor),
+        NPB1700Commands.CURVE_CV: electric(NPB1700Commands.CURVE_CV, voltage_factor),
+        NPB1700Commands.CURVE_FV: electric(NPB1700Commands.CURVE_FV, voltage_factor),
+        NPB1700Commands.READ_VOUT: electric(NPB1700Commands.READ_VOUT, voltage_factor),
+
+        NPB1700Commands.READ_TEMPERATURE_1: ElectricDataParser(constraints={'min': -40.0, 'max': 110.0}, scaling_factor=0.1),
+
+        # Meaningful values on timeouts
+        NPB1700Commands.CURVE_CC_TIMEOUT: ElectricDataParser(constraints={'min': 60.0, 'max': 64800.0}, scaling_factor=1),
+        NPB1700Commands.CURVE_CV_TIMEOUT: ElectricDataParser(constraints={'min': 60.0, 'max': 64800.0}, scaling_factor=1),
+        NPB1700Commands.CURVE_FV_TIMEOUT: ElectricDataParser(constraints={'min': 60.0, 'max': 64800.0}, scaling_factor=1),
+
+        NPB1700Commands.OPERATION: ElectricDataParser(constraints={'min': 0.0, 'max': 1.0}, scaling_factor=1, raw_data_len=3),
+
+        # Model id. 2 (command) + 6 (param) = 8 bytes len
+        NPB1700Commands.MFR_MODEL_B0B5: BytesForward(),
+        NPB1700Commands.MFR_MODEL_B6B11: BytesForward(),
+
+        # Status
+        NPB1700Commands.FAULT_STATUS: FaultStatusParser(),
+        NPB1700Commands.CHG_STATUS: ChargeStatusParser(),
+        NPB1700Commands.SYSTEM_STATUS: SystemStatusParser(),
+
+        # Config
+        NPB1700Commands.CURVE_CONFIG: CurveConfigParser(),
+        NPB1700Commands.SYSTEM_CONFIG: SystemConfigParser(),
+        NPB1700Commands.SCALING_FACTOR: ScalingFactorParser(),
+    }
+
+
+class ParserRegistry:
+    """Parser set of one device model and scaling. Lookup is a single dict access"""
+
+    def __init__(self, model_id: str, parsers: Dict[NPB1700Commands, BaseParser],
+                 voltage_factor: float = CURVE_F, current_factor: float = CURVE_F):
+        self.model_id = model_id
+        self.voltage_factor = voltage_factor
+        self.current_factor = current_factor
+        self._parsers = parsers
+
+    def get_parser(self, command: NPB1700Commands) -> BaseParser:
+        try:
+            return self._parsers[command]
+        except (KeyError, TypeError):
+            raise ValueError(
+                f"No parser available for command {command.name} (0x{command.value.hex()})") from None
+
 
 class ParserFactory:
+    # Parsers of DEFAULT_MODEL used by get_parser()
     _parsers: Optional[Dict[NPB1700Commands, BaseParser]] = None
+    # Registries shared between all drivers of the same model and scaling
+    _registries: Dict[Tuple[str, float, float], ParserRegistry] = {}
 
     @classmethod
     def get_parser(cls, command: NPB1700Commands) -> BaseParser:
 
         if cls._parsers is None:
-            # Perform imports and creation (Lazy Loading)
-            # Local imports prevent circular dependency errors during module load
-            from ..electric_data import ElectricDataParser
-            from ..fault_status import FaultStatusParser
-            from ..charge_status import ChargeStatusParser
-            from ..curve_config import CurveConfigParser
-            from ..system_config import SystemConfigParser
-            from ..system_status import SystemStatusParser
-            from ..bytes_forward import BytesForward
-            cls._parsers = {
-                # Electric data read/write
-                NPB1700Commands.CURVE_CC: ElectricDataParser(constraints={'min': 10.0, 'max': 50.0}, scaling_factor=0.01),
-                NPB1700Commands.READ_IOUT: ElectricDataParser(constraints={'min': 0.0, 'max': 60.0}, scaling_factor=0.01),
-
-                NPB1700Commands.CHG_RST_VBAT: ElectricDataParser(constraints={'min': 21.0, 'max': 42.0}, scaling_factor=0.01),
-                NPB1700Commands.CURVE_CV: ElectricDataParser(constraints={'min': 21.0, 'max': 42.0}, scaling_factor=0.01),
-                NPB1700Commands.CURVE_FV: ElectricDataParser(constraints={'min': 21.0, 'max': 42.0}, scaling_factor=0.01),
-                NPB1700Commands.READ_VOUT: ElectricDataParser(constraints={'min': 0.0, 'max': 42.0}, scaling_factor=0.01),
-
-                NPB1700Commands.READ_TEMPERATURE_1: ElectricDataParser(constraints={'min': -40.0, 'max': 110.0}, scaling_factor=0.1),
-
-                # Meaningful values on timeouts
-                NPB1700Commands.CURVE_CC_TIMEOUT: ElectricDataParser(constraints={'min': 60.0, 'max': 64800.0}, scaling_factor=1),
-                NPB1700Commands.CURVE_CV_TIMEOUT: ElectricDataParser(constraints={'min': 60.0, 'max': 64800.0}, scaling_factor=1),
-                NPB1700Commands.CURVE_FV_TIMEOUT: ElectricDataParser(constraints={'min': 60.0, 'max': 64800.0}, scaling_factor=1),
-
-                NPB1700Commands.OPERATION: ElectricDataParser(constraints={'min': 0.0, 'max': 1.0}, scaling_factor=1, raw_data_len=3),
-
-                # Model id. 2 (command) + 6 (param) = 8 bytes len
-                NPB1700Commands.MFR_MODEL_B0B5: BytesForward(),
-                NPB1700Commands.MFR_MODEL_B6B11: BytesForward(),
-
-                # Status
-                NPB1700Commands.FAULT_STATUS: FaultStatusParser(),
-                NPB1700Commands.CHG_STATUS: ChargeStatusParser(),
-                NPB1700Commands.SYSTEM_STATUS: SystemStatusParser(),
-
-                # Config
-                NPB1700Commands.CURVE_CONFIG: CurveConfigParser(),
-                NPB1700Commands.SYSTEM_CONFIG: SystemConfigParser(),
-            }
+            # Lazy Loading
+            cls._parsers = build_parsers(MODEL_LIMITS[DEFAULT_MODEL])
 
         if command not in cls._parsers:
             raise ValueError(
                 f"No parser available for command {command.name} (0x{command.value.hex()})")
 
         return cls._parsers[command]
+
+    @classmethod
+    def register_model(cls, model_id: str, limits: Dict[NPB1700Commands, Tuple[float, float]]) -> str:
+        """
+        Add (or replace) limits of a model, e.g. from its datasheet, so for_model() accepts it.
+        Returns normalized model id
+
+        :raises ValueError: if limits miss a limited register or a range is inverted
+        """
+        missing = [command.name for command in LIMITED_COMMANDS if command not in limits]
+        if missing:
+            raise ValueError(f"Limits miss {', '.join(missing)}")
+        for command, (min_v, max_v) in limits.items():
+            if min_v > max_v:
+                raise ValueError(f"Limits of {command.name} are inverted: {min_v} > {max_v}")
+        model = normalize_model_id(model_id)
+        MODEL_LIMITS[model] = dict(limits)
+        # Registries built from previous limits of the model are dropped
+        for key in [key for key in cls._registries if key[0] == model]:
+            del cls._registries[key]
+        if model == DEFAULT_MODEL:
+            cls._parsers = None
+        return model
+
+    @classmethod
+    def for_model(cls, model_id: str, voltage_factor: Optional[float] = None,
+                  current_factor: Optional[float] = None) -> ParserRegistry:
+        """
+        Parser registry of given model (as returned by get_model_id()) and scaling factors
+        (as decoded from SCALING_FACTOR, None means default 0.01).
+        Created once per identity and shared afterwards
+
+        :raises ValueError: if the model is neither shipped nor registered (see register_model)
+        """
+        model = normalize_model_id(model_id)
+        voltage_factor = CURVE_F if voltage_factor is None else voltage_factor
+        current_factor = CURVE_F if current_factor is None else current_factor
+        key = (model, voltage_factor, current_factor)
+
+        registry = cls._registries.get(key)
+        if registry is None:
+            if model not in MODEL_LIMITS:
+                known = ", ".join(MODEL_LIMITS)
+                raise ValueError(f"Unknown model '{model}'. Known models: {known}, "
+                                 "others need ParserFactory.register_model()")
+            parsers = build_parsers(MODEL_LIMITS[model], voltage_factor, current_factor)
+            registry = ParserRegistry(model, parsers, voltage_factor, current_factor)
+            cls._registries[key] = registry
+        return registry
@@ -1,8 +1,10 @@
 from enum import Enum
-from typing import Any, Dict, Type
-from can import Message
+from typing import TYPE_CHECKING, Any, Dict, Type
 from ..base import BaseParser
 
+if TYPE_CHECKING:
+    from can import Message
+
 
 class FieldType(Enum):
     FLAG = "flag"
@@ -28,7 +30,7 @@ class ConfigParserFactory:
             # Add new field
             CONFIG = config
 
-            def parse_read(self, msg: Message) -> Dict:
+            def parse_read(self, msg: 'Message') -> Dict:
                 """Parse response message into field values"""
                 if len(msg.data) < 4:
                     raise ValueError(f"{parser_name} data too short")
@@ -1,9 +1,13 @@
 # NOTE: for status parsers: prefer to use flags when there is no bitfields in configuration description.
+import threading
 from enum import Flag, Enum
-from typing import Any, Dict, List, Type
-from can import Message
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, Optional, Type
 from ..base import BaseParser
 
+if TYPE_CHECKING:
+    from can import Message
+
 
 class Severity(Enum):
     CRITICAL = "critical"
@@ -16,6 +20,11 @@ class Polarity(Enum):
     ACTIVE_LOW = "active_low"    # 1 = normal/good
 
 
+# Distinct raw words remembered per parser instance.
+# Only a handful of words ever appear on a healthy fleet
+DEFAULT_STATUS_MEMO_SIZE: int = 256
+
+
 class StatusParserFactory:
     """Factory for creating READ-ONLY status parsers using Flag enums"""
 
@@ -35,27 +44,96 @@ class StatusParserFactory:
             STATUS_METADATA = status_config
             STATUS_ENUM = enum_class
 
-            def parse_read(self, msg: Message) -> Dict:
+            def __init__(self, memo_size: int = DEFAULT_STATUS_MEMO_SIZE, prefill: Iterable[int] = ()):
+                """
+                :param memo_size: number of raw words whose decoded result is kept
+                :param prefill: raw words to decode up front, e.g. known idle/charging words
+                """
+                self.memo_size = memo_size
+                # raw word -> read-only result, oldest entries are dropped first.
+                # Parsers are shared between services and threads, the memo is guarded by a lock
+                self._memo: Dict[int, Mapping[str, Any]] = {}
+                self._memo_lock = threading.Lock()
+                self.prefill(prefill)
+
+            def prefill(self, status_words: Iterable[int]) -> None:
+                """Decode given raw words into the memo"""
+                for status_word in status_words:
+                    self.parse_word(status_word)
+
+            def parse_read(self, msg: 'Message') -> Mapping[str, Any]:
                 """Parse response message into status information"""
                 if len(msg.data) < 4:
                     raise ValueError(f"{parser_name} data too short")
 
                 status_bytes = msg.data[2:4]
                 status_word = int.from_bytes(status_bytes, byteorder='little')
-
+                return self.parse_word(status_word)
+
+            def parse_word(self, status_word: int) -> Mapping[str, Any]:
+                """
+                Parse raw 16-bit status word into read-only status information
+                (active_states is a tuple of read-only states).
+                Results are memoized by raw word, so repeated words cost a single dict lookup.
+                Use dict(result) for a mutable copy
+                """
+                with self._memo_lock:
+                    result = self._memo.get(status_word)
+                    if result is None:
+                        result = self._decode_word(status_word)
+                        if self.memo_size > 0:
+                            while len(self._memo) >= self.memo_size:
+                                del self._memo[next(iter(self._memo))]
+                            self._memo[status_word] = result
+                    return result
+
+            def _decode_word(self, status_word: int) -> Mapping[str, Any]:
                 # Create Flag enum from status word
                 status_flags = enum_class(0)
                 for flag in enum_class:
                     if self._is_flag_active(status_word, flag):
                         status_flags |= flag
 
-                return {
+                active_states = tuple(MappingProxyType(state) for state in self._get_active_states(status_flags))
+                return MappingProxyType({
                     "raw_value": status_word,
                     "status": status_flags,
-                    "active_states": self._get_active_states(status_flags),
+                    "active_states": active_states,
+                    "severities": frozenset(
+                        state["severity"] for state in active_states if state["severity"] is not None),
                     "has_warnings": self._has_warnings(status_flags),
                     "has_critical": self._has_critical(status_flags),
-                }
+                })
+
+            def parse_transitions(self, previous_word: Optional[int], status_word: int) -> List[Dict]:
+                """
+                Get states which changed between two raw status words.
+                Only bits that differ are inspected, so equal words cost a single XOR.
+                If previous_word is None every currently active state is reported as set.
+                """
+                if previous_word is None:
+                    changed_bits = ~0
+                else:
+                    changed_bits = previous_word ^ status_word
+                    if not changed_bits:
+                        return []
+
+                transitions = []
+                for state in self.STATUS_ENUM:
+                    if not changed_bits & state.value:
+                        continue
+                    active = self._is_flag_active(status_word, state)
+                    if previous_word is None and not active:
+                        continue
+                    metadata = self.STATUS_METADATA.get(state, {})
+                    transitions.append({
+                        "state": state,
+                        "active": active,
+                        "name": metadata.get("name", state.name),
+                        "description": metadata.get("description", ""),
+                        "severity": metadata.get("severity")
+                    })
+                return transitions
 
             def _is_flag_active(self, status_word: int, flag: Flag) -> bool:
                 """Check if a flag is active considering its polarity"""
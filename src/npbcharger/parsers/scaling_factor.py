@@ -0,0 +1,59 @@
+from typing import Dict, Optional
+from .factories.config_factory import FieldType, ConfigParserFactory
+
+# Factor code -> multiplier of raw register value. 0 means "not supported"
+SCALING_CODES = {
+    0x4: 0.001,
+    0x5: 0.01,
+    0x6: 0.1,
+    0x7: 1.0,
+    0x8: 10.0,
+    0x9: 100.0,
+}
+
+SCALING_FACTOR = {
+    # Low byte fields
+    "VOUT_FACTOR": {
+        "type": FieldType.BITS,
+        "mask": 0x000F,  # Bits 0-3 of low byte
+        "shift": 0,
+        "name": "Output voltage scaling factor",
+        "description": "Factor of VOUT related registers",
+        "values": SCALING_CODES,
+    },
+    "IOUT_FACTOR": {
+        "type": FieldType.BITS,
+        "mask": 0x00F0,  # Bits 4-7 of low byte
+        "shift": 4,
+        "name": "Output current scaling factor",
+        "description": "Factor of IOUT related registers",
+        "values": SCALING_CODES,
+    },
+    # High byte field
+    "VIN_FACTOR": {
+        "type": FieldType.BITS,
+        "mask": 0x0F00,  # Bits 0-3 of high byte
+        "shift": 8,
+        "name": "Input voltage scaling factor",
+        "description": "Factor of VIN related registers",
+        "values": SCALING_CODES,
+    },
+}
+
+ScalingFactorParser = ConfigParserFactory.create_parser(
+    "ScalingFactorParser",
+    SCALING_FACTOR,
+    # No enum_class parameter for field-based parsers
+)
+
+
+def scaling_from_fields(fields: Dict) -> Dict[str, Optional[float]]:
+    """
+    Get voltage/current multipliers from parsed SCALING_FACTOR fields.
+    Unsupported (unknown) codes give None so defaults may be used instead.
+    """
+    def factor(field_name: str) -> Optional[float]:
+        value = fields.get(field_name)
+        return value if isinstance(value, float) else None
+
+    return {"voltage": factor("VOUT_FACTOR"), "current": factor("IOUT_FACTOR")}
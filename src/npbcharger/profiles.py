@@ -0,0 +1,237 @@
+import json
+from typing import Any, Dict, Iterator, List, Mapping, Optional
+from .commands import COMMAND_DATA_LEN, NPB1700Commands
+from .parsers import ParserFactory
+
+# Profile attribute -> register it is written to
+PROFILE_REGISTERS: Dict[str, NPB1700Commands] = {
+    "constant_current": NPB1700Commands.CURVE_CC,
+    "constant_voltage": NPB1700Commands.CURVE_CV,
+    "float_voltage": NPB1700Commands.CURVE_FV,
+    "taper_current": NPB1700Commands.CURVE_TC,
+    "restart_voltage": NPB1700Commands.CHG_RST_VBAT,
+    "cc_timeout": NPB1700Commands.CURVE_CC_TIMEOUT,
+    "cv_timeout": NPB1700Commands.CURVE_CV_TIMEOUT,
+    "fv_timeout": NPB1700Commands.CURVE_FV_TIMEOUT,
+}
+
+# Register image: command -> raw payload (without command code)
+RegisterImage = Mapping[NPB1700Commands, bytes]
+
+
+class ChargingProfile:
+    """
+    Charging preset for a battery chemistry.
+    Every setting is optional, registers of unset settings are left as they are on the device.
+    curve_config holds CURVE_CONFIG fields by name (e.g. {"CUVS": 0, "TCS": 2, "CUVE": True}).
+    """
+
+    def __init__(self, name: str, chemistry: str = "",
+                 constant_current: Optional[float] = None,
+                 constant_voltage: Optional[float] = None,
+                 float_voltage: Optional[float] = None,
+                 taper_current: Optional[float] = None,
+                 restart_voltage: Optional[float] = None,
+                 cc_timeout: Optional[int] = None,
+                 cv_timeout: Optional[int] = None,
+                 fv_timeout: Optional[int] = None,
+                 curve_config: Optional[Dict[str, Any]] = None,
+                 description: str = ""):
+        self.name = name
+        self.chemistry = chemistry
+        self.description = description
+        self.constant_current = constant_current
+        self.constant_voltage = constant_voltage
+        self.float_voltage = float_voltage
+        self.taper_current = taper_current
+        self.restart_voltage = restart_voltage
+        self.cc_timeout = cc_timeout
+        self.cv_timeout = cv_timeout
+        self.fv_timeout = fv_timeout
+        self.curve_config = dict(curve_config or {})
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ChargingProfile):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"ChargingProfile({self.name!r}, chemistry={self.chemistry!r})"
+
+    # Serialization
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"name": self.name, "chemistry": self.chemistry}
+        if self.description:
+            data["description"] = self.description
+        for attribute in PROFILE_REGISTERS:
+            value = getattr(self, attribute)
+            if value is not None:
+                data[attribute] = value
+        if self.curve_config:
+            data["curve_config"] = dict(self.curve_config)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> 'ChargingProfile':
+        known = set(PROFILE_REGISTERS) | {"name", "chemistry", "description", "curve_config"}
+        unknown = set(data).difference(known)
+        if unknown:
+            raise ValueError(f"Unknown profile settings: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), sort_keys=True)
+
+    @classmethod
+    def from_json(cls, text: str) -> 'ChargingProfile':
+        return cls.from_dict(json.loads(text))
+
+    # Registers
+    def registers(self) -> Dict[NPB1700Commands, Any]:
+        """Setter values of every register this profile defines"""
+        values: Dict[NPB1700Commands, Any] = {}
+        for attribute, command in PROFILE_REGISTERS.items():
+            value = getattr(self, attribute)
+            if value is not None:
+                values[command] = value
+        if self.curve_config:
+            values[NPB1700Commands.CURVE_CONFIG] = dict(self.curve_config)
+        return values
+
+    def encode(self, image: Optional[RegisterImage] = None,
+               parser_factory=ParserFactory) -> Dict[NPB1700Commands, bytearray]:
+        """
+        Encode profile into raw payloads. Config fields are merged into CURVE_CONFIG
+        from image when it is known, otherwise unset fields are written as zeros.
+        """
+        image = image or {}
+        payloads: Dict[NPB1700Commands, bytearray] = {}
+        for command, value in self.registers().items():
+            parser = parser_factory.get_parser(command)
+            current = image.get(command)
+            if isinstance(value, dict) and current is not None:
+                current_raw = int.from_bytes(current, byteorder='little')
+                payloads[command] = parser.parse_write_update(value, current_raw)
+            else:
+                payloads[command] = parser.parse_write(value)
+        return payloads
+
+    def diff(self, image: RegisterImage, parser_factory=ParserFactory) -> Dict[NPB1700Commands, bytearray]:
+        """Payloads of registers which must be written to bring device with given image to this profile"""
+        return {
+            command: payload
+            for command, payload in self.encode(image, parser_factory).items()
+            if _payload(image, command) != payload
+        }
+
+
+def _payload(image: RegisterImage, command: NPB1700Commands) -> Optional[bytearray]:
+    value = image.get(command)
+    if value is None:
+        return None
+    return bytearray(value[:COMMAND_DATA_LEN[command]])
+
+
+class ProfileStore:
+    """
+    Local collection of charging profiles indexed by name and chemistry,
+    persisted as a single JSON document.
+    Encoded payloads are cached per profile so diffs don't re-encode unchanged profiles,
+    therefore stored profiles should not be mutated: add(profile, replace=True) a new one instead.
+    """
+
+    def __init__(self, profiles: Optional[List[ChargingProfile]] = None):
+        self._profiles: Dict[str, ChargingProfile] = {}
+        self._by_chemistry: Dict[str, Dict[str, ChargingProfile]] = {}
+        self._encoded: Dict[tuple, Dict[NPB1700Commands, bytearray]] = {}
+        for profile in profiles or []:
+            self.add(profile)
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def __iter__(self) -> Iterator[ChargingProfile]:
+        return iter(self._profiles.values())
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._profiles
+
+    def add(self, profile: ChargingProfile, replace: bool = False) -> None:
+        if profile.name in self._profiles:
+            if not replace:
+                raise ValueError(f"Profile '{profile.name}' already exists")
+            self.remove(profile.name)
+        self._profiles[profile.name] = profile
+        self._by_chemistry.setdefault(profile.chemistry, {})[profile.name] = profile
+
+    def remove(self, name: str) -> ChargingProfile:
+        profile = self._profiles.pop(name)
+        chemistry_index = self._by_chemistry[profile.chemistry]
+        del chemistry_index[name]
+        if not chemistry_index:
+            del self._by_chemistry[profile.chemistry]
+        for key in [key for key in self._encoded if key[0] == name]:
+            del self._encoded[key]
+        return profile
+
+    def get(self, name: str) -> ChargingProfile:
+        try:
+            return self._profiles[name]
+        except KeyError:
+            raise KeyError(f"No profile named '{name}'") from None
+
+    def names(self) -> List[str]:
+        return list(self._profiles)
+
+    def by_chemistry(self, chemistry: str) -> List[ChargingProfile]:
+        return list(self._by_chemistry.get(chemistry, {}).values())
+
+    def chemistries(self) -> List[str]:
+        return list(self._by_chemistry)
+
+    def diff(self, name: str, image: RegisterImage,
+             parser_factory=ParserFactory) -> Dict[NPB1700Commands, bytearray]:
+        """Payloads to write to switch device with given image to named profile"""
+        profile = self.get(name)
+        key = (name, parser_factory)
+        encoded = self._encoded.get(key)
+        if encoded is None:
+            # Config fields are merged with device value, so only plain registers are cached
+            encoded = profile.encode(parser_factory=parser_factory)
+            encoded.pop(NPB1700Commands.CURVE_CONFIG, None)
+            self._encoded[key] = encoded
+
+        changes = {
+            command: payload for command, payload in encoded.items()
+            if _payload(image, command) != payload
+        }
+        if profile.curve_config:
+            command = NPB1700Commands.CURVE_CONFIG
+            parser = parser_factory.get_parser(command)
+            current = _payload(image, command)
+            if current is None:
+                payload = parser.parse_write(profile.curve_config)
+            else:
+                current_raw = int.from_bytes(current, byteorder='little')
+                payload = parser.parse_write_update(profile.curve_config, current_raw)
+            if payload != current:
+                changes[command] = payload
+        return changes
+
+    # Persistence
+    def to_json(self) -> str:
+        return json.dumps({"profiles": [profile.to_dict() for profile in self]}, indent=2, sort_keys=True)
+
+    @classmethod
+    def from_json(cls, text: str) -> 'ProfileStore':
+        data = json.loads(text)
+        return cls([ChargingProfile.from_dict(item) for item in data.get("profiles", [])])
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(self.to_json())
+
+    @classmethod
+    def load(cls, path: str) -> 'ProfileStore':
+        with open(path, "r", encoding="utf-8") as file:
+            return cls.from_json(file.read())
@@ -0,0 +1,390 @@
+"""
+Local RPC for sharing one CAN adapter between processes.
+
+RpcServer owns the driver and serves register reads and writes over a Unix domain
+socket, RemoteDriver stands in for NPB1700 on the client side, so NPB1700Service
+works unchanged on top of it (parsers run in the client).
+
+Wire format, little endian:
+    request:  request id u32, op u8, address u8, command code u16, payload length u16, payload
+    response: request id u32, status u8, payload length u16, payload
+Read requests may carry max age (f32 seconds, 0 forces a bus read), read responses
+carry age of the value (f32 seconds) followed by the register payload.
+Requests are pipelined: clients send many before reading responses, which come back
+in completion order and are matched by request id. On the bus, requests of all
+clients are sent one by one at least MIN_REQUEST_PERIOD apart.
+"""
+import asyncio
+import math
+import os
+import socket
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Sequence, Tuple
+from .commands import COMMAND_DATA_LEN, COMMAND_LEN, COMMANDS_BY_CODE, NPB1700Commands
+from .driver import MIN_REQUEST_PERIOD, REPLY_ID_MASK
+from .exceptions import NPBCommunicationError, NPBMissingReplyError, NPBTransportError
+
+if TYPE_CHECKING:
+    from can import Message
+    from .driver import NPB1700
+    from .mirror import RegisterMirror
+
+REQUEST = struct.Struct("<IBBHH")
+RESPONSE = struct.Struct("<IBH")
+AGE = struct.Struct("<f")
+
+OP_PING: int = 0
+OP_READ: int = 1
+OP_WRITE: int = 2
+
+STATUS_OK: int = 0
+STATUS_NO_REPLY: int = 1
+STATUS_BAD_REQUEST: int = 2
+STATUS_ERROR: int = 3
+
+# Controller -> charger id without address byte
+REQUEST_ID_BASE: int = 0x000C0100
+BROADCAST_ADDRESS: int = 0xFF
+
+# Per-user runtime directory, /run for system daemons
+DEFAULT_SOCKET: str = os.path.join(os.environ.get("XDG_RUNTIME_DIR", "/run"), "npbcharger.sock")
+# Only the owner may connect: clients can write charger setpoints
+DEFAULT_SOCKET_MODE: int = 0o600
+
+
+class RpcError(NPBCommunicationError):
+    """Request failed on the server (bad request or server error)"""
+
+
+class RpcServer:
+    """
+    Serves registers of chargers on one bus to local clients.
+    Bus transactions run one at a time on a worker thread. Concurrent reads of
+    the same register of the same charger share one bus transaction, and values
+    younger than the requested max age (mirror refresh interval by default) come
+    from a RegisterMirror per charger without touching the bus. Writes invalidate
+    the mirrored value. Requests are at least MIN_REQUEST_PERIOD apart and replies
+    are matched to requests, as in NPB1700.read_burst.
+
+    :param mode: permissions of the socket file, 0o660 lets the owner's group in
+    """
+
+    def __init__(self, driver: 'NPB1700', path: str = DEFAULT_SOCKET, mode: int = DEFAULT_SOCKET_MODE):
+        self.driver = driver
+        self.path = path
+        self.mode = mode
+        # Host monotonic time when the bus may take next request
+        self._next_request_at: float = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="npb-bus")
+        self._drivers: Dict[int, 'NPB1700'] = {}
+        self._mirrors: Dict[int, 'RegisterMirror'] = {}
+        self._in_flight: Dict[Tuple[int, NPB1700Commands], asyncio.Future] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+        self.requests: int = 0
+        self.bus_reads: int = 0
+        self.cache_hits: int = 0
+        self.coalesced: int = 0
+
+    async def start(self) -> None:
+        # Socket is created without group and other access, so nobody connects before chmod
+        umask = os.umask(0o177)
+        try:
+            self._server = await asyncio.start_unix_server(self._serve_client, path=self.path)
+        finally:
+            os.umask(umask)
+        os.chmod(self.path, self.mode)
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=True)
+        for driver in self._drivers.values():
+            if driver is not self.driver:
+                driver.detach()
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "bus_reads": self.bus_reads,
+                "cache_hits": self.cache_hits, "coalesced": self.coalesced}
+
+    # Connections
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        tasks = set()
+        try:
+            while True:
+                request_id, op, address, code, length = REQUEST.unpack(await reader.readexactly(REQUEST.size))
+                payload = await reader.readexactly(length) if length else b""
+                task = asyncio.ensure_future(self._respond(writer, request_id, op, address, code, payload))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, request_id: int, op: int, address: int,
+                       code: int, payload: bytes) -> None:
+        self.requests += 1
+        try:
+            status, result = STATUS_OK, await self._handle(op, address, code, payload)
+        except NPBCommunicationError as e:
+            status, result = STATUS_NO_REPLY, str(e).encode()
+        except (ValueError, KeyError) as e:
+            status, result = STATUS_BAD_REQUEST, str(e).encode()
+        except Exception as e:  # Reported to the client, the server keeps running
+            status, result = STATUS_ERROR, f"{type(e).__name__}: {e}".encode()
+        if not writer.is_closing():
+            writer.write(RESPONSE.pack(request_id, status, len(result)) + result)
+            await writer.drain()
+
+    async def _handle(self, op: int, address: int, code: int, payload: bytes) -> bytes:
+        if op == OP_PING:
+            return b""
+        command = COMMANDS_BY_CODE.get(code)
+        if command is None:
+            raise ValueError(f"Unknown command code 0x{code:04X}")
+        if op == OP_READ:
+            if address == BROADCAST_ADDRESS:
+                raise ValueError("Cannot read in Broadcast mode")
+            max_age = AGE.unpack(payload)[0] if payload else math.nan
+            age, data = await self._read(address, command, max_age)
+            return AGE.pack(age) + data
+        if op == OP_WRITE:
+            if len(payload) != COMMAND_DATA_LEN[command]:
+                raise ValueError(f"{command.name} payload must be {COMMAND_DATA_LEN[command]} bytes")
+            await self._bus(self._device(address), 'write', command, bytearray(payload))
+            if address == BROADCAST_ADDRESS:
+                for mirror in self._mirrors.values():
+                    mirror.invalidate(command)
+            else:
+                self._mirror(address).invalidate(command)
+            return b""
+        raise ValueError(f"Unknown operation {op}")
+
+    async def _read(self, address: int, command: NPB1700Commands, max_age: float) -> Tuple[float, bytes]:
+        mirror = self._mirror(address)
+        fresh = mirror.staleness(command) < 1.0 if math.isnan(max_age) else mirror.age(command) <= max_age
+        if fresh:
+            self.cache_hits += 1
+            return mirror.age(command), bytes(mirror.payload(command))
+
+        key = (address, command)
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            await asyncio.shield(pending)
+        else:
+            pending = self._in_flight[key] = asyncio.ensure_future(self._bus_read(address, command))
+            try:
+                await pending
+            finally:
+                self._in_flight.pop(key, None)
+        return mirror.age(command), bytes(mirror.payload(command))
+
+    async def _bus_read(self, address: int, command: NPB1700Commands) -> None:
+        self.bus_reads += 1
+        replies = await self._bus(self._device(address), 'read_burst', [command])
+        msg = replies[command]
+        if len(msg.data) < COMMAND_LEN + COMMAND_DATA_LEN[command]:
+            raise NPBCommunicationError(f"Short reply to {command.name}")
+        self._mirror(address).store(command, msg.data[COMMAND_LEN:])
+
+    async def _bus(self, driver: 'NPB1700', method: str, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._transact, driver, method, *args)
+
+    def _transact(self, driver: 'NPB1700', method: str, *args):
+        """Bus transaction on the worker thread, paced by MIN_REQUEST_PERIOD"""
+        delay = self._next_request_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            return getattr(driver, method)(*args)
+        finally:
+            self._next_request_at = max(self._next_request_at, driver.last_sent_at + MIN_REQUEST_PERIOD)
+
+    def _device(self, address: int) -> 'NPB1700':
+        driver = self._drivers.get(address)
+        if driver is None:
+            device_id = REQUEST_ID_BASE | address
+            driver = self.driver if device_id == self.driver.device_id else self.driver.sibling(device_id)
+            self._drivers[address] = driver
+        return driver
+
+    def _mirror(self, address: int) -> 'RegisterMirror':
+        mirror = self._mirrors.get(address)
+        if mirror is None:
+            from .mirror import RegisterMirror
+            from .services import NPB1700Service
+            mirror = self._mirrors[address] = RegisterMirror(
+                NPB1700Service(self._device(address)))
+        return mirror
+
+
+def serve(driver: 'NPB1700', path: str = DEFAULT_SOCKET, mode: int = DEFAULT_SOCKET_MODE) -> None:
+    """Run RpcServer for driver on path until interrupted"""
+    server = RpcServer(driver, path, mode)
+
+    async def run() -> None:
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+class RpcClient:
+    """
+    Blocking client connection. submit() sends a request without waiting,
+    result() waits for the response of given request, so many requests can be in flight.
+    Not thread safe: use one client per thread.
+    """
+
+    def __init__(self, path: str = DEFAULT_SOCKET, timeout: Optional[float] = 5.0):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(path)
+        self._buffer = bytearray()
+        self._responses: Dict[int, Tuple[int, bytes]] = {}
+        self._next_id = 0
+
+    def submit(self, op: int, address: int = 0, command: Optional[NPB1700Commands] = None,
+               payload: bytes = b"") -> int:
+        request_id = self._next_id
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        code = 0 if command is None else int.from_bytes(command.value, byteorder='little')
+        self._socket.sendall(REQUEST.pack(request_id, op, address, code, len(payload)) + payload)
+        return request_id
+
+    def result(self, request_id: int) -> bytes:
+        """Payload of response, raises NPBCommunicationError if charger didn't answer"""
+        while request_id not in self._responses:
+            self._receive()
+        status, payload = self._responses.pop(request_id)
+        if status == STATUS_NO_REPLY:
+            raise NPBCommunicationError(payload.decode())
+        if status != STATUS_OK:
+            raise RpcError(payload.decode())
+        return payload
+
+    def call(self, op: int, address: int = 0, command: Optional[NPB1700Commands] = None,
+             payload: bytes = b"") -> bytes:
+        return self.result(self.submit(op, address, command, payload))
+
+    def _receive(self) -> None:
+        chunk = self._socket.recv(65536)
+        if not chunk:
+            raise NPBTransportError("RPC server closed the connection")
+        self._buffer += chunk
+        while len(self._buffer) >= RESPONSE.size:
+            request_id, status, length = RESPONSE.unpack_from(self._buffer)
+            end = RESPONSE.size + length
+            if len(self._buffer) < end:
+                return
+            self._responses[request_id] = (status, bytes(self._buffer[RESPONSE.size:end]))
+            del self._buffer[:end]
+
+    def close(self) -> None:
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class RemoteDriver:
+    """
+    Driver of one charger served by RpcServer, usable with NPB1700Service.
+    Bursts are pipelined: every request is sent before the first response is awaited.
+
+    :param max_age: accept cached values up to this old (seconds), None uses server refresh intervals
+    """
+
+    def __init__(self, client: RpcClient, device_id: int = 0x000C0103, max_age: Optional[float] = None):
+        self.client = client
+        self.device_id = device_id
+        self.max_age = max_age
+        self.is_broadcast = (device_id & 0xFF) == BROADCAST_ADDRESS
+        self.last_sent_at: float = 0.0
+        self.last_received_at: float = 0.0
+        from can import Message
+        self._message_type = Message
+
+    @property
+    def address(self) -> int:
+        return self.device_id & 0xFF
+
+    def sibling(self, device_id: int) -> 'RemoteDriver':
+        return RemoteDriver(self.client, device_id, self.max_age)
+
+    def read(self, command: NPB1700Commands) -> 'Message':
+        return self._reply(command, self.client.result(self._submit_read(command)))
+
+    def write(self, command: NPB1700Commands, params: bytearray) -> 'Message':
+        self.client.call(OP_WRITE, self.address, command, bytes(params))
+        return self._message_type()
+
+    def read_burst(self, commands: Sequence[NPB1700Commands],
+                   period: float = MIN_REQUEST_PERIOD) -> Dict[NPB1700Commands, 'Message']:
+        """
+        Pipelined reads. Requests are paced by the server at MIN_REQUEST_PERIOD
+        for every client together, so period can't be chosen here and is ignored
+        """
+        if self.is_broadcast:
+            raise NPBCommunicationError("Cannot read when Driver is in Broadcast mode")
+        requests = [(command, self._submit_read(command)) for command in commands]
+        replies: Dict[NPB1700Commands, 'Message'] = {}
+        missing = []
+        for command, request_id in requests:
+            try:
+                replies[command] = self._reply(command, self.client.result(request_id))
+            except (RpcError, NPBTransportError):
+                raise
+            except NPBCommunicationError:
+                missing.append(command)
+        if missing:
+            names = ", ".join(command.name for command in missing)
+            raise NPBMissingReplyError(f"No reply for {names}", replies, missing)
+        return replies
+
+    def write_burst(self, writes: Iterable[Tuple[NPB1700Commands, bytearray]],
+                    period: float = MIN_REQUEST_PERIOD) -> None:
+        """Pipelined writes, paced by the server like read_burst (period is ignored)"""
+        request_ids = [self.client.submit(OP_WRITE, self.address, command, bytes(params))
+                       for command, params in writes]
+        for request_id in request_ids:
+            self.client.result(request_id)
+
+    def received_at(self, msg: 'Message') -> float:
+        return msg.timestamp
+
+    def _submit_read(self, command: NPB1700Commands) -> int:
+        payload = b"" if self.max_age is None else AGE.pack(self.max_age)
+        self.last_sent_at = time.monotonic()
+        return self.client.submit(OP_READ, self.address, command, payload)
+
+    def _reply(self, command: NPB1700Commands, payload: bytes) -> 'Message':
+        self.last_received_at = time.monotonic()
+        age = AGE.unpack_from(payload)[0]
+        # Monotonic clock is shared by processes of one host
+        return self._message_type(timestamp=self.last_received_at - age, arbitration_id=self.device_id & REPLY_ID_MASK,
+                                  is_extended_id=True, data=command.value + payload[AGE.size:])
@@ -0,0 +1,237 @@
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+from .bus_budget import BusBudget
+from .commands import NPB1700Commands
+from .driver import MIN_REQUEST_PERIOD
+from .parsers.charge_status import ChargeStatus
+
+# Telemetry poll period per charge stage, seconds. Stages are checked in this order
+STAGE_PERIODS: Dict[ChargeStatus, float] = {
+    ChargeStatus.CCM: 0.1,
+    ChargeStatus.CVM: 0.25,
+    ChargeStatus.FVM: 2.0,
+    ChargeStatus.FULLM: 5.0,
+}
+# Poll period when no charge stage is reported
+IDLE_PERIOD: float = 1.0
+# Poll period while any warning or critical state is active
+FAULT_PERIOD: float = 0.1
+
+# Whole bus request rate shared by all devices, requests per second
+DEFAULT_REQUEST_BUDGET: float = 400.0
+
+DEFAULT_TELEMETRY = (
+    NPB1700Commands.READ_VOUT,
+    NPB1700Commands.READ_IOUT,
+    NPB1700Commands.READ_TEMPERATURE_1,
+)
+
+# Status registers read on every cycle to pick the stage
+STAGE_COMMANDS = (NPB1700Commands.CHG_STATUS, NPB1700Commands.FAULT_STATUS)
+
+Sample = Tuple[Hashable, NPB1700Commands, Any]
+
+
+class PolledDevice:
+    """Scheduling state of a single charger"""
+
+    def __init__(self, service, commands: Tuple[NPB1700Commands, ...], cycle_cost: Optional[float] = None):
+        self.service = service
+        self.commands = commands
+        # Budget units (requests or bus bits) spent by one poll cycle
+        self.cycle_cost: float = self.requests_per_cycle if cycle_cost is None else cycle_cost
+        self.stage: Optional[ChargeStatus] = None
+        self.faulted: bool = False
+        self.period: float = IDLE_PERIOD
+        self.effective_period: float = IDLE_PERIOD
+        self.next_due: float = 0.0
+        self.status_words: Tuple[Optional[int], Optional[int]] = (None, None)
+
+    @property
+    def requests_per_cycle(self) -> int:
+        return len(STAGE_COMMANDS) + len(self.commands)
+
+    @property
+    def min_period(self) -> float:
+        """Shortest cycle allowed by the per-device request period"""
+        return self.requests_per_cycle * MIN_REQUEST_PERIOD
+
+    @property
+    def demand(self) -> float:
+        """Budget units per second this device asks for at its stage period"""
+        return self.cycle_cost / max(self.period, self.min_period)
+
+
+class PollingScheduler:
+    """
+    Polls many chargers with a per-device period chosen from the decoded charge stage
+    and active faults. When the sum of requested rates exceeds the bus budget
+    devices without faults are slowed down first.
+
+    The budget is either a plain request rate or, when bus_budget is given,
+    the bus bits per second it admits (frame sizes of every command are accounted).
+
+    With timestamps=True sample values are Readings (value with request and reply time)
+    and the raw CHG_STATUS word is reported as a sample too, e.g. for EnergyIntegrator.
+    """
+
+    def __init__(self,
+                 request_budget: float = DEFAULT_REQUEST_BUDGET,
+                 stage_periods: Optional[Dict[ChargeStatus, float]] = None,
+                 idle_period: float = IDLE_PERIOD,
+                 fault_period: float = FAULT_PERIOD,
+                 on_sample: Optional[Callable[[Hashable, NPB1700Commands, Any], None]] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 bus_budget: Optional[BusBudget] = None,
+                 timestamps: bool = False):
+        if request_budget <= 0:
+            raise ValueError("Request budget must be positive")
+        self.request_budget = request_budget
+        self.bus_budget = bus_budget
+        self.stage_periods = dict(STAGE_PERIODS if stage_periods is None else stage_periods)
+        self.idle_period = idle_period
+        self.fault_period = fault_period
+        self.on_sample = on_sample
+        self.timestamps = timestamps
+        self._clock = clock
+        self._devices: Dict[Hashable, PolledDevice] = {}
+
+    # Device set
+    def add_device(self, key: Hashable, service,
+                   commands: Iterable[NPB1700Commands] = DEFAULT_TELEMETRY) -> None:
+        commands = tuple(commands)
+        cycle_cost = None
+        if self.bus_budget is not None:
+            cycle_cost = self.bus_budget.cycle_bits(STAGE_COMMANDS + commands)
+        device = PolledDevice(service, commands, cycle_cost)
+        device.period = self.idle_period
+        device.next_due = self._clock()
+        self._devices[key] = device
+        self._rebalance()
+
+    def remove_device(self, key: Hashable) -> None:
+        del self._devices[key]
+        self._rebalance()
+
+    def devices(self) -> Dict[Hashable, PolledDevice]:
+        return dict(self._devices)
+
+    @property
+    def capacity(self) -> float:
+        """Budget units per second shared by all devices"""
+        if self.bus_budget is not None:
+            return self.bus_budget.capacity
+        return self.request_budget
+
+    def poll_periods(self) -> Dict[Hashable, float]:
+        """Current effective poll period of every device after budget scaling"""
+        return {key: device.effective_period for key, device in self._devices.items()}
+
+    # State
+    def update_status(self, key: Hashable, charge_word: int, fault_word: int) -> None:
+        """Choose device period from raw CHG_STATUS and FAULT_STATUS words"""
+        device = self._devices[key]
+        if device.status_words == (charge_word, fault_word):
+            return
+        device.status_words = (charge_word, fault_word)
+
+        factory = device.service.parser_factory
+        charge = factory.get_parser(NPB1700Commands.CHG_STATUS).parse_word(charge_word)
+        fault = factory.get_parser(NPB1700Commands.FAULT_STATUS).parse_word(fault_word)
+
+        device.stage = None
+        for stage in self.stage_periods:
+            if stage in charge["status"]:
+                device.stage = stage
+                break
+        device.faulted = any(
+            decoded["has_critical"] or decoded["has_warnings"] for decoded in (charge, fault))
+
+        if device.faulted:
+            period = self.fault_period
+        elif device.stage is not None:
+            period = self.stage_periods[device.stage]
+        else:
+            period = self.idle_period
+
+        if period != device.period:
+            # Bring a sped up device forward instead of waiting for the old slot
+            device.next_due = min(device.next_due, self._clock() + period)
+            device.period = period
+            self._rebalance()
+
+    def _rebalance(self) -> None:
+        """Stretch periods so that the total request rate fits in the budget"""
+        capacity = self.capacity
+        urgent = sum(device.demand for device in self._devices.values() if device.faulted)
+        regular = sum(device.demand for device in self._devices.values() if not device.faulted)
+
+        if urgent + regular <= capacity:
+            urgent_scale = regular_scale = 1.0
+        elif urgent < capacity:
+            urgent_scale = 1.0
+            regular_scale = regular / (capacity - urgent)
+        else:
+            urgent_scale = regular_scale = (urgent + regular) / capacity
+
+        for device in self._devices.values():
+            scale = urgent_scale if device.faulted else regular_scale
+            device.effective_period = max(device.period, device.min_period) * scale
+
+    # Polling
+    def next_due(self) -> Optional[float]:
+        """Clock time when the next device should be polled"""
+        if not self._devices:
+            return None
+        return min(device.next_due for device in self._devices.values())
+
+    def poll_device(self, key: Hashable) -> List[Sample]:
+        """Poll a single device now: stage registers first, then telemetry"""
+        device = self._devices[key]
+        service = device.service
+        samples: List[Sample] = []
+        if self.timestamps:
+            charge = service.read_word(NPB1700Commands.CHG_STATUS, with_timestamp=True)
+            fault_word = service.read_word(NPB1700Commands.FAULT_STATUS)
+            self.update_status(key, charge.value, fault_word)
+            self._emit(samples, key, NPB1700Commands.CHG_STATUS, charge)
+        else:
+            charge_word = service.read_word(NPB1700Commands.CHG_STATUS)
+            fault_word = service.read_word(NPB1700Commands.FAULT_STATUS)
+            self.update_status(key, charge_word, fault_word)
+
+        for command in device.commands:
+            if self.timestamps:
+                value = service.read_register(command, with_timestamp=True)
+            else:
+                value = service.read_register(command)
+            self._emit(samples, key, command, value)
+        return samples
+
+    def _emit(self, samples: List[Sample], key: Hashable, command: NPB1700Commands, value: Any) -> None:
+        samples.append((key, command, value))
+        if self.on_sample is not None:
+            self.on_sample(key, command, value)
+
+    def run_once(self, now: Optional[float] = None) -> List[Sample]:
+        """Poll every device which is due and schedule its next cycle"""
+        if now is None:
+            now = self._clock()
+        samples: List[Sample] = []
+        for key, device in list(self._devices.items()):
+            if device.next_due > now:
+                continue
+            samples.extend(self.poll_device(key))
+            device.next_due = now + device.effective_period
+        return samples
+
+    def run(self, should_stop: Callable[[], bool] = lambda: False) -> None:
+        """Poll devices until should_stop() returns True"""
+        while not should_stop():
+            self.run_once()
+            next_due = self.next_due()
+            if next_due is None:
+                return
+            delay = next_due - self._clock()
+            if delay > 0:
+                time.sleep(delay)
@@ -1,64 +1,137 @@
-from asyncio.log import logger
+import logging
 from functools import wraps
-from typing import Any, Dict, Callable, Optional
-from .driver import NPB1700
-from .parsers import ParserFactory
-from .commands import NPB1700Commands
+from typing import Any, AsyncIterator, Dict, Callable, Iterable, List, Mapping, Optional
+from .driver import NPB1700, MIN_REQUEST_PERIOD
+from .parsers import ParserFactory, scaling_from_fields
+from .parsers.factories.base_factory import normalize_model_id
+from .commands import COMMAND_DATA_LEN, COMMAND_LEN, NPB1700Commands
+from .exceptions import NPBVerificationError
+from .events import STATUS_COMMANDS, StatusCallback, StatusChangeTracker, StatusEvent
+from .frame_cache import FRAME_CACHE, FrameCache
+from .timing import Reading
+
+logger = logging.getLogger(__name__)
+
+
+READ_METHOD_TYPES = ('electric', 'bytes', 'status', 'config')
+WRITE_METHOD_TYPES = ('electric', 'config')
+
+
+def _skip_broadcast_read(command: NPB1700Commands) -> None:
+    logger.warning(
+        f"Skipping read for command '{command.name}': "
+        "Cannot read when Driver is in Broadcast mode."
+    )
+
+
+def _timed(driver: NPB1700, value: Any, response) -> Reading:
+    return Reading(value, driver.last_sent_at, driver.received_at(response))
 
 
 def command_reader(command: NPB1700Commands, method_type: str = 'electric'):
     """
     Decorator to handle reading from the driver.
+    Read path is chosen once when the class is defined, so a call costs
+    one broadcast check, one parser table lookup, the bus read and the decode.
+    Getters accept with_timestamp=True to return a Reading instead of bare value.
     :param method_type: 'electric', 'bytes', 'status', 'config'
     """
+    if method_type not in READ_METHOD_TYPES:
+        raise ValueError(f"Unknown read method type: {method_type}")
+
     def decorator(func: Callable) -> Callable:
-         # @wrap substitutes function signature instead of "wrapper" func
-         # leaving body as it is and saving the access to argument through *args, **kwargs
+        # @wrap substitutes function signature instead of "wrapper" func
+        # leaving body as it is and saving the access to argument through *args, **kwargs
+        if method_type == 'bytes':
+            # For byte reads that need decoding by decorated function
+            @wraps(func)
+            def wrapper(self: 'NPB1700Service', *args, with_timestamp: bool = False, **kwargs):
+                driver = self.driver
+                if driver.is_broadcast:
+                    return _skip_broadcast_read(command)
+                parser = self._parsers.get(command) or self._bind_parser(command)
+                response = driver.read(command)
+                value = func(self, parser.parse_read(response), *args, **kwargs)
+                return _timed(driver, value, response) if with_timestamp else value
+            return wrapper
+
+        # 'electric', 'status' and 'config' differ only by parser
         @wraps(func)
-        def wrapper(self: 'NPB1700Service', *args, **kwargs):
-            if self.driver.is_broadcast: 
-                logger.warning(
-                    f"Skipping read for command '{command.name}': "
-                    "Cannot read when Driver is in Broadcast mode."
-                )
-                return None
-            if not(self.driver.is_broadcast):
-                if method_type == 'electric':
-                    return self._read_electric(command)
-                elif method_type == 'bytes':
-                    # For byte reads that need decoding
-                    raw = self._read_bytes(command)
-                    return func(self, raw, *args, **kwargs)
-                elif method_type == 'status':
-                    return self._read_status(command)
-                elif method_type == 'config':
-                    return self._read_config(command)
-                else:
-                    raise ValueError(f"Unknown read method type: {method_type}")
+        def wrapper(self: 'NPB1700Service', *args, with_timestamp: bool = False, **kwargs):
+            driver = self.driver
+            if driver.is_broadcast:
+                return _skip_broadcast_read(command)
+            parser = self._parsers.get(command) or self._bind_parser(command)
+            response = driver.read(command)
+            if with_timestamp:
+                return _timed(driver, parser.parse_read(response), response)
+            return parser.parse_read(response)
         return wrapper
     return decorator
 
 def command_writer(command: NPB1700Commands, method_type: str = 'electric'):
     """
     Decorator to handle writing to the driver.
+    Write path is chosen once when the class is defined.
     """
+    if method_type not in WRITE_METHOD_TYPES:
+        raise ValueError(f"Unknown write method type: {method_type}")
+
     def decorator(func: Callable) -> Callable:
+        if method_type == 'config':
+            @wraps(func)
+            def wrapper(self: 'NPB1700Service', value: Any, *args, **kwargs):
+                return self._write_config(command, value)
+            return wrapper
+
         @wraps(func)
         def wrapper(self: 'NPB1700Service', value: Any, *args, **kwargs):
-            if method_type == 'electric':
-                return self._write_electric(command, value)
-            elif method_type == 'config':
-                return self._write_config(command, value)
-            else:
-                raise ValueError(f"Unknown write method type: {method_type}")
+            parser = self._parsers.get(command) or self._bind_parser(command)
+            self._write_cached(command, parser, value)
         return wrapper
     return decorator
 
 # Service Class
 class NPB1700Service:
-    def __init__(self, driver: NPB1700):
+    """
+    :param driver: NPB1700 driver
+    :param model_id: model whose limits are used by parsers (shipped in MODEL_LIMITS or
+        added with ParserFactory.register_model()),
+        default limits are those of NPB-1700-24. See also use_model()
+    :param calibrate: read SCALING_FACTOR (and model id unless given) from device right away,
+        see calibrate(). Off by default, so construction doesn't touch the bus.
+        Broadcast drivers can't read and are never calibrated
+    :param frame_cache: cache of encoded setpoint frames, shared FRAME_CACHE by default
+    :raises NPBCommunicationError: if calibration reads get no reply
+    :raises ValueError: if no limits are known for the model
+    """
+
+    def __init__(self, driver: NPB1700, model_id: Optional[str] = None, calibrate: bool = False,
+                 frame_cache: Optional[FrameCache] = None):
         self.driver = driver
-        self.parser_factory = ParserFactory()
+        self.frame_cache = FRAME_CACHE if frame_cache is None else frame_cache
+        self.parser_factory = ParserFactory() if model_id is None else ParserFactory.for_model(model_id)
+        self.status_tracker = StatusChangeTracker()
+        if calibrate and not driver.is_broadcast:
+            self.calibrate(model_id)
+
+    @property
+    def parser_factory(self):
+        return self._parser_factory
+
+    @parser_factory.setter
+    def parser_factory(self, factory) -> None:
+        self._parser_factory = factory
+        # command -> parser, filled on first use of each command
+        self._parsers: Dict[NPB1700Commands, Any] = {}
+
+    def _parser(self, command: NPB1700Commands):
+        return self._parsers.get(command) or self._bind_parser(command)
+
+    def _bind_parser(self, command: NPB1700Commands):
+        parser = self._parser_factory.get_parser(command)
+        self._parsers[command] = parser
+        return parser
 
     # Electrical Domain
     @command_writer(NPB1700Commands.CURVE_CC)
@@ -89,6 +162,16 @@ class NPB1700Service:
     def get_float_voltage_curve(self) -> Optional[float]:
         pass
 
+    @command_writer(NPB1700Commands.CURVE_TC)
+    def set_taper_current_curve(self, current: float) -> None:
+        """Set taper (charge termination) current"""
+        pass
+
+    @command_reader(NPB1700Commands.CURVE_TC)
+    def get_taper_current_curve(self) -> Optional[float]:
+        """Get taper (charge termination) current"""
+        pass
+
     @command_writer(NPB1700Commands.CHG_RST_VBAT)
     def set_charge_restart_vbat(self, voltage: float) -> None: pass
 
@@ -157,37 +240,211 @@ class NPB1700Service:
         high = self._read_bytes(NPB1700Commands.MFR_MODEL_B6B11)
         return (low + high).decode('utf-8')
 
+    def use_model(self, model_id: Optional[str] = None) -> str:
+        """
+        Switch parsers to the limits of given model, reading model id from device if not given.
+        Returns normalized model id
+
+        :raises ValueError: if no limits are known for the model (see MODEL_LIMITS)
+        """
+        if model_id is None:
+            model_id = self.get_model_id()
+        self.parser_factory = ParserFactory.for_model(
+            model_id,
+            getattr(self.parser_factory, 'voltage_factor', None),
+            getattr(self.parser_factory, 'current_factor', None))
+        return self.parser_factory.model_id
+
+    def calibrate(self, model_id: Optional[str] = None):
+        """
+        Read model id (unless given) and SCALING_FACTOR once and switch parsers to the shared
+        registry of this device identity (model limits + voltage/current factors).
+        Done on construction with calibrate=True. Returns the registry in use
+
+        :raises ValueError: if no limits are known for the model (see MODEL_LIMITS)
+        """
+        if model_id is None:
+            model_id = self.get_model_id()
+        model_id = normalize_model_id(model_id)
+        scaling = self.read_register(NPB1700Commands.SCALING_FACTOR)
+        factors = scaling_from_fields(scaling["fields"])
+        self.parser_factory = ParserFactory.for_model(model_id, factors["voltage"], factors["current"])
+        return self.parser_factory
+
     def get_operation_status(self) -> bool:
         return bool(self._read_electric(NPB1700Commands.OPERATION))
+
+    def read_register(self, command: NPB1700Commands, with_timestamp: bool = False) -> Any:
+        """Read any register which has a parser and return its decoded value (or Reading)"""
+        response = self.driver.read(command)
+        parser = self._parser(command)
+        if with_timestamp:
+            return _timed(self.driver, parser.parse_read(response), response)
+        return parser.parse_read(response)
+
+    def read_fixed(self, command: NPB1700Commands, with_timestamp: bool = False) -> Any:
+        """Read electric register as integer hundredths of unit (e.g. centivolts)"""
+        parser = self._parser(command)
+        if not hasattr(parser, 'parse_read_fixed'):
+            raise TypeError(f"Parser for {command.name} has no fixed point support")
+        response = self.driver.read(command)
+        if with_timestamp:
+            return _timed(self.driver, parser.parse_read_fixed(response), response)
+        return parser.parse_read_fixed(response)
+
+    def write_fixed(self, command: NPB1700Commands, value: int) -> None:
+        """Write electric register given in integer hundredths of unit (e.g. centiamps)"""
+        parser = self._parser(command)
+        if not hasattr(parser, 'parse_write_fixed'):
+            raise TypeError(f"Parser for {command.name} has no fixed point support")
+        self._write_cached(command, parser, value, fixed=True)
+
+    def read_word(self, command: NPB1700Commands, with_timestamp: bool = False) -> Any:
+        """Read raw 16-bit register value without decoding it"""
+        response = self.driver.read(command)
+        if len(response.data) < 4:
+            raise ValueError(f"{command.name} data too short")
+        status_word = int.from_bytes(response.data[2:4], byteorder='little')
+        if with_timestamp:
+            return _timed(self.driver, status_word, response)
+        return status_word
     
 
+    # Status change subscriptions
+    def subscribe_status(self, callback: StatusCallback,
+                         commands: Iterable[NPB1700Commands] = STATUS_COMMANDS) -> Callable[[], None]:
+        """
+        Call callback on every flag set/clear of given status registers.
+        Events are produced by poll_status_changes() or status_events().
+        Returns function which removes the subscription.
+        """
+        return self.status_tracker.subscribe(callback, commands)
+
+    def poll_status_changes(self, commands: Optional[Iterable[NPB1700Commands]] = None) -> List[StatusEvent]:
+        """
+        Read raw words of status registers and emit events for changed flags only.
+        By default polls registers which have subscribers (all status registers if none).
+        """
+        if self.driver.is_broadcast:
+            logger.warning(
+                "Skipping status poll: Cannot read when Driver is in Broadcast mode.")
+            return []
+        if commands is None:
+            commands = self.status_tracker.watched_commands or STATUS_COMMANDS
+
+        events: List[StatusEvent] = []
+        for command in commands:
+            parser = self._parser(command)
+            status_word = self.read_word(command)
+            events.extend(self.status_tracker.update(command, status_word, parser))
+        return events
+
+    async def status_events(self, period: float = MIN_REQUEST_PERIOD,
+                            commands: Optional[Iterable[NPB1700Commands]] = None) -> AsyncIterator[StatusEvent]:
+        """Asynchronously poll status registers every period seconds and yield change events"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        if commands is not None:
+            commands = tuple(commands)
+        while True:
+            events = await loop.run_in_executor(None, self.poll_status_changes, commands)
+            for event in events:
+                yield event
+            await asyncio.sleep(period)
+
+    # Transactions
+    def apply_profile(self, profile: Any, verify: bool = True, rollback: bool = True,
+                      image: Optional[Mapping[NPB1700Commands, bytes]] = None) -> Dict[NPB1700Commands, bytearray]:
+        """
+        Write several registers as one transaction: read current values in one burst,
+        write only registers which differ, verify them with one more burst and
+        restore previous values if anything did not stick.
+        profile is a ChargingProfile or mapping of command to value given as for setters
+        (number or dict of config fields).
+        If image (command -> raw payload, e.g. from a register mirror) is given,
+        registers it contains are not read before writing.
+        Returns payloads which were written.
+        """
+        if hasattr(profile, 'registers'):
+            profile = profile.registers()
+        if self.driver.is_broadcast:
+            logger.warning(
+                "Applying profile in Broadcast mode: current values can't be read, "
+                "so every register is written and config fields not in profile are reset."
+            )
+            writes = {command: self._encode(command, value) for command, value in profile.items()}
+            self.driver.write_burst(writes.items())
+            return writes
+
+        image = image or {}
+        current = {command: bytearray(image[command]) for command in profile if command in image}
+        missing = [command for command in profile if command not in current]
+        if missing:
+            current.update(self._payloads(self.driver.read_burst(missing)))
+        writes: Dict[NPB1700Commands, bytearray] = {}
+        for command, value in profile.items():
+            encoded = self._encode(command, value, current[command])
+            if encoded != current[command]:
+                writes[command] = encoded
+
+        if not writes:
+            return writes
+        self.driver.write_burst(writes.items())
+        if not verify:
+            return writes
+
+        actual = self._payloads(self.driver.read_burst(list(writes)))
+        mismatches = {
+            command: (expected, actual[command])
+            for command, expected in writes.items() if actual[command] != expected
+        }
+        if mismatches:
+            if rollback:
+                self.driver.write_burst((command, current[command]) for command in writes)
+            names = ", ".join(command.name for command in mismatches)
+            raise NPBVerificationError(
+                f"Registers differ after write: {names}" + (" (rolled back)" if rollback else ""),
+                mismatches)
+        return writes
+
     # Private Helpers
+    def _encode(self, command: NPB1700Commands, value: Any,
+                current_payload: Optional[bytearray] = None) -> bytearray:
+        """Encode setter value, config dicts are merged into current payload when it is known"""
+        parser = self._parser(command)
+        if isinstance(value, dict) and current_payload is not None and hasattr(parser, 'parse_write_update'):
+            current_raw = int.from_bytes(current_payload, byteorder='little')
+            return parser.parse_write_update(value, current_raw)
+        return parser.parse_write(value)
+
+    @staticmethod
+    def _payloads(replies: Mapping[NPB1700Commands, Any]) -> Dict[NPB1700Commands, bytearray]:
+        """Strip command code from burst replies"""
+        return {
+            command: bytearray(msg.data[COMMAND_LEN:COMMAND_LEN + COMMAND_DATA_LEN[command]])
+            for command, msg in replies.items()
+        }
+
     def _read_electric(self, command: NPB1700Commands) -> float:
         response = self.driver.read(command) 
-        parser = self.parser_factory.get_parser(command)
+        parser = self._parser(command)
         return parser.parse_read(response)
 
 
     def _read_bytes(self, command: NPB1700Commands) -> bytearray:
         response = self.driver.read(command)
-        parser = self.parser_factory.get_parser(command)
-        return parser.parse_read(response)
-
-
-    def _read_status(self, command: NPB1700Commands) -> Dict[str, Any]:
-        response = self.driver.read(command)
-        parser = self.parser_factory.get_parser(command)
+        parser = self._parser(command)
         return parser.parse_read(response)
 
 
     def _read_config(self, command: NPB1700Commands) -> Dict[str, Any]:
         response = self.driver.read(command)
-        parser = self.parser_factory.get_parser(command)
+        parser = self._parser(command)
         return parser.parse_read(response)
 
 
     def _write_config(self, command: NPB1700Commands, config_data: Dict[str, Any]) -> None:
-        parser = self.parser_factory.get_parser(command)
+        parser = self._parser(command)
         
         if (self.driver.is_broadcast):
             logger.warning(
@@ -200,7 +457,7 @@ class NPB1700Service:
             self.driver.write(command, to_send)
             return
     
-        current_config = self._read_config(NPB1700Commands.CURVE_CONFIG)
+        current_config = self._read_config(command)
         current_raw = current_config["raw_value"]
         
         if not hasattr(parser, 'parse_write_update'):
@@ -210,6 +467,21 @@ class NPB1700Service:
         self.driver.write(command, to_send)
 
     def _write_electric(self, command: NPB1700Commands, value: float) -> None:
-        parser = self.parser_factory.get_parser(command)
-        to_send = parser.parse_write(value)
-        self.driver.write(command, to_send)
+        self._write_cached(command, self._parser(command), value)
+
+    def _write_cached(self, command: NPB1700Commands, parser, value: Any, fixed: bool = False) -> None:
+        """
+        Send setpoint frame from frame cache, encoding it on miss.
+        Floats are quantized to hundredths as parse_write does, fixed point values are exact.
+        Drivers without prebuilt frame support are written to directly.
+        """
+        driver = self.driver
+        if not hasattr(driver, 'send_frame'):
+            driver.write(command, parser.parse_write_fixed(value) if fixed else parser.parse_write(value))
+            return
+        key = (driver.device_id, command, parser, fixed, value if fixed else round(value, 2))
+        frame = self.frame_cache.get(key)
+        if frame is None:
+            params = parser.parse_write_fixed(value) if fixed else parser.parse_write(value)
+            frame = self.frame_cache.put(key, driver.build_frame(command, params))
+        driver.send_frame(frame)
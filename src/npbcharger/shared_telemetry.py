@@ -0,0 +1,225 @@
+import math
+import os
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+from .commands import COMMANDS_BY_CODE, NPB1700Commands
+from .scheduler import DEFAULT_TELEMETRY, STAGE_COMMANDS
+from .telemetry_log import sample_value
+
+# Segment header: magic, layout version, device count, register count, ring length
+SHM_MAGIC: bytes = b"NPBS"
+SHM_VERSION: int = 1
+HEADER = struct.Struct("<4sIIII")
+DEVICE_ID = struct.Struct("<I")
+COMMAND_CODE = struct.Struct("<H")
+SEQUENCE = struct.Struct("<Q")
+# (value, timestamp) in register image, (timestamp, value) in rings
+PAIR = struct.Struct("<dd")
+
+# Samples kept per device and register
+DEFAULT_RING_SIZE: int = 256
+DEFAULT_SHARED_COMMANDS = STAGE_COMMANDS + DEFAULT_TELEMETRY
+# Reader gives up when a slot stays torn this long, seconds (publisher died mid-update)
+READ_TIMEOUT: float = 0.1
+
+# Segments created by publishers of this process, their resource tracker registration is the publisher's
+_created: Set[str] = set()
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class _Layout:
+    """Offsets inside the segment, computed the same way by publisher and readers"""
+
+    def __init__(self, device_count: int, command_count: int, ring_size: int):
+        self.device_count = device_count
+        self.command_count = command_count
+        self.ring_size = ring_size
+        self.device_ids = HEADER.size
+        self.commands = self.device_ids + DEVICE_ID.size * device_count
+        self.slots = _align(self.commands + COMMAND_CODE.size * command_count)
+        # Device slot: sequence, register image, ring heads, rings
+        self.image = SEQUENCE.size
+        self.heads = self.image + PAIR.size * command_count
+        self.rings = self.heads + SEQUENCE.size * command_count
+        self.slot_size = self.rings + PAIR.size * command_count * ring_size
+        self.size = self.slots + self.slot_size * device_count
+
+    def slot(self, index: int) -> int:
+        return self.slots + self.slot_size * index
+
+
+class TelemetryPublisher:
+    """
+    Publishes latest value of every register of every device and a ring of recent
+    samples into a named shared memory segment, for local readers (TelemetryReader)
+    which must not open the CAN adapter themselves.
+    Single writer: each device slot is guarded by a sequence counter which is odd
+    while the slot is being written (seqlock), readers retry torn reads.
+
+    :param name: segment name, readers attach to it
+    :param device_ids: devices which get a slot, sample keys must be among them
+    :param commands: registers published per device
+    """
+
+    def __init__(self, name: str, device_ids: Sequence[int],
+                 commands: Sequence[NPB1700Commands] = DEFAULT_SHARED_COMMANDS,
+                 ring_size: int = DEFAULT_RING_SIZE):
+        self.layout = _Layout(len(device_ids), len(commands), ring_size)
+        self._memory = shared_memory.SharedMemory(name=name, create=True, size=self.layout.size)
+        self.name = self._memory.name
+        _created.add(self.name)
+        buffer = self._buffer = self._memory.buf
+        HEADER.pack_into(buffer, 0, SHM_MAGIC, SHM_VERSION, len(device_ids), len(commands), ring_size)
+        for index, device_id in enumerate(device_ids):
+            DEVICE_ID.pack_into(buffer, self.layout.device_ids + index * DEVICE_ID.size, device_id)
+        for index, command in enumerate(commands):
+            COMMAND_CODE.pack_into(buffer, self.layout.commands + index * COMMAND_CODE.size,
+                                   int.from_bytes(command.value, byteorder='little'))
+        self._slots = {device_id: self.layout.slot(index) for index, device_id in enumerate(device_ids)}
+        self._commands = {command: index for index, command in enumerate(commands)}
+        for slot in self._slots.values():
+            for index in range(len(commands)):
+                PAIR.pack_into(buffer, slot + self.layout.image + index * PAIR.size, math.nan, math.nan)
+        # Ring heads are kept here too, so publishing doesn't read shared memory
+        self._heads: Dict[Tuple[int, int], int] = {}
+
+    def publish(self, device_id: int, command: NPB1700Commands, value: float, timestamp: float) -> None:
+        slot = self._slots[device_id]
+        index = self._commands[command]
+        layout = self.layout
+        buffer = self._buffer
+        sequence = SEQUENCE.unpack_from(buffer, slot)[0]
+        SEQUENCE.pack_into(buffer, slot, sequence + 1)
+
+        PAIR.pack_into(buffer, slot + layout.image + index * PAIR.size, value, timestamp)
+        head = self._heads.get((device_id, index), 0)
+        position = index * layout.ring_size + head % layout.ring_size
+        PAIR.pack_into(buffer, slot + layout.rings + position * PAIR.size, timestamp, value)
+        self._heads[(device_id, index)] = head + 1
+        SEQUENCE.pack_into(buffer, slot + layout.heads + index * SEQUENCE.size, head + 1)
+
+        SEQUENCE.pack_into(buffer, slot, sequence + 2)
+
+    def on_sample(self, key: Hashable, command: NPB1700Commands, value: Any) -> None:
+        """PollingScheduler sample callback (timestamps=True), keys are device ids"""
+        if command not in self._commands or key not in self._slots:
+            return
+        if not hasattr(value, 'received_at'):
+            raise TypeError("Shared telemetry needs timestamped samples (PollingScheduler timestamps=True)")
+        self.publish(key, command, float(sample_value(value)), value.received_at)
+
+    def close(self, unlink: bool = True) -> None:
+        """Detach from the segment, removing it unless other publisher takes over"""
+        self._buffer = None
+        self._memory.close()
+        if unlink:
+            self._memory.unlink()
+            _created.discard(self.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class TelemetryReader:
+    """
+    Read-only view of a TelemetryPublisher segment. Reads decode straight from
+    shared memory without system calls, each result is a consistent copy of one device slot
+    """
+
+    def __init__(self, name: str):
+        try:
+            self._memory = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Before Python 3.13 every attached process registers the segment for removal at exit
+            self._memory = shared_memory.SharedMemory(name=name)
+            self._untrack()
+        buffer = self._buffer = self._memory.buf
+        magic, version, device_count, command_count, ring_size = HEADER.unpack_from(buffer, 0)
+        if magic != SHM_MAGIC or version != SHM_VERSION:
+            self.close()
+            raise ValueError(f"Shared memory segment {name} is not npbcharger telemetry")
+        self.layout = layout = _Layout(device_count, command_count, ring_size)
+        self.device_ids: List[int] = [
+            DEVICE_ID.unpack_from(buffer, layout.device_ids + index * DEVICE_ID.size)[0]
+            for index in range(device_count)
+        ]
+        self.commands: List[NPB1700Commands] = [
+            COMMANDS_BY_CODE[COMMAND_CODE.unpack_from(buffer, layout.commands + index * COMMAND_CODE.size)[0]]
+            for index in range(command_count)
+        ]
+        self._slots = {device_id: layout.slot(index) for index, device_id in enumerate(self.device_ids)}
+        self._commands = {command: index for index, command in enumerate(self.commands)}
+        self._image = struct.Struct("<" + "dd" * command_count)
+
+    def latest(self, device_id: int) -> Dict[NPB1700Commands, Tuple[float, float]]:
+        """Register image of device: command -> (value, timestamp), registers never published are left out"""
+        slot = self._slots[device_id]
+        values = self._consistent(slot, lambda: self._image.unpack_from(self._buffer, slot + self.layout.image))
+        return {
+            command: (values[2 * index], values[2 * index + 1])
+            for index, command in enumerate(self.commands) if not math.isnan(values[2 * index + 1])
+        }
+
+    def history(self, device_id: int, command: NPB1700Commands,
+                count: Optional[int] = None) -> List[Tuple[float, float]]:
+        """Up to count (ring size by default) most recent (timestamp, value) samples, oldest first"""
+        slot = self._slots[device_id]
+        index = self._commands[command]
+        layout = self.layout
+        count = layout.ring_size if count is None else min(count, layout.ring_size)
+
+        def read() -> List[Tuple[float, float]]:
+            head = SEQUENCE.unpack_from(self._buffer, slot + layout.heads + index * SEQUENCE.size)[0]
+            ring = slot + layout.rings + index * layout.ring_size * PAIR.size
+            return [PAIR.unpack_from(self._buffer, ring + (position % layout.ring_size) * PAIR.size)
+                    for position in range(max(0, head - count), head)]
+        return self._consistent(slot, read)
+
+    def sequence(self, device_id: int) -> int:
+        """Update counter of device slot, changes whenever it is published to"""
+        return SEQUENCE.unpack_from(self._buffer, self._slots[device_id])[0]
+
+    def _untrack(self) -> None:
+        """
+        Drop the resource tracker registration made on attach, so reader exit doesn't remove the segment.
+        A publisher of this process shares the registration, so it is kept for the publisher to release
+        """
+        name = self._memory.name
+        if os.name != "posix" or name in _created:
+            return
+        from multiprocessing import resource_tracker
+        # Tracker knows POSIX segments by their leading slash name
+        resource_tracker.unregister(name if name.startswith("/") else "/" + name, "shared_memory")
+
+    def _consistent(self, slot: int, read):
+        buffer = self._buffer
+        deadline = time.monotonic() + READ_TIMEOUT
+        while True:
+            before = SEQUENCE.unpack_from(buffer, slot)[0]
+            if not before & 1:
+                result = read()
+                if SEQUENCE.unpack_from(buffer, slot)[0] == before:
+                    return result
+            if time.monotonic() > deadline:
+                raise RuntimeError("Telemetry slot stays locked, publisher stopped mid-update")
+            # Let the publisher finish its update
+            time.sleep(0)
+
+    def close(self) -> None:
+        self._buffer = None
+        self._memory.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
@@ -0,0 +1,87 @@
+import struct
+from typing import Any, BinaryIO, Hashable, Iterator, NamedTuple
+from .commands import COMMANDS_BY_CODE, NPB1700Commands
+
+# File header: magic and format version
+LOG_MAGIC: bytes = b"NPBT\x01"
+# timestamp (s), device id, command code, value (status registers as raw word)
+LOG_RECORD = struct.Struct("<dIHd")
+# Records read from file at once
+READ_CHUNK_RECORDS: int = 4096
+
+
+class LogRecord(NamedTuple):
+    """Single sample of binary telemetry log"""
+    timestamp: float
+    device_id: int
+    command: NPB1700Commands
+    value: float
+
+
+def sample_value(value: Any) -> Any:
+    """Plain number of sample value: Reading unwrapped, decoded status as raw word"""
+    if hasattr(value, 'received_at'):
+        value = value.value
+    if hasattr(value, 'keys'):
+        value = value["raw_value"]
+    return value
+
+
+class BinaryLogWriter:
+    """
+    Appends telemetry samples as fixed size records, 22 bytes each
+    instead of ~100 for a NDJSON line. Keys of samples are device ids.
+    Pass the writer's on_sample as PollingScheduler callback (timestamps=True)
+    """
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        # Appending to an existing file keeps its header, pipes and sockets always get one
+        if not (stream.seekable() and stream.tell() != 0):
+            stream.write(LOG_MAGIC)
+
+    def write(self, timestamp: float, device_id: int, command: NPB1700Commands, value: float) -> None:
+        code = int.from_bytes(command.value, byteorder='little')
+        self.stream.write(LOG_RECORD.pack(timestamp, device_id, code, value))
+
+    def on_sample(self, key: Hashable, command: NPB1700Commands, value: Any) -> None:
+        if not hasattr(value, 'received_at'):
+            raise TypeError("Binary log needs timestamped samples (PollingScheduler timestamps=True)")
+        self.write(value.received_at, key, command, float(sample_value(value)))
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+def _read_full(stream: BinaryIO, size: int) -> bytes:
+    """Read size bytes, fewer only at end of stream (pipes and sockets return short reads)"""
+    parts = []
+    remaining = size
+    while remaining:
+        part = stream.read(remaining)
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    return b"".join(parts)
+
+
+def read_binary_log(stream: BinaryIO) -> Iterator[LogRecord]:
+    """
+    Records of binary telemetry log in file order, read in chunks
+
+    :raises ValueError: if the stream is not a telemetry log or its last record is truncated
+    """
+    if _read_full(stream, len(LOG_MAGIC)) != LOG_MAGIC:
+        raise ValueError("Not a npbcharger telemetry log")
+    chunk_size = LOG_RECORD.size * READ_CHUNK_RECORDS
+    while True:
+        chunk = _read_full(stream, chunk_size)
+        usable = len(chunk) - len(chunk) % LOG_RECORD.size
+        for timestamp, device_id, code, value in LOG_RECORD.iter_unpack(chunk[:usable]):
+            yield LogRecord(timestamp, device_id, COMMANDS_BY_CODE[code], value)
+        if len(chunk) < chunk_size:
+            if usable < len(chunk):
+                raise ValueError(f"Truncated last record in telemetry log: {len(chunk) - usable} of "
+                                 f"{LOG_RECORD.size} bytes")
+            return
@@ -0,0 +1,73 @@
+from collections import deque
+from time import monotonic
+from typing import Any, Callable, Deque, NamedTuple, Optional, Tuple
+
+# Offset samples kept, at 50 requests per second about 5 s of history,
+# short enough to follow adapter clock drift
+DEFAULT_ALIGN_WINDOW: int = 256
+# Offset change treated as adapter clock reset (reconnect, wall clock step), seconds
+DEFAULT_MAX_JUMP: float = 1.0
+
+
+class Reading(NamedTuple):
+    """
+    Decoded register value with timing of the exchange, host monotonic seconds.
+
+    :param sent_at: when the request was handed to the transport
+    :param received_at: when the reply reached the adapter, from its timestamp
+        if adapter clock is aligned (see ClockAligner), otherwise when the driver received it
+    """
+    value: Any
+    sent_at: float
+    received_at: float
+
+    @property
+    def latency(self) -> float:
+        return self.received_at - self.sent_at
+
+
+class ClockAligner:
+    """
+    Maps frame timestamps of an adapter clock (hardware counter, kernel wall clock)
+    to host monotonic time. Each received frame gives offset = host time - adapter time,
+    which is the true offset plus queuing delay, so the minimum over recent frames
+    is the best estimate. The window follows drift, a jump larger than max_jump
+    (reopened adapter, stepped wall clock) restarts the estimate.
+    """
+
+    def __init__(self, window: int = DEFAULT_ALIGN_WINDOW, max_jump: float = DEFAULT_MAX_JUMP,
+                 clock: Callable[[], float] = monotonic):
+        self.window = window
+        self.max_jump = max_jump
+        self._clock = clock
+        self._count = 0
+        # (sample number, offset), offsets increasing: sliding window minimum
+        self._minimums: Deque[Tuple[int, float]] = deque()
+
+    @property
+    def offset(self) -> Optional[float]:
+        """Adapter to host offset, None before first frame"""
+        return self._minimums[0][1] if self._minimums else None
+
+    def observe(self, adapter_time: float, host_time: Optional[float] = None) -> None:
+        """Record frame stamped adapter_time which the host received at host_time (now by default)"""
+        if host_time is None:
+            host_time = self._clock()
+        offset = host_time - adapter_time
+        if self._minimums and abs(offset - self._minimums[0][1]) > self.max_jump:
+            self.reset()
+        self._count += 1
+        while self._minimums and self._minimums[-1][1] >= offset:
+            self._minimums.pop()
+        self._minimums.append((self._count, offset))
+        while self._minimums[0][0] <= self._count - self.window:
+            self._minimums.popleft()
+
+    def to_host(self, adapter_time: float) -> float:
+        """Host monotonic time of adapter timestamp"""
+        if not self._minimums:
+            raise ValueError("No frames observed yet")
+        return adapter_time + self._minimums[0][1]
+
+    def reset(self) -> None:
+        self._minimums.clear()
@@ -0,0 +1,41 @@
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+# Public name -> submodule which defines it, imported on first attribute access
+_LAZY_ATTRIBUTES = {
+    "Transport": ".base",
+    "PythonCanTransport": ".python_can",
+    "SlcanTransport": ".slcan",
+    "SocketCanTransport": ".socketcan",
+    "LoopbackBus": ".loopback",
+    "LoopbackTransport": ".loopback",
+    "ChargerSimulator": ".loopback",
+    "SupervisedTransport": ".supervised",
+    "AcceptanceFilter": ".filters",
+    "reply_filters": ".filters",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+if TYPE_CHECKING:
+    from .base import Transport
+    from .python_can import PythonCanTransport
+    from .slcan import SlcanTransport
+    from .socketcan import SocketCanTransport
+    from .loopback import LoopbackBus, LoopbackTransport, ChargerSimulator
+    from .supervised import SupervisedTransport
+    from .filters import AcceptanceFilter, reply_filters
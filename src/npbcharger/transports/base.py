@@ -0,0 +1,41 @@
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from can import Message
+
+
+class Transport(ABC):
+    """
+    Frame transport the driver talks through.
+    Implementations raise NPBTransportError when the underlying adapter fails.
+    """
+
+    @abstractmethod
+    def send(self, msg: 'Message') -> None:
+        """Put frame on the bus"""
+        pass
+
+    @abstractmethod
+    def recv(self, timeout: Optional[float] = None) -> Optional['Message']:
+        """Next received frame or None after timeout seconds (0 polls, None blocks)"""
+        pass
+
+    @abstractmethod
+    def shutdown(self) -> None:
+        """Release the adapter"""
+        pass
+
+    def set_filters(self, filters: Optional[List[Dict[str, int]]]) -> None:
+        """
+        Install receive acceptance filters (python-can format), None accepts everything.
+        Transports which can't filter ignore it
+        """
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+        return False
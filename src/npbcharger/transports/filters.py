@@ -0,0 +1,104 @@
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+from .base import Transport
+
+# python-can style acceptance filter: {"can_id": ..., "can_mask": ..., "extended": ...}
+CanFilter = Dict[str, int]
+
+# Every NPB-1700 reply id: 0x000C00XX
+NPB_REPLY_ID: int = 0x000C0000
+NPB_REPLY_MASK: int = 0x1FFFFF00
+EXACT_ID_MASK: int = 0x1FFFFFFF
+# Above this many devices one pattern filter for every NPB reply is installed instead of exact ones.
+# Hardware filter banks of adapters are small
+DEFAULT_MAX_FILTERS: int = 8
+
+
+def reply_filters(reply_ids: Iterable[int], max_filters: int = DEFAULT_MAX_FILTERS) -> Optional[List[CanFilter]]:
+    """Acceptance filters passing replies of given devices only. None (accept all) if there are none"""
+    reply_ids = sorted(set(reply_ids))
+    if not reply_ids:
+        return None
+    if len(reply_ids) > max_filters:
+        return [{"can_id": NPB_REPLY_ID, "can_mask": NPB_REPLY_MASK, "extended": True}]
+    return [{"can_id": reply_id, "can_mask": EXACT_ID_MASK, "extended": True} for reply_id in reply_ids]
+
+
+def matches(filters: Optional[List[CanFilter]], arbitration_id: int, is_extended_id: bool) -> bool:
+    """Whether frame passes filters, python-can semantics"""
+    if not filters:
+        return True
+    for can_filter in filters:
+        if "extended" in can_filter and can_filter["extended"] != is_extended_id:
+            continue
+        mask = can_filter["can_mask"]
+        if arbitration_id & mask == can_filter["can_id"] & mask:
+            return True
+    return False
+
+
+class AcceptanceFilter:
+    """
+    Reply ids of devices which read through one transport, installed as its receive filters,
+    so the kernel or adapter drops unrelated traffic before Python sees it.
+    Ids are reference counted as several drivers may address the same device.
+    Use for_transport() to get the instance shared by every driver on a transport.
+    The transport is only weakly referenced, so the shared instance doesn't keep it alive.
+    """
+
+    _instances: 'weakref.WeakKeyDictionary[Transport, AcceptanceFilter]' = weakref.WeakKeyDictionary()
+
+    def __init__(self, transport: Transport, max_filters: int = DEFAULT_MAX_FILTERS):
+        # Strong reference from the value would keep the _instances key alive forever
+        self._transport = weakref.ref(transport)
+        self.max_filters = max_filters
+        self._reply_ids: Counter = Counter()
+        self.filters: Optional[List[CanFilter]] = None
+
+    @classmethod
+    def for_transport(cls, transport: Transport) -> 'AcceptanceFilter':
+        instance = cls._instances.get(transport)
+        if instance is None:
+            instance = cls(transport)
+            cls._instances[transport] = instance
+        return instance
+
+    @property
+    def transport(self) -> Optional[Transport]:
+        """Filtered transport, None once it was collected"""
+        return self._transport()
+
+    @property
+    def reply_ids(self) -> List[int]:
+        return sorted(self._reply_ids)
+
+    def add(self, *reply_ids: int) -> None:
+        self._reply_ids.update(reply_ids)
+        self._apply()
+
+    def remove(self, *reply_ids: int) -> None:
+        for reply_id in reply_ids:
+            if self._reply_ids[reply_id] > 1:
+                self._reply_ids[reply_id] -= 1
+            else:
+                self._reply_ids.pop(reply_id, None)
+        self._apply()
+
+    @contextmanager
+    def accepting(self, reply_ids: Iterable[int]) -> Iterator[None]:
+        """Temporarily accept replies of extra devices, e.g. during a fleet read"""
+        reply_ids = list(reply_ids)
+        self.add(*reply_ids)
+        try:
+            yield
+        finally:
+            self.remove(*reply_ids)
+
+    def _apply(self) -> None:
+        filters = reply_filters(self._reply_ids, self.max_filters)
+        transport = self._transport()
+        if filters != self.filters and transport is not None:
+            self.filters = filters
+            transport.set_filters(filters)
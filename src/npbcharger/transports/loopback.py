@@ -0,0 +1,148 @@
+import threading
+from collections import deque
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional
+from .base import Transport
+from .filters import matches
+from ..commands import COMMAND_DATA_LEN, COMMAND_LEN, NPB1700Commands
+from ..exceptions import NPBTransportError
+
+if TYPE_CHECKING:
+    from can import Message
+
+# Model id and SCALING_FACTOR (0.01 V, 0.01 A) answered by simulated chargers
+DEFAULT_IDENTITY: Dict[NPB1700Commands, bytes] = {
+    NPB1700Commands.MFR_MODEL_B0B5: b'NPB-17',
+    NPB1700Commands.MFR_MODEL_B6B11: b'00-24 ',
+    NPB1700Commands.SCALING_FACTOR: b'\x55\x00',
+}
+
+# Frame handler attached to a loopback bus, returns frames it puts on the bus in response
+FrameHandler = Callable[['Message'], Iterable['Message']]
+
+
+class LoopbackBus:
+    """
+    In-memory CAN bus. Frames sent by one endpoint are queued for every other endpoint,
+    attached handlers (e.g. ChargerSimulator) answer synchronously inside send(),
+    so tests run without threads, sockets or sleeping for replies.
+    """
+
+    def __init__(self):
+        self._endpoints: List['LoopbackTransport'] = []
+        self._handlers: List[FrameHandler] = []
+        self._lock = threading.Lock()
+
+    def endpoint(self) -> 'LoopbackTransport':
+        """New transport attached to this bus"""
+        transport = LoopbackTransport(self)
+        with self._lock:
+            self._endpoints.append(transport)
+        return transport
+
+    def attach(self, handler: FrameHandler) -> None:
+        self._handlers.append(handler)
+
+    def detach(self, handler: FrameHandler) -> None:
+        self._handlers.remove(handler)
+
+    def _remove(self, transport: 'LoopbackTransport') -> None:
+        with self._lock:
+            if transport in self._endpoints:
+                self._endpoints.remove(transport)
+
+    def publish(self, msg: 'Message', sender: Optional['LoopbackTransport'] = None) -> None:
+        """Deliver frame to every endpoint except sender and let handlers respond"""
+        with self._lock:
+            endpoints = [endpoint for endpoint in self._endpoints if endpoint is not sender]
+        for endpoint in endpoints:
+            endpoint._deliver(msg)
+        for handler in list(self._handlers):
+            for reply in handler(msg):
+                self.publish(reply)
+
+
+class LoopbackTransport(Transport):
+    """Endpoint of LoopbackBus"""
+
+    def __init__(self, bus: LoopbackBus):
+        self.bus = bus
+        self.closed = False
+        self.filters: Optional[List[Dict[str, int]]] = None
+        # Frames rejected by filters
+        self.dropped: int = 0
+        self._queue: deque = deque()
+        self._ready = threading.Condition()
+
+    def send(self, msg: 'Message') -> None:
+        if self.closed:
+            raise NPBTransportError("Loopback transport is shut down")
+        self.bus.publish(msg, self)
+
+    def recv(self, timeout: Optional[float] = None) -> Optional['Message']:
+        if self._queue:
+            return self._queue.popleft()
+        if self.closed:
+            raise NPBTransportError("Loopback transport is shut down")
+        with self._ready:
+            if not self._ready.wait_for(lambda: self._queue or self.closed, timeout):
+                return None
+        if not self._queue:
+            raise NPBTransportError("Loopback transport is shut down")
+        return self._queue.popleft()
+
+    def set_filters(self, filters: Optional[List[Dict[str, int]]]) -> None:
+        self.filters = filters
+
+    def _deliver(self, msg: 'Message') -> None:
+        if not matches(self.filters, msg.arbitration_id, msg.is_extended_id):
+            self.dropped += 1
+            return
+        with self._ready:
+            self._queue.append(msg)
+            self._ready.notify()
+
+    def shutdown(self) -> None:
+        self.closed = True
+        self.bus._remove(self)
+        with self._ready:
+            self._ready.notify_all()
+
+
+class ChargerSimulator:
+    """
+    NPB-1700 register model answering on a LoopbackBus: reads return register payloads,
+    writes store them. Registers without a value don't answer, as do silenced chargers.
+    Identity registers read by service calibration default to NPB-1700-24 with 0.01 factors.
+
+    :param address: charger address (low byte of CAN id)
+    :param registers: initial register payloads (without command code)
+    """
+
+    def __init__(self, address: int = 0x03, registers: Optional[Dict[NPB1700Commands, bytes]] = None):
+        self.address = address
+        self.silent = False
+        self.registers: Dict[NPB1700Commands, bytearray] = {
+            command: bytearray(value) for command, value in DEFAULT_IDENTITY.items()
+        }
+        self.registers.update({command: bytearray(value) for command, value in (registers or {}).items()})
+        self.requests: List['Message'] = []
+        self._codes = {bytes(command.value): command for command in NPB1700Commands}
+
+    def set_word(self, command: NPB1700Commands, word: int) -> None:
+        self.registers[command] = bytearray(word.to_bytes(COMMAND_DATA_LEN[command], byteorder='little'))
+
+    def __call__(self, msg: 'Message') -> List['Message']:
+        if self.silent or msg.arbitration_id not in (0x000C0100 | self.address, 0x000C01FF):
+            return []
+        command = self._codes.get(bytes(msg.data[:COMMAND_LEN]))
+        if command is None:
+            return []
+        self.requests.append(msg)
+        if len(msg.data) > COMMAND_LEN:
+            self.registers[command] = bytearray(msg.data[COMMAND_LEN:])
+            return []
+        if msg.arbitration_id & 0xFF == 0xFF or command not in self.registers:
+            return []
+        from can import Message
+        return [Message(arbitration_id=0x000C0000 | self.address, is_extended_id=True,
+                        data=command.value + self.registers[command])]
@@ -0,0 +1,53 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from .base import Transport
+from ..exceptions import NPBTransportError
+
+if TYPE_CHECKING:
+    from can import Message
+
+# SocketCAN error frame class bit (in arbitration id) reported on bus-off
+CAN_ERR_BUSOFF: int = 0x00000040
+
+
+class PythonCanTransport(Transport):
+    """
+    Transport over any python-can interface (slcan, socketcan, virtual, ...)
+
+    :param interface: python-can interface name
+    :param channel: interface channel, e.g. /dev/ttyACM0 or can0
+    :param bitrate: CAN bitrate
+    :param kwargs: passed to can.Bus as is (e.g. ttyBaudrate for slcan)
+    """
+
+    def __init__(self, interface: str, channel: str, bitrate: int, **kwargs: Any):
+        # python-can is loaded on first transport creation: importing it dominates startup time
+        import can
+        self._can_error = can.CanError
+        self.interface = interface
+        self.channel = channel
+        try:
+            self.bus = can.Bus(interface=interface, channel=channel, bitrate=bitrate, **kwargs)
+        except Exception as e:
+            raise NPBTransportError(f"Failed to open CAN bus {interface}:{channel}: {e}") from e
+
+    def send(self, msg: 'Message') -> None:
+        try:
+            self.bus.send(msg)
+        except (self._can_error, OSError) as e:
+            raise NPBTransportError(f"Failed to send on {self.channel}: {e}") from e
+
+    def recv(self, timeout: Optional[float] = None) -> Optional['Message']:
+        try:
+            msg = self.bus.recv(timeout=timeout)
+        except (self._can_error, OSError) as e:
+            raise NPBTransportError(f"Failed to receive on {self.channel}: {e}") from e
+        if msg is not None and msg.is_error_frame and msg.arbitration_id & CAN_ERR_BUSOFF:
+            raise NPBTransportError(f"Bus-off on {self.channel}")
+        return msg
+
+    def set_filters(self, filters: Optional[List[Dict[str, int]]]) -> None:
+        # Kernel (socketcan) or adapter filtering where supported, python-can software filter otherwise
+        self.bus.set_filters(filters)
+
+    def shutdown(self) -> None:
+        self.bus.shutdown()
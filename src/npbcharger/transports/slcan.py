@@ -0,0 +1,154 @@
+from collections import deque
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Deque, Optional
+from .base import Transport
+from ..exceptions import NPBTransportError
+
+if TYPE_CHECKING:
+    from can import Message
+
+# SLCAN (Lawicel) bitrate commands
+SLCAN_BITRATES = {
+    10000: b"S0",
+    20000: b"S1",
+    50000: b"S2",
+    100000: b"S3",
+    125000: b"S4",
+    250000: b"S5",
+    500000: b"S6",
+    800000: b"S7",
+    1000000: b"S8",
+}
+# Adapter replies with BELL on a rejected command
+SLCAN_ERROR: int = 0x07
+SLCAN_EOL: bytes = b"\r"
+# Replies to accepted commands: plain CR, transmit acks z / Z
+SLCAN_ACKS = (b"", b"z", b"Z")
+# Longest single serial read while waiting for a frame, seconds
+SERIAL_READ_TIMEOUT: float = 0.001
+
+
+def encode_frame(msg: 'Message') -> bytes:
+    """SLCAN transmit command of a data frame: Tiiiiiiiildd.. (extended) or tiiildd.. (standard)"""
+    data = bytes(msg.data[:msg.dlc])
+    if msg.is_extended_id:
+        head = b"T%08X" % msg.arbitration_id
+    else:
+        head = b"t%03X" % msg.arbitration_id
+    return head + b"%d" % len(data) + data.hex().upper().encode("ascii") + SLCAN_EOL
+
+
+def decode_frame(line: bytes, timestamp: float = 0.0) -> Optional['Message']:
+    """Received frame from SLCAN line (without CR), None for acks and other replies"""
+    from can import Message
+    if not line or line[0] not in b"Tt":
+        return None
+    id_len = 8 if line[0] == ord("T") else 3
+    try:
+        arbitration_id = int(line[1:1 + id_len], 16)
+        dlc = int(line[1 + id_len:2 + id_len], 16)
+        data = bytes.fromhex(line[2 + id_len:2 + id_len + 2 * dlc].decode("ascii"))
+    except ValueError:
+        return None
+    if len(data) != dlc:
+        return None
+    return Message(arbitration_id=arbitration_id, is_extended_id=id_len == 8,
+                   dlc=dlc, data=data, timestamp=timestamp)
+
+
+class SlcanTransport(Transport):
+    """
+    SLCAN over a serial port without python-can in between: frames are written as
+    ASCII commands and received lines are parsed straight into messages.
+    Command replies are matched in order, a rejected transmit (BELL) raises on receive.
+
+    :param port: serial device, e.g. /dev/ttyACM0
+    :param bitrate: CAN bitrate, one of SLCAN_BITRATES
+    :param tty_baudrate: serial baudrate of the adapter
+    :param serial_port: already opened serial-like object (read/write/in_waiting/close)
+        to use instead
+    """
+
+    def __init__(self, port: Optional[str] = None, bitrate: int = 250000,
+                 tty_baudrate: int = 1000000, serial_port: Any = None):
+        if bitrate not in SLCAN_BITRATES:
+            raise ValueError(f"Bitrate {bitrate} is not supported by SLCAN")
+        self.port = port
+        self._buffer = bytearray()
+        # Commands awaiting reply, in order: True where BELL means a failed transmit
+        self._replies: Deque[bool] = deque()
+        if serial_port is None:
+            import serial
+            try:
+                serial_port = serial.Serial(port, baudrate=tty_baudrate,
+                                            timeout=SERIAL_READ_TIMEOUT)
+            except (serial.SerialException, OSError) as e:
+                raise NPBTransportError(f"Failed to open SLCAN adapter on {port}: {e}") from e
+        self.serial = serial_port
+        # Flush partial commands, close channel left open, set bitrate and open.
+        # Adapters reject some of these depending on their state, their BELLs are ignored
+        setup = [b"", b"", b"", b"C", SLCAN_BITRATES[bitrate], b"O"]
+        self._write(b"".join(command + SLCAN_EOL for command in setup))
+        self._replies.extend(False for _ in setup)
+
+    def _write(self, data: bytes) -> None:
+        try:
+            self.serial.write(data)
+        except OSError as e:
+            raise NPBTransportError(f"SLCAN adapter on {self.port} failed: {e}") from e
+
+    def send(self, msg: 'Message') -> None:
+        self._write(encode_frame(msg))
+        self._replies.append(True)
+
+    def recv(self, timeout: Optional[float] = None) -> Optional['Message']:
+        """:raises NPBTransportError: if the adapter rejected a transmit command (BELL)"""
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            msg = self._next_frame()
+            if msg is not None:
+                return msg
+            # Read at least once, so recv(0) returns frames the port already holds
+            try:
+                waiting = self.serial.in_waiting
+                chunk = self.serial.read(waiting or 1)
+            except OSError as e:
+                raise NPBTransportError(f"SLCAN adapter on {self.port} failed: {e}") from e
+            self._buffer += chunk
+            msg = self._next_frame()
+            if msg is not None:
+                return msg
+            if deadline is not None and monotonic() >= deadline:
+                return None
+
+    def _next_frame(self) -> Optional['Message']:
+        """Parse command replies and complete lines from the buffer until a frame is found"""
+        while True:
+            if self._buffer[:1] == bytes([SLCAN_ERROR]):
+                # BELL comes without CR
+                del self._buffer[0]
+                self._reply(rejected=True)
+                continue
+            end = self._buffer.find(SLCAN_EOL)
+            if end < 0:
+                return None
+            line = bytes(self._buffer[:end])
+            del self._buffer[:end + 1]
+            if line in SLCAN_ACKS:
+                self._reply(rejected=False)
+                continue
+            msg = decode_frame(line, monotonic())
+            if msg is not None:
+                return msg
+
+    def _reply(self, rejected: bool) -> None:
+        transmit = self._replies.popleft() if self._replies else False
+        if rejected and transmit:
+            raise NPBTransportError(f"SLCAN adapter on {self.port} rejected a transmit command")
+
+    def shutdown(self) -> None:
+        try:
+            self.serial.write(b"C" + SLCAN_EOL)
+        except OSError:
+            pass
+        self.serial.close()
@@ -0,0 +1,189 @@
+import errno
+import selectors
+import socket
+import struct
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional
+from .base import Transport
+from ..exceptions import NPBTransportError
+
+if TYPE_CHECKING:
+    from can import Message
+
+# struct can_frame: id, dlc, 3 bytes padding, 8 data bytes
+CAN_FRAME = struct.Struct("=IB3x8s")
+CAN_FILTER = struct.Struct("=II")
+TIMEVAL = struct.Struct("@ll")
+
+CAN_EFF_FLAG: int = 0x80000000
+CAN_RTR_FLAG: int = 0x40000000
+CAN_ERR_FLAG: int = 0x20000000
+CAN_EFF_MASK: int = 0x1FFFFFFF
+CAN_SFF_MASK: int = 0x000007FF
+CAN_ERR_BUSOFF: int = 0x00000040
+# Not exported by the socket module (linux/can/raw.h, asm-generic/socket.h)
+CAN_RAW_ERR_FILTER: int = 2
+SO_TIMESTAMP: int = getattr(socket, "SO_TIMESTAMP", 29)
+
+# Frames drained from the socket per wakeup
+DEFAULT_BATCH_SIZE: int = 64
+# Send fails when the transmit queue stays full this long (no node ACKs, bus-off), seconds
+DEFAULT_SEND_TIMEOUT: float = 0.1
+_ANCILLARY_SIZE = socket.CMSG_SPACE(TIMEVAL.size)
+
+
+def pack_frame(msg: 'Message') -> bytes:
+    can_id = msg.arbitration_id
+    if msg.is_extended_id:
+        can_id |= CAN_EFF_FLAG
+    if msg.is_remote_frame:
+        can_id |= CAN_RTR_FLAG
+    data = bytes(msg.data[:8])
+    return CAN_FRAME.pack(can_id, len(data), data)
+
+
+def unpack_frame(frame: bytes, timestamp: float = 0.0, channel: Optional[str] = None) -> 'Message':
+    from can import Message
+    can_id, dlc, data = CAN_FRAME.unpack_from(frame)
+    extended = bool(can_id & CAN_EFF_FLAG)
+    return Message(timestamp=timestamp, channel=channel,
+                   arbitration_id=can_id & (CAN_EFF_MASK if extended else CAN_SFF_MASK),
+                   is_extended_id=extended,
+                   is_remote_frame=bool(can_id & CAN_RTR_FLAG),
+                   is_error_frame=bool(can_id & CAN_ERR_FLAG),
+                   dlc=dlc, data=data[:dlc])
+
+
+def pack_filters(filters: Optional[List[Dict[str, int]]]) -> bytes:
+    """CAN_RAW_FILTER option of python-can style filters, None or empty accepts everything"""
+    if not filters:
+        return CAN_FILTER.pack(0, 0)
+    packed = bytearray()
+    for can_filter in filters:
+        can_id = can_filter["can_id"]
+        mask = can_filter["can_mask"]
+        if "extended" in can_filter:
+            # Frame format must match as well
+            mask |= CAN_EFF_FLAG
+            if can_filter["extended"]:
+                can_id |= CAN_EFF_FLAG
+        packed += CAN_FILTER.pack(can_id, mask)
+    return bytes(packed)
+
+
+class SocketCanTransport(Transport):
+    """
+    Linux SocketCAN raw socket without python-can in between.
+    Non-blocking socket waited on with selectors (epoll), every wakeup drains up to
+    batch_size frames into a queue, receive filters are installed in the kernel and
+    frames carry kernel receive timestamps (SO_TIMESTAMP, time.time() epoch).
+    Works with vcan interfaces as well.
+
+    :param channel: network interface, e.g. can0 or vcan0
+    :param send_timeout: seconds send() waits for room in the transmit queue
+    """
+
+    def __init__(self, channel: str = "can0", batch_size: int = DEFAULT_BATCH_SIZE,
+                 timestamps: bool = True, send_timeout: float = DEFAULT_SEND_TIMEOUT):
+        if not hasattr(socket, "AF_CAN"):
+            raise NPBTransportError("SocketCAN is not available on this platform")
+        self.channel = channel
+        self.batch_size = batch_size
+        self.send_timeout = send_timeout
+        self._queue: Deque['Message'] = deque()
+        try:
+            self._socket = socket.socket(socket.AF_CAN, socket.SOCK_RAW, socket.CAN_RAW)
+        except OSError as e:
+            raise NPBTransportError(f"Failed to create SocketCAN socket: {e}") from e
+        try:
+            self._socket.setsockopt(socket.SOL_CAN_RAW, CAN_RAW_ERR_FILTER,
+                                    struct.pack("=I", CAN_ERR_BUSOFF))
+            if timestamps:
+                self._socket.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMP, 1)
+            self._socket.bind((channel,))
+        except OSError as e:
+            self._socket.close()
+            raise NPBTransportError(f"Failed to open SocketCAN interface {channel}: {e}") from e
+        self._socket.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._socket, selectors.EVENT_READ)
+
+    def send(self, msg: 'Message') -> None:
+        """:raises NPBTransportError: if the transmit queue stays full for send_timeout"""
+        frame = pack_frame(msg)
+        deadline = time.monotonic() + self.send_timeout
+        while True:
+            try:
+                self._socket.send(frame)
+                return
+            except BlockingIOError:
+                # Transmit queue is full, wait for room
+                poll = None
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    raise NPBTransportError(f"Failed to send on {self.channel}: {e}") from e
+                # Interface queue is full, writability is not signalled so poll
+                poll = 0.001
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise NPBTransportError(f"Timed out sending on {self.channel}, transmit queue stays full")
+            self._wait(selectors.EVENT_WRITE, remaining if poll is None else min(poll, remaining))
+
+    def recv(self, timeout: Optional[float] = None) -> Optional['Message']:
+        if not self._queue and not self._fill(timeout):
+            return None
+        return self._queue.popleft()
+
+    def recv_batch(self, timeout: Optional[float] = None) -> List['Message']:
+        """Every frame received so far, waiting up to timeout for the first one"""
+        if not self._queue:
+            self._fill(timeout)
+        frames = list(self._queue)
+        self._queue.clear()
+        return frames
+
+    def set_filters(self, filters: Optional[List[Dict[str, int]]]) -> None:
+        self._socket.setsockopt(socket.SOL_CAN_RAW, socket.CAN_RAW_FILTER, pack_filters(filters))
+
+    def shutdown(self) -> None:
+        self._selector.close()
+        self._socket.close()
+
+    def _wait(self, events: int, timeout: Optional[float]) -> bool:
+        self._selector.modify(self._socket, events)
+        try:
+            return bool(self._selector.select(timeout))
+        finally:
+            if events != selectors.EVENT_READ:
+                self._selector.modify(self._socket, selectors.EVENT_READ)
+
+    def _fill(self, timeout: Optional[float]) -> bool:
+        """Drain up to batch_size frames, waiting for the first one up to timeout"""
+        received = self._drain()
+        if not received and timeout != 0:
+            if not self._wait(selectors.EVENT_READ, timeout):
+                return False
+            received = self._drain()
+        return received > 0
+
+    def _drain(self) -> int:
+        received = 0
+        while received < self.batch_size:
+            try:
+                frame, ancillary, _, _ = self._socket.recvmsg(CAN_FRAME.size, _ANCILLARY_SIZE)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                raise NPBTransportError(f"Failed to receive on {self.channel}: {e}") from e
+            timestamp = 0.0
+            for level, kind, data in ancillary:
+                if level == socket.SOL_SOCKET and kind == SO_TIMESTAMP:
+                    seconds, microseconds = TIMEVAL.unpack_from(data)
+                    timestamp = seconds + microseconds / 1e6
+            msg = unpack_frame(frame, timestamp, self.channel)
+            if msg.is_error_frame and msg.arbitration_id & CAN_ERR_BUSOFF:
+                raise NPBTransportError(f"Bus-off on {self.channel}")
+            self._queue.append(msg)
+            received += 1
+        return received
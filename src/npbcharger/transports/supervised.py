@@ -0,0 +1,186 @@
+import logging
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, List, Optional, Tuple
+from .base import Transport
+from ..commands import COMMAND_LEN
+from ..driver import REPLY_ID_MASK
+from ..exceptions import NPBTransportError
+
+if TYPE_CHECKING:
+    from can import Message
+
+logger = logging.getLogger(__name__)
+
+# Reconnect backoff, seconds
+DEFAULT_BACKOFF_INITIAL: float = 0.05
+DEFAULT_BACKOFF_MAX: float = 2.0
+DEFAULT_BACKOFF_FACTOR: float = 2.0
+# Unanswered read requests sent this recently are resent after reconnect, their replies were
+# likely lost. Covers request period plus response time of NPB-1700
+DEFAULT_REPLAY_WINDOW: float = 0.025
+# Recovery durations kept for statistics
+RECOVERY_HISTORY: int = 64
+
+TransportFactory = Callable[[], Transport]
+ReconnectCallback = Callable[[float], None]
+
+
+class SupervisedTransport(Transport):
+    """
+    Transport which reopens its adapter after failures (unplugged adapter, bus-off)
+    with exponential backoff, transparently to the driver:
+    the frame whose send failed is sent again and recent read requests which got
+    no reply yet are replayed.
+    Subscribers are called after each reconnect with its duration, e.g. to mark
+    telemetry of a RegisterMirror stale while keeping settings and identity.
+
+    :param factory: opens a new underlying transport, raising NPBTransportError on failure
+    :param max_attempts: reconnect attempts before giving up, None retries forever
+    """
+
+    def __init__(self, factory: TransportFactory,
+                 backoff_initial: float = DEFAULT_BACKOFF_INITIAL,
+                 backoff_max: float = DEFAULT_BACKOFF_MAX,
+                 backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+                 max_attempts: Optional[int] = None,
+                 replay_window: float = DEFAULT_REPLAY_WINDOW,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self._factory = factory
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.backoff_factor = backoff_factor
+        self.max_attempts = max_attempts
+        self.replay_window = replay_window
+        self._clock = clock
+        self._sleep = sleep
+        self._subscribers: List[ReconnectCallback] = []
+        # (send time, frame) of recent read requests still waiting for reply
+        self._in_flight: Deque[Tuple[float, 'Message']] = deque()
+        self._filters: Optional[List[Dict[str, int]]] = None
+
+        self.reconnects: int = 0
+        self.failed_attempts: int = 0
+        self.recovery_times: Deque[float] = deque(maxlen=RECOVERY_HISTORY)
+        self._closed = False
+        self._transport: Optional[Transport] = None
+        self._transport = self._open()
+
+    @classmethod
+    def python_can(cls, interface: str, channel: str, bitrate: int, **kwargs: Any) -> 'SupervisedTransport':
+        """Supervised python-can bus with default backoff, kwargs go to can.Bus"""
+        from .python_can import PythonCanTransport
+        return cls(lambda: PythonCanTransport(interface, channel, bitrate, **kwargs))
+
+    @classmethod
+    def socketcan(cls, channel: str, **kwargs: Any) -> 'SupervisedTransport':
+        """Supervised raw SocketCAN socket, kwargs go to SocketCanTransport"""
+        from .socketcan import SocketCanTransport
+        return cls(lambda: SocketCanTransport(channel, **kwargs))
+
+    @property
+    def transport(self) -> Optional[Transport]:
+        """Underlying transport currently in use"""
+        return self._transport
+
+    @property
+    def last_recovery_time(self) -> Optional[float]:
+        return self.recovery_times[-1] if self.recovery_times else None
+
+    def subscribe(self, callback: ReconnectCallback) -> Callable[[], None]:
+        """Call callback(recovery_seconds) after every reconnect. Returns unsubscribe function"""
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback) if callback in self._subscribers else None
+
+    # Transport
+    def send(self, msg: 'Message') -> None:
+        try:
+            self._transport.send(msg)
+        except NPBTransportError as e:
+            self._reconnect(e)
+            # Requeue the frame which didn't make it
+            self._transport.send(msg)
+        if len(msg.data) == COMMAND_LEN:
+            self._remember(msg)
+
+    def recv(self, timeout: Optional[float] = None) -> Optional['Message']:
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - self._clock())
+            try:
+                msg = self._transport.recv(remaining)
+            except NPBTransportError as e:
+                self._reconnect(e)
+                if deadline is not None and self._clock() >= deadline:
+                    return None
+                continue
+            if msg is not None:
+                self._answered(msg)
+            return msg
+
+    def set_filters(self, filters: Optional[List[Dict[str, int]]]) -> None:
+        self._filters = filters
+        self._transport.set_filters(filters)
+
+    def shutdown(self) -> None:
+        self._closed = True
+        if self._transport is not None:
+            self._transport.shutdown()
+
+    # Recovery
+    def _open(self) -> Transport:
+        delay = self.backoff_initial
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return self._factory()
+            except NPBTransportError as e:
+                self.failed_attempts += 1
+                if self.max_attempts is not None and attempt >= self.max_attempts:
+                    raise
+                logger.warning(f"Transport open failed (attempt {attempt}), retrying in {delay:.2f}s: {e}")
+                self._sleep(delay)
+                delay = min(delay * self.backoff_factor, self.backoff_max)
+
+    def _reconnect(self, error: Exception) -> None:
+        if self._closed:
+            raise NPBTransportError("Transport is shut down") from error
+        started = self._clock()
+        logger.warning(f"Transport failed, reconnecting: {error}")
+        try:
+            self._transport.shutdown()
+        except Exception:  # Adapter is already gone
+            pass
+        self._transport = self._open()
+        if self._filters is not None:
+            self._transport.set_filters(self._filters)
+
+        # Replies to reads sent just before the failure were lost with the old adapter.
+        # Answered reads are not repeated: their second reply would be taken for the next one
+        horizon = started - self.replay_window
+        for sent_at, request in list(self._in_flight):
+            if sent_at >= horizon:
+                self._transport.send(request)
+
+        recovery = self._clock() - started
+        self.reconnects += 1
+        self.recovery_times.append(recovery)
+        logger.info(f"Transport recovered in {recovery * 1000:.1f} ms")
+        for callback in list(self._subscribers):
+            callback(recovery)
+
+    def _remember(self, msg: 'Message') -> None:
+        now = self._clock()
+        self._in_flight.append((now, msg))
+        horizon = now - self.replay_window
+        while self._in_flight and self._in_flight[0][0] < horizon:
+            self._in_flight.popleft()
+
+    def _answered(self, reply: 'Message') -> None:
+        code = bytes(reply.data[:COMMAND_LEN])
+        for index, (_, request) in enumerate(self._in_flight):
+            if request.arbitration_id & REPLY_ID_MASK == reply.arbitration_id and bytes(request.data) == code:
+                del self._in_flight[index]
+                return
@@ -0,0 +1,112 @@
+import threading
+from typing import Dict, List, Tuple
+import can
+from can import Message
+
+from npbcharger.commands import COMMAND_DATA_LEN, COMMAND_LEN, NPB1700Commands
+
+
+class FakeDriver:
+    """Register-backed stand-in for NPB1700 driver used by service tests"""
+
+    def __init__(self, registers: Dict[NPB1700Commands, bytes] = None, is_broadcast: bool = False,
+                 device_id: int = 0x000C0103):
+        self.device_id = device_id
+        self.frames_built = 0
+        # Commands which silently ignore writes
+        self.stuck = set()
+        # Identity of NPB-1700-24 with 0.01 voltage and current factors, read by service calibration
+        self.registers: Dict[NPB1700Commands, bytearray] = {
+            NPB1700Commands.MFR_MODEL_B0B5: bytearray(b'NPB-17'),
+            NPB1700Commands.MFR_MODEL_B6B11: bytearray(b'00-24 '),
+            NPB1700Commands.SCALING_FACTOR: bytearray(b'\x55\x00'),
+        }
+        self.registers.update({command: bytearray(value) for command, value in (registers or {}).items()})
+        self.is_broadcast = is_broadcast
+        self.reads: List[NPB1700Commands] = []
+        # Fake clock: every read takes 1 ms from request to reply
+        self.last_sent_at = 0.0
+        self.last_received_at = 0.0
+        self.writes: List[Tuple[NPB1700Commands, bytearray]] = []
+
+    def set_word(self, command: NPB1700Commands, word: int) -> None:
+        self.registers[command] = bytearray(word.to_bytes(2, byteorder='little'))
+
+    def read(self, command: NPB1700Commands) -> Message:
+        self.reads.append(command)
+        self.last_sent_at = self.last_received_at + 0.019
+        self.last_received_at = self.last_sent_at + 0.001
+        payload = self.registers.get(command, bytearray(COMMAND_DATA_LEN[command]))
+        return Message(timestamp=self.last_received_at, data=command.value + payload)
+
+    def received_at(self, msg: Message) -> float:
+        return msg.timestamp
+
+    def write(self, command: NPB1700Commands, params: bytearray) -> Message:
+        self.writes.append((command, bytearray(params)))
+        if command not in self.stuck:
+            self.registers[command] = bytearray(params)
+        return Message()
+
+    def build_frame(self, command: NPB1700Commands, params: bytearray = bytearray()) -> Message:
+        self.frames_built += 1
+        return Message(arbitration_id=self.device_id, is_extended_id=True, data=command.value + params)
+
+    def send_frame(self, msg: Message) -> Message:
+        command = NPB1700Commands(bytearray(msg.data[:COMMAND_LEN]))
+        return self.write(command, bytearray(msg.data[COMMAND_LEN:]))
+
+    def read_burst(self, commands, period: float = 0.0) -> Dict[NPB1700Commands, Message]:
+        return {command: self.read(command) for command in commands}
+
+    def write_burst(self, writes, period: float = 0.0) -> None:
+        for command, params in writes:
+            self.write(command, params)
+
+
+class VirtualCharger:
+    """
+    Charger answering reads from its registers on a python-can virtual bus channel.
+    Writes are stored into registers.
+    """
+
+    def __init__(self, channel: str, address: int = 0x03,
+                 registers: Dict[NPB1700Commands, bytes] = None):
+        self.address = address
+        self.registers: Dict[NPB1700Commands, bytearray] = {
+            command: bytearray(value) for command, value in (registers or {}).items()
+        }
+        self._codes = {bytes(command.value): command for command in NPB1700Commands}
+        self._bus = can.Bus(interface='virtual', channel=channel)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._respond, daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._bus.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def _respond(self) -> None:
+        request_id = 0x000C0100 | self.address
+        while not self._stop.is_set():
+            request = self._bus.recv(timeout=0.01)
+            if request is None or request.arbitration_id not in (request_id, 0x000C01FF):
+                continue
+            command = self._codes.get(bytes(request.data[:COMMAND_LEN]))
+            if command is None:
+                continue
+            if len(request.data) > COMMAND_LEN:
+                self.registers[command] = bytearray(request.data[COMMAND_LEN:])
+                continue
+            if request.arbitration_id != request_id or command not in self.registers:
+                continue
+            self._bus.send(Message(arbitration_id=0x000C0000 | self.address, is_extended_id=True,
+                                   data=command.value + self.registers[command]))
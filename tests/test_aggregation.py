@@ -0,0 +1,135 @@
+import io
+import math
+import os
+import unittest
+
+from npbcharger.aggregation import StreamingLTTB, WindowAggregator, aggregate_log, lttb
+from npbcharger.commands import NPB1700Commands
+from npbcharger.parsers import FaultStatus
+from npbcharger.telemetry_log import LOG_MAGIC, BinaryLogWriter, read_binary_log
+from npbcharger.timing import Reading
+
+
+class TestWindowAggregator(unittest.TestCase):
+
+    def test_summaries(self):
+        windows = []
+        aggregator = WindowAggregator(10.0, on_window=windows.append)
+        for timestamp, value in ((1.0, 24.0), (4.0, 26.0), (9.0, 25.0)):
+            self.assertEqual(aggregator.update("unit", NPB1700Commands.READ_VOUT, timestamp, value), [])
+        completed = aggregator.update("unit", NPB1700Commands.READ_VOUT, 12.0, 27.0)
+        self.assertEqual(windows, completed)
+        summary = completed[0]
+        self.assertEqual((summary.start, summary.end, summary.count), (0.0, 10.0, 3))
+        self.assertEqual((summary.minimum, summary.maximum, summary.mean, summary.last), (24.0, 26.0, 25.0, 25.0))
+        self.assertIsNone(summary.rollup)
+
+    def test_fault_rollup(self):
+        aggregator = WindowAggregator(10.0)
+        aggregator.update(3, NPB1700Commands.FAULT_STATUS, 0.0, FaultStatus.OTP.value)
+        aggregator.update(3, NPB1700Commands.FAULT_STATUS, 1.0, {"raw_value": FaultStatus.OVP.value})
+        aggregator.update(3, NPB1700Commands.FAULT_STATUS, 2.0, 0)
+        summary, = aggregator.flush()
+        self.assertEqual(summary.rollup, FaultStatus.OTP.value | FaultStatus.OVP.value)
+        self.assertEqual(summary.last, 0)
+        self.assertIsNone(summary.mean)
+
+    def test_flush_closes_ended_windows_only(self):
+        aggregator = WindowAggregator(10.0)
+        aggregator.on_sample("a", NPB1700Commands.READ_IOUT, Reading(5.0, 1.0, 1.5))
+        aggregator.on_sample("b", NPB1700Commands.READ_IOUT, Reading(6.0, 14.0, 14.5))
+        self.assertEqual([summary.key for summary in aggregator.flush(15.0)], ["a"])
+        self.assertEqual([summary.key for summary in aggregator.flush()], ["b"])
+
+
+class TestBinaryLog(unittest.TestCase):
+
+    def test_round_trip_and_aggregate(self):
+        stream = io.BytesIO()
+        writer = BinaryLogWriter(stream)
+        writer.on_sample(0x000C0103, NPB1700Commands.READ_VOUT, Reading(24.5, 0.5, 0.51))
+        writer.on_sample(0x000C0103, NPB1700Commands.FAULT_STATUS, Reading({"raw_value": 0x20}, 0.6, 0.61))
+        writer.write(70.0, 0x000C0103, NPB1700Commands.READ_VOUT, 25.5)
+        with self.assertRaises(TypeError):
+            writer.on_sample(0x000C0103, NPB1700Commands.READ_VOUT, 24.0)
+
+        stream.seek(0)
+        self.assertTrue(stream.getvalue().startswith(LOG_MAGIC))
+        records = list(read_binary_log(stream))
+        self.assertEqual([record.command for record in records],
+                         [NPB1700Commands.READ_VOUT, NPB1700Commands.FAULT_STATUS, NPB1700Commands.READ_VOUT])
+        self.assertEqual(records[1].value, 0x20)
+
+        summaries = list(aggregate_log(records, window=60.0))
+        self.assertEqual([(summary.start, summary.command) for summary in summaries],
+                         [(0.0, NPB1700Commands.READ_VOUT), (0.0, NPB1700Commands.FAULT_STATUS),
+                          (60.0, NPB1700Commands.READ_VOUT)])
+
+    def test_short_reads(self):
+        stream = io.BytesIO()
+        writer = BinaryLogWriter(stream)
+        for step in range(3):
+            writer.write(float(step), 0x000C0103, NPB1700Commands.READ_VOUT, 24.0 + step)
+        # Pipe handing out a few bytes per read
+        pipe = io.BufferedReader(io.BytesIO(stream.getvalue()))
+        pipe.read = lambda size=-1, read=pipe.read: read(min(size, 7))
+        self.assertEqual([record.value for record in read_binary_log(pipe)], [24.0, 25.0, 26.0])
+
+    def test_write_to_pipe(self):
+        read_end, write_end = os.pipe()
+        with open(write_end, "wb") as pipe:
+            writer = BinaryLogWriter(pipe)
+            writer.write(0.0, 0x000C0103, NPB1700Commands.READ_VOUT, 24.0)
+        with open(read_end, "rb") as pipe:
+            self.assertEqual([record.value for record in read_binary_log(pipe)], [24.0])
+
+    def test_appends_without_second_header(self):
+        stream = io.BytesIO()
+        BinaryLogWriter(stream).write(0.0, 0x000C0103, NPB1700Commands.READ_VOUT, 24.0)
+        BinaryLogWriter(stream).write(1.0, 0x000C0103, NPB1700Commands.READ_VOUT, 25.0)
+        stream.seek(0)
+        self.assertEqual([record.value for record in read_binary_log(stream)], [24.0, 25.0])
+
+    def test_truncated_last_record(self):
+        stream = io.BytesIO()
+        BinaryLogWriter(stream).write(0.0, 0x000C0103, NPB1700Commands.READ_VOUT, 24.0)
+        # Torn last record
+        stream.write(b"\x00" * 5)
+        stream.seek(0)
+        records = read_binary_log(stream)
+        self.assertEqual(next(records).value, 24.0)
+        with self.assertRaises(ValueError):
+            next(records)
+
+    def test_rejects_other_files(self):
+        with self.assertRaises(ValueError):
+            list(read_binary_log(io.BytesIO(b"{}\n")))
+
+
+class TestLTTB(unittest.TestCase):
+
+    def setUp(self):
+        self.points = [(float(x), math.sin(x / 5) + (3.0 if x == 47 else 0.0)) for x in range(200)]
+
+    def test_keeps_ends_and_spikes(self):
+        sampled = lttb(self.points, 20)
+        self.assertEqual(len(sampled), 20)
+        self.assertEqual(sampled[0], self.points[0])
+        self.assertEqual(sampled[-1], self.points[-1])
+        self.assertIn(self.points[47], sampled)
+        self.assertEqual(lttb(self.points[:5], 20), self.points[:5])
+
+    def test_streaming(self):
+        downsampler = StreamingLTTB(10)
+        sampled = []
+        for point in self.points:
+            sampled.extend(downsampler.push(*point))
+        sampled.extend(downsampler.flush())
+        self.assertEqual(sampled[0], self.points[0])
+        self.assertEqual(sampled[-1], self.points[-1])
+        self.assertIn(self.points[47], sampled)
+        self.assertLessEqual(len(sampled), len(self.points) // 10 + 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import importlib.util
+import unittest
+
+from npbcharger.anomaly import DRIFT, TREND, ThermalDetector, backtest, _replay_numpy, _replay_python
+from npbcharger.commands import NPB1700Commands
+from npbcharger.parsers import FaultStatus
+from npbcharger.timing import Reading
+
+# Poll period of temperature, seconds
+PERIOD = 5.0
+
+
+def ramp(start: float, rate_per_minute: float, begin: float, timestamp: float) -> float:
+    return start + max(0.0, timestamp - begin) * rate_per_minute / 60
+
+
+class TestThermalDetector(unittest.TestCase):
+
+    def test_trend_warns_before_limit(self):
+        warnings = []
+        detector = ThermalDetector(on_warning=warnings.append)
+        for step in range(400):
+            timestamp = step * PERIOD
+            detector.update("unit", timestamp, temperature=ramp(40.0, 3.0, 600.0, timestamp), current=20.0)
+        trend, = [warning for warning in warnings if warning.kind == TREND]
+        self.assertGreater(trend.timestamp, 600.0)
+        # Well before the ramp reaches the limit
+        self.assertLess(trend.temperature, 70.0)
+        self.assertAlmostEqual(trend.slope, 3.0, delta=0.5)
+        self.assertLessEqual(trend.time_to_limit, detector.horizon)
+
+    def test_steady_device_is_quiet(self):
+        detector = ThermalDetector()
+        for step in range(400):
+            noise = 0.3 if step % 2 else -0.3
+            self.assertEqual(detector.update("unit", step * PERIOD, temperature=45.0 + noise, current=30.0), [])
+        self.assertEqual(detector.state("unit")["warnings"], [])
+
+    def test_drift_without_load_change(self):
+        """Fan failure: temperature steps up and stays while current is constant"""
+        detector = ThermalDetector()
+        kinds = []
+        for step in range(100):
+            temperature = 40.0 if step < 20 else 45.0
+            kinds += [warning.kind for warning in detector.update("unit", step * PERIOD, temperature, 20.0)]
+        self.assertEqual(kinds, [DRIFT])
+
+    def test_hovering_at_limit_warns_once(self):
+        detector = ThermalDetector()
+        kinds = []
+        for step in range(200):
+            temperature = detector.limit + (0.5 if step % 2 else -0.5)
+            kinds += [warning.kind for warning in detector.update("unit", step * PERIOD, temperature, 20.0)]
+        self.assertEqual(kinds.count(TREND), 1)
+        # Cooled down below the clear threshold
+        for step in range(200, 300):
+            detector.update("unit", step * PERIOD, temperature=60.0, current=20.0)
+        self.assertNotIn(TREND, detector.state("unit")["warnings"])
+
+    def test_rising_load_holds_drift(self):
+        detector = ThermalDetector()
+        for step in range(100):
+            temperature = 40.0 if step < 20 else 45.0
+            warnings = detector.update("unit", step * PERIOD, temperature, current=step * 1.0)
+            self.assertEqual(warnings, [])
+
+    def test_gap_restarts_estimate(self):
+        detector = ThermalDetector()
+        detector.update("unit", 0.0, temperature=40.0)
+        detector.update("unit", 5.0, temperature=40.0)
+        detector.update("unit", 500.0, temperature=60.0)
+        self.assertEqual(detector.state("unit")["slope"], 0.0)
+        self.assertEqual(detector.state("unit")["baseline"], 60.0)
+
+    def test_scheduler_samples(self):
+        detector = ThermalDetector()
+        detector.on_sample("unit", NPB1700Commands.READ_IOUT, Reading(10.0, 0.0, 0.001))
+        detector.on_sample("unit", NPB1700Commands.READ_TEMPERATURE_1, Reading(40.0, 0.02, 0.021))
+        self.assertEqual(detector.state("unit")["temperature"], 40.0)
+
+
+class TestBacktest(unittest.TestCase):
+
+    def setUp(self):
+        self.timestamps = [step * PERIOD for step in range(400)]
+        # Steady, overheating (OTP at 75 degC), fan failure
+        self.temperatures = [[45.0, ramp(40.0, 3.0, 600.0, t), 40.0 if t < 100 else 45.0]
+                             for t in self.timestamps]
+        self.currents = [[30.0, 20.0, 20.0] for _ in self.timestamps]
+        self.faults = [[0, FaultStatus.OTP.value if row[1] >= 75.0 else 0, 0] for row in self.temperatures]
+
+    def test_lead_times(self):
+        steady, overheating, fan = backtest(self.timestamps, self.temperatures, self.currents, self.faults)
+        self.assertEqual(steady["warnings"], 0)
+        self.assertIsNone(steady["lead_time"])
+        self.assertGreater(overheating["lead_time"], 60.0)
+        self.assertEqual(fan["warnings"], 1)
+        self.assertIsNone(fan["first_fault"])
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"), "numpy is not installed")
+    def test_numpy_matches_streaming(self):
+        import numpy
+        detector = ThermalDetector()
+        vectorized = _replay_numpy(numpy, detector, self.timestamps, self.temperatures, self.currents, 3)
+        streaming = _replay_python(detector, self.timestamps, self.temperatures, self.currents, 3)
+        self.assertEqual(vectorized, streaming)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import threading
+import unittest
+from can import Message
+import can
+
+from npbcharger.commands import NPB1700Commands
+from npbcharger.driver import NPB1700
+from npbcharger.exceptions import NPBCommunicationError, NPBVerificationError
+from npbcharger.services import NPB1700Service
+
+from fakes import FakeDriver
+
+
+def word(value: int) -> bytearray:
+    return bytearray(value.to_bytes(2, byteorder='little'))
+
+
+class TestApplyProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.driver = FakeDriver({
+            NPB1700Commands.CURVE_CC: word(2000),
+            NPB1700Commands.CURVE_CV: word(2400),
+            NPB1700Commands.CURVE_CC_TIMEOUT: word(600),
+            NPB1700Commands.CURVE_CONFIG: word(0x0084),
+        })
+        self.service = NPB1700Service(self.driver)
+
+    def test_only_changed_registers_written(self):
+        """Registers already at target value are not written"""
+        written = self.service.apply_profile({
+            NPB1700Commands.CURVE_CC: 20.0,
+            NPB1700Commands.CURVE_CV: 28.8,
+            NPB1700Commands.CURVE_CC_TIMEOUT: 600,
+        })
+
+        self.assertEqual(list(written), [NPB1700Commands.CURVE_CV])
+        self.assertEqual(self.driver.writes, [(NPB1700Commands.CURVE_CV, word(2880))])
+        self.assertEqual(self.driver.registers[NPB1700Commands.CURVE_CV], word(2880))
+
+    def test_config_fields_merged_with_current_value(self):
+        self.service.apply_profile({NPB1700Commands.CURVE_CONFIG: {"TCS": 1}})
+        # CUVE (bit 7) and preset curve stay, TCS bits 2-3 become 01
+        self.assertEqual(self.driver.registers[NPB1700Commands.CURVE_CONFIG], word(0x0084 | 0x04))
+
+    def test_nothing_to_write(self):
+        self.assertEqual(self.service.apply_profile({NPB1700Commands.CURVE_CC: 20.0}), {})
+        self.assertEqual(self.driver.writes, [])
+
+    def test_mismatch_rolls_back(self):
+        """A register which did not take the value causes rollback of all changed registers"""
+        self.driver.stuck.add(NPB1700Commands.CURVE_CV)
+        with self.assertRaises(NPBVerificationError) as context:
+            self.service.apply_profile({
+                NPB1700Commands.CURVE_CC: 30.0,
+                NPB1700Commands.CURVE_CV: 28.8,
+            })
+
+        self.assertEqual(set(context.exception.mismatches), {NPB1700Commands.CURVE_CV})
+        self.assertEqual(self.driver.registers[NPB1700Commands.CURVE_CC], word(2000))
+
+    def test_broadcast_writes_everything(self):
+        driver = FakeDriver(is_broadcast=True)
+        service = NPB1700Service(driver)
+        with self.assertLogs(level='WARNING'):
+            service.apply_profile({NPB1700Commands.CURVE_CC: 20.0, NPB1700Commands.CURVE_CV: 24.0})
+        self.assertEqual(len(driver.writes), 2)
+        self.assertEqual(driver.reads, [])
+
+
+class TestDriverBurst(unittest.TestCase):
+
+    def setUp(self):
+        self.driver = NPB1700(channel='burst_test', interface='virtual', device_id=0x000C0103)
+        self.charger = can.Bus(interface='virtual', channel='burst_test')
+        self.registers = {
+            NPB1700Commands.READ_VOUT: word(2400),
+            NPB1700Commands.READ_IOUT: word(1050),
+        }
+        self.stop = threading.Event()
+        self.responder = threading.Thread(target=self._respond, daemon=True)
+        self.responder.start()
+
+    def tearDown(self):
+        self.stop.set()
+        self.responder.join()
+        self.charger.shutdown()
+        self.driver.__exit__(None, None, None)
+
+    def _respond(self):
+        codes = {bytes(command.value): command for command in self.registers}
+        while not self.stop.is_set():
+            request = self.charger.recv(timeout=0.01)
+            if request is None:
+                continue
+            command = codes.get(bytes(request.data[:2]))
+            if command is None:
+                continue
+            # Unrelated traffic on a shared bus must be ignored
+            self.charger.send(Message(arbitration_id=0x000C0007, is_extended_id=True,
+                                      data=command.value + word(0)))
+            self.charger.send(Message(arbitration_id=0x000C0003, is_extended_id=True,
+                                      data=command.value + self.registers[command]))
+
+    def test_read_burst(self):
+        replies = self.driver.read_burst([NPB1700Commands.READ_VOUT, NPB1700Commands.READ_IOUT],
+                                         period=0.005)
+        self.assertEqual(replies[NPB1700Commands.READ_VOUT].data[2:4], word(2400))
+        self.assertEqual(replies[NPB1700Commands.READ_IOUT].data[2:4], word(1050))
+
+    def test_read_burst_missing_reply(self):
+        with self.assertRaises(NPBCommunicationError):
+            self.driver.read_burst([NPB1700Commands.CURVE_CC], period=0.005)
+
+
+if __name__ == '__main__':
+    unittest.main()
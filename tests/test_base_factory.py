@@ -1,7 +1,12 @@
 import unittest
+from unittest import mock
 
 from npbcharger.commands import NPB1700Commands
 from npbcharger.parsers import ElectricDataParser, ParserFactory, FaultStatusParser
+from npbcharger.parsers.factories import MODEL_LIMITS
+from npbcharger.services import NPB1700Service
+
+from fakes import FakeDriver
 
 
 class TestParserFactory(unittest.TestCase):
@@ -68,5 +73,100 @@ class TestParserFactory(unittest.TestCase):
             pass
 
 
+# Limits as an application registers them for the 12 V and 48 V variants (values for tests only)
+TEST_12V_LIMITS = {
+    NPB1700Commands.CURVE_CC: (20.0, 100.0),
+    NPB1700Commands.CURVE_TC: (4.0, 30.0),
+    NPB1700Commands.READ_IOUT: (0.0, 120.0),
+    NPB1700Commands.CHG_RST_VBAT: (10.5, 21.0),
+    NPB1700Commands.CURVE_CV: (10.5, 21.0),
+    NPB1700Commands.CURVE_FV: (10.5, 21.0),
+    NPB1700Commands.READ_VOUT: (0.0, 21.0),
+}
+TEST_48V_LIMITS = {
+    NPB1700Commands.CURVE_CC: (5.0, 25.0),
+    NPB1700Commands.CURVE_TC: (1.0, 7.5),
+    NPB1700Commands.READ_IOUT: (0.0, 30.0),
+    NPB1700Commands.CHG_RST_VBAT: (42.0, 84.0),
+    NPB1700Commands.CURVE_CV: (42.0, 84.0),
+    NPB1700Commands.CURVE_FV: (42.0, 84.0),
+    NPB1700Commands.READ_VOUT: (0.0, 84.0),
+}
+
+
+class TestModelRegistry(unittest.TestCase):
+
+    def setUp(self):
+        # Registered models are dropped after each test
+        for patcher in (mock.patch.dict(MODEL_LIMITS), mock.patch.dict(ParserFactory._registries)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        ParserFactory.register_model("npb-1700-12", TEST_12V_LIMITS)
+        ParserFactory.register_model("NPB-1700-48", TEST_48V_LIMITS)
+
+    def test_registry_shared_per_model(self):
+        """Same model returns same registry, padding of MFR_MODEL is ignored"""
+        registry = ParserFactory.for_model("NPB-1700-24")
+        self.assertIs(ParserFactory.for_model("NPB-1700-24\x00 "), registry)
+        self.assertIsNot(ParserFactory.for_model("NPB-1700-12"), registry)
+
+    def test_model_specific_constraints(self):
+        p_cv_12 = ParserFactory.for_model("NPB-1700-12").get_parser(NPB1700Commands.CURVE_CV)
+        p_cv_24 = ParserFactory.for_model("NPB-1700-24").get_parser(NPB1700Commands.CURVE_CV)
+        self.assertEqual(p_cv_12.constraints['max'], 21.0)
+        self.assertEqual(p_cv_24.constraints['min'], 21.0)
+        # 30 V is clamped differently depending on model
+        self.assertEqual(p_cv_24.parse_write(30.0), bytearray((3000).to_bytes(2, 'little')))
+        self.assertEqual(p_cv_12.parse_write(30.0), bytearray((2100).to_bytes(2, 'little')))
+
+    def test_default_model_matches_factory(self):
+        registry = ParserFactory.for_model("NPB-1700-24")
+        self.assertEqual(registry.get_parser(NPB1700Commands.CURVE_CC).constraints,
+                         ParserFactory.get_parser(NPB1700Commands.CURVE_CC).constraints)
+
+    def test_service_uses_model_from_device(self):
+        driver = FakeDriver({
+            NPB1700Commands.MFR_MODEL_B0B5: b'NPB-17',
+            NPB1700Commands.MFR_MODEL_B6B11: b'00-12 ',
+        })
+        service = NPB1700Service(driver)
+        self.assertEqual(service.use_model(), "NPB-1700-12")
+
+        service.set_constant_voltage_curve(24.0)
+        # Clamped to 12 V model maximum
+        self.assertEqual(driver.writes[-1][1], bytearray((2100).to_bytes(2, 'little')))
+
+    def test_variants_in_one_process(self):
+        services = {model: NPB1700Service(FakeDriver(), model_id=model)
+                    for model in ("NPB-1700-12", "NPB-1700-24", "NPB-1700-48")}
+        for service in services.values():
+            service.set_constant_voltage_curve(30.0)
+        self.assertEqual([service.driver.writes[-1][1] for service in services.values()],
+                         [bytearray((value).to_bytes(2, 'little')) for value in (2100, 3000, 4200)])
+
+    def test_reregistered_limits_apply(self):
+        registry = ParserFactory.for_model("NPB-1700-48")
+        ParserFactory.register_model("NPB-1700-48", {**TEST_48V_LIMITS, NPB1700Commands.CURVE_CV: (40.0, 80.0)})
+        replaced = ParserFactory.for_model("NPB-1700-48")
+        self.assertIsNot(replaced, registry)
+        self.assertEqual(replaced.get_parser(NPB1700Commands.CURVE_CV).constraints['min'], 40.0)
+
+    def test_invalid_limits(self):
+        with self.assertRaises(ValueError):
+            ParserFactory.register_model("NPB-1700-36", {NPB1700Commands.CURVE_CV: (30.0, 63.0)})
+        with self.assertRaises(ValueError):
+            ParserFactory.register_model("NPB-1700-36", {**TEST_48V_LIMITS, NPB1700Commands.CURVE_CC: (25.0, 5.0)})
+        self.assertNotIn("NPB-1700-36", MODEL_LIMITS)
+
+    def test_unknown_model(self):
+        with self.assertRaises(ValueError):
+            ParserFactory.for_model("NPB-9999-24")
+
+    def test_unknown_command(self):
+        with self.assertRaises(ValueError):
+            ParserFactory.for_model("NPB-1700-24").get_parser(NPB1700Commands.MFR_DATE_B0B5)
+
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+from can import Message
+
+from npbcharger.bus_budget import BusBudget, frame_bits, transaction_bits
+from npbcharger.commands import NPB1700Commands, COMMAND_DATA_LEN
+from npbcharger.exceptions import NPBBusOverloadError
+from npbcharger.parsers import ChargeStatus
+from npbcharger.scheduler import PollingScheduler
+from npbcharger.services import NPB1700Service
+
+from fakes import FakeDriver
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestFrameSizes(unittest.TestCase):
+
+    def test_every_command_has_data_length(self):
+        for command in NPB1700Commands:
+            with self.subTest(command=command.name):
+                self.assertIn(command, COMMAND_DATA_LEN)
+
+    def test_frame_bits(self):
+        # 2 byte read request: 67 + 16 bits + worst case stuffing
+        self.assertEqual(frame_bits(2, stuffing=False), 83)
+        self.assertEqual(frame_bits(2), 83 + (54 + 16 - 1) // 4)
+        self.assertEqual(frame_bits(8, stuffing=False), 131)
+
+    def test_transaction_bits(self):
+        # Read = 2 byte request + 4 byte reply, write = 4 byte request only
+        read = transaction_bits(NPB1700Commands.READ_VOUT)
+        self.assertEqual(read, frame_bits(2) + frame_bits(4))
+        self.assertEqual(transaction_bits(NPB1700Commands.CURVE_CC, write=True), frame_bits(4))
+        # Model name replies carry 6 bytes
+        self.assertEqual(transaction_bits(NPB1700Commands.MFR_MODEL_B0B5),
+                         frame_bits(2) + frame_bits(8))
+
+
+class TestBusBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.budget = BusBudget(target_load=0.5, clock=self.clock)
+
+    def test_utilization(self):
+        plan = {"unit": {NPB1700Commands.READ_VOUT: 10.0}}
+        expected = 10.0 * transaction_bits(NPB1700Commands.READ_VOUT) / 250000
+        self.assertAlmostEqual(self.budget.utilization(plan), expected)
+
+    def test_check_rejects_oversubscribed_bus(self):
+        plan = {address: {NPB1700Commands.READ_VOUT: 25.0, NPB1700Commands.READ_IOUT: 25.0}
+                for address in range(20)}
+        with self.assertRaises(NPBBusOverloadError):
+            self.budget.check(plan)
+        with self.assertRaises(NPBBusOverloadError):
+            self.budget.admit(plan, allow_scaling=False)
+
+    def test_check_rejects_device_request_period(self):
+        # 60 requests per second to one charger violates 20 ms request period
+        plan = {"unit": {NPB1700Commands.READ_VOUT: 60.0}}
+        with self.assertRaisesRegex(NPBBusOverloadError, "per device"):
+            self.budget.check(plan)
+
+    def test_scale_fits_target(self):
+        plan = {address: {NPB1700Commands.READ_VOUT: 40.0, NPB1700Commands.READ_IOUT: 20.0}
+                for address in range(20)}
+        scaled = self.budget.admit(plan)
+
+        self.assertLessEqual(self.budget.utilization(scaled), 0.5 + 1e-9)
+        self.budget.check(scaled)
+        # Ratios between commands are kept
+        self.assertAlmostEqual(scaled[0][NPB1700Commands.READ_VOUT],
+                               2 * scaled[0][NPB1700Commands.READ_IOUT])
+
+    def test_live_utilization_window(self):
+        msg = Message(arbitration_id=0x000C0103, is_extended_id=True,
+                      data=bytearray([0x60, 0x00]))
+        for _ in range(100):
+            self.budget.record(msg)
+        self.assertAlmostEqual(self.budget.live_utilization(), 100 * frame_bits(2) / 250000)
+
+        self.clock.now = 1.5
+        self.assertEqual(self.budget.live_utilization(), 0.0)
+
+    def test_scheduler_uses_bus_budget(self):
+        """Scheduler stretches periods to the admitted bus bits"""
+        budget = BusBudget(target_load=0.05, clock=self.clock)
+        scheduler = PollingScheduler(bus_budget=budget, clock=self.clock)
+        for address in range(10):
+            driver = FakeDriver()
+            driver.set_word(NPB1700Commands.CHG_STATUS, ChargeStatus.CCM.value)
+            scheduler.add_device(address, NPB1700Service(driver))
+        scheduler.run_once()
+
+        bits_per_second = sum(device.cycle_cost / scheduler.poll_periods()[key]
+                              for key, device in scheduler.devices().items())
+        self.assertLessEqual(bits_per_second, budget.capacity + 1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import contextlib
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from fakes import VirtualCharger
+from npbcharger.cli import main, parse_addresses
+from npbcharger.commands import NPB1700Commands
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "src")
+
+
+def word(value: int) -> bytearray:
+    return bytearray(value.to_bytes(2, byteorder='little'))
+
+
+class TestCliRead(unittest.TestCase):
+
+    def setUp(self):
+        self.charger = VirtualCharger("cli_test", registers={NPB1700Commands.READ_VOUT: word(2400)})
+
+    def tearDown(self):
+        self.charger.close()
+
+    def run_cli(self, *argv):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            status = main(["--interface", "virtual", "--channel", "cli_test", *argv])
+        return status, output.getvalue().strip()
+
+    def test_read_decoded(self):
+        status, output = self.run_cli("read", "read_vout")
+        self.assertEqual(status, 0)
+        self.assertEqual(float(output), 24.0)
+
+    def test_read_raw(self):
+        self.assertEqual(self.run_cli("read", "READ_VOUT", "--raw"), (0, "6009"))
+
+    def test_no_reply(self):
+        with contextlib.redirect_stderr(io.StringIO()):
+            status, _ = self.run_cli("read", "READ_IOUT", "--address", "5")
+        self.assertEqual(status, 1)
+
+    def test_broadcast_rejected(self):
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            self.run_cli("read", "READ_VOUT", "--address", "0xFF")
+
+    def test_unknown_register(self):
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            self.run_cli("read", "NOT_A_REGISTER")
+
+
+class TestCliFleet(unittest.TestCase):
+
+    def setUp(self):
+        model = b"NPB-1700-24 "
+        self.chargers = [
+            VirtualCharger("fleet_test", address=address, registers={
+                NPB1700Commands.READ_VOUT: word(2400 + address),
+                NPB1700Commands.READ_IOUT: word(1000),
+                NPB1700Commands.FAULT_STATUS: word(1 << 6),
+                NPB1700Commands.CHG_STATUS: word(1 << 1),
+                NPB1700Commands.SYSTEM_STATUS: word(1 << 1),
+                NPB1700Commands.CURVE_CC: word(2000),
+                NPB1700Commands.CURVE_CV: word(2880),
+                NPB1700Commands.MFR_MODEL_B0B5: model[:6],
+                NPB1700Commands.MFR_MODEL_B6B11: model[6:],
+                NPB1700Commands.SCALING_FACTOR: word(0x0055),
+            })
+            for address in (3, 4)
+        ]
+
+    def tearDown(self):
+        for charger in self.chargers:
+            charger.close()
+
+    def run_cli(self, *argv):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            status = main(["--interface", "virtual", "--channel", "fleet_test", *argv])
+        self.assertEqual(status, 0)
+        return output.getvalue()
+
+    def test_poll_ndjson(self):
+        output = self.run_cli("poll", "--addresses", "3-5", "--registers", "READ_VOUT,FAULT_STATUS")
+        records = [json.loads(line) for line in output.splitlines()]
+
+        self.assertEqual([record["address"] for record in records], [3, 4, 5])
+        self.assertAlmostEqual(records[0]["READ_VOUT"], 24.03)
+        self.assertEqual(records[1]["FAULT_STATUS"]["active"], ["OP_OFF"])
+        self.assertFalse(records[2]["online"])
+        self.assertNotIn("READ_VOUT", records[2])
+
+    def test_poll_csv(self):
+        output = self.run_cli("poll", "--addresses", "3,4", "--registers", "READ_IOUT,CHG_STATUS",
+                              "--count", "2", "--interval", "0", "--format", "csv")
+        rows = list(csv.DictReader(io.StringIO(output)))
+
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(list(rows[0]), ["time", "channel", "address", "online", "READ_IOUT", "CHG_STATUS"])
+        self.assertEqual(float(rows[0]["READ_IOUT"]), 10.0)
+        self.assertEqual(rows[0]["CHG_STATUS"], "2")
+
+    def test_discover(self):
+        records = [json.loads(line) for line in self.run_cli("discover").splitlines()]
+        self.assertEqual(records, [
+            {"channel": "fleet_test", "address": 3, "model": "NPB-1700-24"},
+            {"channel": "fleet_test", "address": 4, "model": "NPB-1700-24"},
+        ])
+
+    def test_apply_profile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "profile.json")
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump({"name": "agm", "constant_current": 25.0, "constant_voltage": 28.8}, file)
+            output = self.run_cli("apply-profile", path, "--addresses", "3,4")
+
+        records = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual([record["status"] for record in records], ["ok", "ok"])
+        self.assertEqual(records[0]["written"], ["CURVE_CC"])
+        for charger in self.chargers:
+            self.assertEqual(charger.registers[NPB1700Commands.CURVE_CC], word(2500))
+
+    def test_watch_reports_initial_states(self):
+        output = self.run_cli("watch", "--addresses", "4", "--count", "1")
+        events = {(record["register"], record["state"]) for record in map(json.loads, output.splitlines())}
+        # DC_OK is active low, so the set bit reports nothing
+        self.assertEqual(events, {("FAULT_STATUS", "OP_OFF"), ("CHG_STATUS", "CCM")})
+
+    def test_address_lists(self):
+        self.assertEqual(parse_addresses("1,3-5,3"), [1, 3, 4, 5])
+        with self.assertRaises(Exception):
+            parse_addresses("0-255")
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_import_does_not_load_can_or_asyncio(self):
+        code = (
+            "import sys\n"
+            "import npbcharger.cli, npbcharger.services, npbcharger.profiles, npbcharger.parsers\n"
+            "print(sorted(name for name in ('can', 'asyncio') if name in sys.modules))\n"
+        )
+        env = dict(os.environ, PYTHONPATH=SRC)
+        result = subprocess.run([sys.executable, "-c", code], env=env,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "[]")
+
+    def test_parser_attributes_resolve_lazily(self):
+        import npbcharger.parsers as parsers
+        self.assertIn("FaultStatusParser", dir(parsers))
+        self.assertEqual(parsers.ElectricDataParser.__name__, "ElectricDataParser")
+        with self.assertRaises(AttributeError):
+            parsers.NoSuchParser
+
+
+if __name__ == '__main__':
+    unittest.main()
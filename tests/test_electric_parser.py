@@ -46,6 +46,58 @@ class TestElectricDataParser(unittest.TestCase):
         expected = bytearray(b'\x6D\x08')  # 2157 = 0x086D (21.57V)
         self.assertEqual(result, expected)
 
+    def test_parse_write_no_truncation(self):
+        # 0.29 / 0.01 is 28.999999999999996 in floats
+        result = self.parser.parse_write(0.29)
+        self.assertEqual(result, bytearray(b'\x1D\x00'))
+
+
+class TestElectricDataParserFixedPoint(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = ElectricDataParser(
+            scaling_factor=0.01,
+            constraints={'min': 21.0, 'max': 42.0}
+        )
+        self.temperature = ElectricDataParser(scaling_factor=0.1)
+        self.timeout = ElectricDataParser(scaling_factor=1)
+        self.fine = ElectricDataParser(scaling_factor=0.001)
+
+    def test_parse_read_fixed(self):
+        msg = Message(data=bytearray(b'\xb1\x00\x34\x08'))  # 2100 -> 21.00 V
+        self.assertEqual(self.parser.parse_read_fixed(msg), 2100)
+        # 0.1 scaling: 0x0123 = 291 -> 29.1 degrees -> 2910 centidegrees
+        msg = Message(data=bytearray(b'\x62\x00\x23\x01'))
+        self.assertEqual(self.temperature.parse_read_fixed(msg), 2910)
+
+    def test_parse_write_fixed_exact(self):
+        self.assertEqual(self.parser.parse_write_fixed(2157), bytearray(b'\x6D\x08'))
+        # Clamped to constraints
+        self.assertEqual(self.parser.parse_write_fixed(1500), bytearray(b'\x34\x08'))
+        self.assertEqual(self.parser.parse_write_fixed(5000), bytearray(b'\x68\x10'))
+
+    def test_fixed_point_other_scalings(self):
+        # 90 minutes = 9000 hundredths -> raw 90
+        self.assertEqual(self.timeout.parse_write_fixed(9000), bytearray(b'\x5A\x00'))
+        # 12.35 degrees rounds to 12.4 -> raw 124
+        self.assertEqual(self.temperature.parse_write_fixed(1235), bytearray(b'\x7C\x00'))
+        # 0.001 scaling: 1.23 -> raw 1230
+        self.assertEqual(self.fine.parse_write_fixed(123), bytearray((1230).to_bytes(2, 'little')))
+
+    def test_matches_float_api(self):
+        for centi in range(2100, 4201, 7):
+            with self.subTest(value=centi):
+                self.assertEqual(self.parser.parse_write_fixed(centi),
+                                 self.parser.parse_write(centi / 100))
+
+    def test_batch(self):
+        values = [2100, 2880, 1000, 9999]
+        encoded = self.parser.encode_batch_fixed(values)
+        self.assertEqual(encoded, [self.parser.parse_write_fixed(value) for value in values])
+        self.assertEqual(self.parser.decode_batch_fixed(encoded), [2100, 2880, 2100, 4200])
+        self.assertEqual(self.temperature.decode_batch_fixed([b'\x23\x01']), [2910])
+
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,117 @@
+import importlib.util
+import unittest
+
+from npbcharger.commands import NPB1700Commands
+from npbcharger.energy import EnergyIntegrator, integrate_batch, stage_of, _integrate_numpy, _integrate_python
+from npbcharger.parsers import ChargeStatus
+from npbcharger.scheduler import PollingScheduler
+from npbcharger.services import NPB1700Service
+
+from fakes import FakeDriver
+
+
+class TestEnergyIntegrator(unittest.TestCase):
+
+    def test_trapezoid_with_irregular_samples(self):
+        integrator = EnergyIntegrator(max_gap=3600.0)
+        # Current ramps 0 -> 36 A over one hour at 24 V, sampled unevenly
+        for timestamp in (0.0, 100.0, 1500.0, 1700.0, 3600.0):
+            integrator.update("unit", timestamp, voltage=24.0, current=timestamp / 100)
+        session = integrator.session("unit")
+        self.assertAlmostEqual(session["amp_hours"], 18.0)
+        self.assertAlmostEqual(session["watt_hours"], 432.0)
+        self.assertAlmostEqual(session["seconds"], 3600.0)
+        self.assertEqual(session["gap_seconds"], 0.0)
+
+    def test_held_values_and_gaps(self):
+        integrator = EnergyIntegrator(max_gap=10.0)
+        integrator.update("unit", 0.0, voltage=20.0)
+        integrator.update("unit", 0.02, current=10.0)
+        integrator.update("unit", 1.02, voltage=20.0)
+        # Poller stopped for a minute
+        integrator.update("unit", 61.02, current=10.0)
+        integrator.update("unit", 62.02, voltage=20.0)
+        session = integrator.session("unit")
+        self.assertAlmostEqual(session["amp_hours"], 20.0 / 3600)
+        self.assertAlmostEqual(session["watt_hours"], 400.0 / 3600)
+        self.assertAlmostEqual(session["gap_seconds"], 60.0)
+
+    def test_stage_split_and_reset(self):
+        integrator = EnergyIntegrator()
+        integrator.update("unit", 0.0, voltage=24.0, current=10.0, stage=ChargeStatus.CCM)
+        integrator.update("unit", 3.0, voltage=24.0, current=10.0, stage=ChargeStatus.CVM)
+        integrator.update("unit", 4.0, voltage=24.0, current=10.0)
+        stages = integrator.stages("unit")
+        self.assertAlmostEqual(stages[ChargeStatus.CCM]["seconds"], 3.0)
+        self.assertAlmostEqual(stages[ChargeStatus.CVM]["amp_hours"], 10.0 / 3600)
+
+        finished = integrator.reset_session("unit")
+        self.assertAlmostEqual(finished["seconds"], 4.0)
+        self.assertEqual(integrator.session("unit")["seconds"], 0.0)
+        self.assertEqual(integrator.stages("unit"), {})
+
+    def test_stage_of(self):
+        self.assertEqual(stage_of(ChargeStatus.CVM.value | ChargeStatus.CCTOF.value), ChargeStatus.CVM)
+        self.assertIsNone(stage_of(0))
+        self.assertEqual(stage_of({"status": ChargeStatus.FVM}), ChargeStatus.FVM)
+
+    def test_fed_by_scheduler(self):
+        integrator = EnergyIntegrator()
+        scheduler = PollingScheduler(on_sample=integrator.on_sample, timestamps=True,
+                                     clock=lambda: 0.0)
+        driver = FakeDriver()
+        driver.set_word(NPB1700Commands.CHG_STATUS, ChargeStatus.CCM.value)
+        driver.set_word(NPB1700Commands.READ_VOUT, 2400)
+        driver.set_word(NPB1700Commands.READ_IOUT, 1000)
+        scheduler.add_device("unit", NPB1700Service(driver))
+        for _ in range(3):
+            scheduler.poll_device("unit")
+        stages = integrator.stages("unit")
+        self.assertEqual(list(stages), [ChargeStatus.CCM])
+        # FakeDriver replies every 20 ms, VOUT -> IOUT of the last cycle ends the session
+        self.assertAlmostEqual(integrator.session("unit")["seconds"], 0.2)
+        self.assertAlmostEqual(integrator.session("unit")["amp_hours"], 10.0 * 0.2 / 3600)
+
+
+class TestIntegrateBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.timestamps = [0.0, 1.0, 2.5, 30.0, 31.0, 31.0, 32.0]
+        self.voltages = [24.0, 24.5, 25.0, 25.0, 26.0, 26.0, 26.0]
+        self.currents = [10.0, 9.0, 8.0, 8.0, 5.0, 5.0, 4.0]
+        self.stages = [ChargeStatus.CCM, ChargeStatus.CCM, ChargeStatus.CVM,
+                       ChargeStatus.CVM, None, None, None]
+
+    def test_matches_streaming(self):
+        integrator = EnergyIntegrator()
+        for sample in zip(self.timestamps, self.voltages, self.currents, self.stages):
+            integrator.update("unit", *sample)
+        batch = integrate_batch(self.timestamps, self.voltages, self.currents, self.stages)
+        session = integrator.session("unit")
+        for name in ("amp_hours", "watt_hours", "seconds", "gap_seconds"):
+            self.assertAlmostEqual(batch[name], session[name])
+        self.assertAlmostEqual(batch["gap_seconds"], 27.5)
+        for stage, totals in integrator.stages("unit").items():
+            self.assertAlmostEqual(batch["stages"][stage]["watt_hours"], totals["watt_hours"])
+
+    def test_python_fallback(self):
+        result = _integrate_python(self.timestamps, self.voltages, self.currents, None, 15.0)
+        self.assertEqual(list(result["stages"]), [None])
+        self.assertAlmostEqual(result["seconds"], 4.5)
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"), "numpy is not installed")
+    def test_numpy_matches_python(self):
+        import numpy
+        vectorized = _integrate_numpy(numpy, self.timestamps, self.voltages, self.currents, self.stages, 15.0)
+        plain = _integrate_python(self.timestamps, self.voltages, self.currents, self.stages, 15.0)
+        self.assertEqual(set(vectorized["stages"]), set(plain["stages"]))
+        for name in ("amp_hours", "watt_hours", "seconds", "gap_seconds"):
+            self.assertAlmostEqual(vectorized[name], plain[name])
+
+    def test_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            integrate_batch([0.0, 1.0], [24.0], [1.0, 2.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import threading
+import unittest
+from unittest import mock
+from can import Message
+
+from fakes import FakeDriver
+from npbcharger.commands import NPB1700Commands
+from npbcharger.frame_cache import FrameCache
+from npbcharger.parsers.factories import MODEL_LIMITS
+from npbcharger.services import NPB1700Service
+
+
+class TestFrameCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = FrameCache(maxsize=2)
+        cache.put("a", Message(data=b'\x01'))
+        cache.put("b", Message(data=b'\x02'))
+        cache.get("a")
+        cache.put("c", Message(data=b'\x03'))
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_hit_miss_counters(self):
+        cache = FrameCache()
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", Message())
+        cache.get("a")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.clear()
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 0))
+
+    def test_shared_between_threads(self):
+        cache = FrameCache(maxsize=8)
+        errors = []
+
+        def worker(offset: int):
+            try:
+                for step in range(2000):
+                    key = (offset + step) % 16
+                    if cache.get(key) is None:
+                        cache.put(key, Message(data=bytes([key])))
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(cache), 8)
+        self.assertEqual(cache.hits + cache.misses, 8000)
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            FrameCache(maxsize=0)
+
+
+class TestServiceFrameCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = FrameCache()
+        self.driver = FakeDriver()
+        self.service = NPB1700Service(self.driver, frame_cache=self.cache)
+
+    def test_repeated_setpoint_is_encoded_once(self):
+        for _ in range(5):
+            self.service.set_constant_current_curve(25.0)
+        self.service.set_constant_current_curve(30.0)
+
+        self.assertEqual(self.driver.frames_built, 2)
+        self.assertEqual(self.cache.hits, 4)
+        self.assertEqual(len(self.driver.writes), 6)
+        self.assertEqual(self.driver.writes[0], (NPB1700Commands.CURVE_CC, bytearray(b'\xc4\x09')))
+
+    def test_values_quantized_to_hundredths(self):
+        self.service.set_constant_voltage_curve(28.8)
+        self.service.set_constant_voltage_curve(28.801)
+        self.assertEqual(self.driver.frames_built, 1)
+        self.assertEqual(self.driver.writes[0], self.driver.writes[1])
+
+    def test_keys_separate_devices_and_fixed_point(self):
+        other_driver = FakeDriver(device_id=0x000C0104)
+        other = NPB1700Service(other_driver, frame_cache=self.cache)
+
+        self.service.set_constant_current_curve(25.0)
+        other.set_constant_current_curve(25.0)
+        self.service.write_fixed(NPB1700Commands.CURVE_CC, 25)
+
+        self.assertEqual(len(self.cache), 3)
+        self.assertEqual(other_driver.writes, [(NPB1700Commands.CURVE_CC, bytearray(b'\xc4\x09'))])
+        # 25 hundredths clamped to model minimum of 10 A
+        self.assertEqual(self.driver.writes[-1], (NPB1700Commands.CURVE_CC, bytearray(b'\xe8\x03')))
+
+    @mock.patch.dict(MODEL_LIMITS, {"TEST-1700-12": {**MODEL_LIMITS["NPB-1700-24"],
+                                                     NPB1700Commands.CURVE_CC: (20.0, 100.0)}})
+    def test_model_switch_uses_new_limits(self):
+        self.service.set_constant_current_curve(80.0)
+        self.service.use_model("TEST-1700-12")
+        self.service.set_constant_current_curve(80.0)
+
+        self.assertEqual(self.driver.writes[0][1], bytearray((5000).to_bytes(2, 'little')))
+        self.assertEqual(self.driver.writes[1][1], bytearray((8000).to_bytes(2, 'little')))
+
+    def test_operation_status_uses_cache(self):
+        self.service.set_operation_status(True)
+        self.service.set_operation_status(True)
+        self.assertEqual(self.driver.frames_built, 1)
+        self.assertEqual(self.driver.writes[-1], (NPB1700Commands.OPERATION, bytearray(b'\x01')))
+
+
+if __name__ == '__main__':
+    unittest.main()
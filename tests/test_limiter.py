@@ -0,0 +1,85 @@
+import unittest
+
+from npbcharger.commands import NPB1700Commands
+from npbcharger.driver import NPB1700
+from npbcharger.limiter import SiteCurrentLimiter
+from npbcharger.transports import ChargerSimulator, LoopbackBus
+
+ADDRESSES = (0, 1, 2)
+
+
+def word(value: int) -> bytearray:
+    return bytearray(value.to_bytes(2, byteorder='little'))
+
+
+class TestSiteCurrentLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = LoopbackBus()
+        self.chargers = {}
+        for address in ADDRESSES:
+            charger = ChargerSimulator(address, {NPB1700Commands.CURVE_CC: word(5000),
+                                                 NPB1700Commands.READ_IOUT: word(4900)})
+            self.bus.attach(charger)
+            self.chargers[address] = charger
+        self.driver = NPB1700(transport=self.bus.endpoint(), device_id=0x000C0100)
+        self.limiter = SiteCurrentLimiter(self.driver, [0x000C0100 | address for address in ADDRESSES],
+                                          site_limit=90.0, period=0.001)
+
+    def tearDown(self):
+        self.driver.__exit__(None, None, None)
+
+    def setpoint(self, address: int) -> int:
+        return int.from_bytes(self.chargers[address].registers[NPB1700Commands.CURVE_CC], byteorder='little')
+
+    def test_limit_shared_between_cc_limited_units(self):
+        result = self.limiter.step()
+        self.assertEqual(sum(result["setpoints"].values()), 9000)
+        self.assertEqual([self.setpoint(address) for address in ADDRESSES], [3000, 3000, 3000])
+        self.assertEqual(len(result["written"]), 3)
+
+    def test_spare_current_goes_to_others(self):
+        # Unit 2 is tapering in CV and draws 12 A only
+        self.chargers[2].set_word(NPB1700Commands.READ_IOUT, 1200)
+        self.limiter.step()
+        self.assertEqual(self.setpoint(2), 1300)
+        self.assertEqual([self.setpoint(0), self.setpoint(1)], [3850, 3850])
+
+    def test_unchanged_setpoints_not_written(self):
+        self.limiter.step()
+        for charger in self.chargers.values():
+            charger.requests.clear()
+            charger.set_word(NPB1700Commands.READ_IOUT, 2990)
+        result = self.limiter.step()
+        self.assertEqual(result["written"], [])
+        # Only the IOUT reads went out
+        self.assertTrue(all(len(charger.requests) == 1 for charger in self.chargers.values()))
+        self.assertEqual(self.limiter.stats()["skipped_writes"], 3)
+
+    def test_silent_unit_keeps_reserved_setpoint(self):
+        self.chargers[1].silent = True
+        result = self.limiter.step()
+        self.assertEqual(result["missing"], [0x000C0101])
+        self.assertEqual(result["setpoints"], {0x000C0100: 2000, 0x000C0102: 2000})
+
+    def test_setpoints_respect_model_limits(self):
+        self.limiter.site_limit = 20.0
+        result = self.limiter.step()
+        # Minimal CC of NPB-1700-24 is 10 A
+        self.assertEqual(set(result["setpoints"].values()), {1000})
+
+    def test_needs_devices(self):
+        with self.assertRaises(ValueError):
+            SiteCurrentLimiter(self.driver, [], site_limit=90.0)
+
+    def test_loop_stats(self):
+        for _ in range(3):
+            self.limiter.step()
+        stats = self.limiter.stats()
+        self.assertEqual(stats["steps"], 3)
+        self.assertGreater(stats["period_mean"], 0)
+        self.assertLessEqual(stats["period_min"], stats["period_p95"])
+
+
+if __name__ == '__main__':
+    unittest.main()
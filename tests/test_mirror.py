@@ -0,0 +1,126 @@
+import math
+import unittest
+
+from npbcharger.bus_budget import BusBudget
+from npbcharger.commands import NPB1700Commands
+from npbcharger.driver import NPB1700
+from npbcharger.mirror import RegisterMirror
+from npbcharger.parsers import ChargeStatus
+from npbcharger.services import NPB1700Service
+from npbcharger.transports import ChargerSimulator, LoopbackBus
+
+from fakes import FakeDriver
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def word(value: int) -> bytearray:
+    return bytearray(value.to_bytes(2, byteorder='little'))
+
+
+class TestRegisterMirror(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.driver = FakeDriver({
+            NPB1700Commands.READ_VOUT: word(2410),
+            NPB1700Commands.CHG_STATUS: word(ChargeStatus.CVM.value),
+            NPB1700Commands.MFR_MODEL_B0B5: b'NPB-17',
+        })
+        self.mirror = RegisterMirror(NPB1700Service(self.driver), clock=self.clock)
+
+    def test_unread_registers(self):
+        self.assertIsNone(self.mirror.get(NPB1700Commands.READ_VOUT))
+        self.assertTrue(math.isinf(self.mirror.age(NPB1700Commands.READ_VOUT)))
+        self.assertIn(NPB1700Commands.READ_VOUT, self.mirror.due())
+
+    def test_refresh_and_lazy_decode(self):
+        self.mirror.refresh()
+        reads = len(self.driver.reads)
+
+        self.assertAlmostEqual(self.mirror[NPB1700Commands.READ_VOUT], 24.1)
+        self.assertIn(ChargeStatus.CVM, self.mirror[NPB1700Commands.CHG_STATUS]["status"])
+        self.assertEqual(self.mirror[NPB1700Commands.MFR_MODEL_B0B5], bytearray(b'NPB-17'))
+        # No parser: raw payload is returned
+        self.assertEqual(self.mirror[NPB1700Commands.MFR_ID_B0B5], bytearray(6))
+        # Access never touches the bus
+        self.assertEqual(len(self.driver.reads), reads)
+        self.assertEqual(self.mirror.age(NPB1700Commands.READ_VOUT), 0.0)
+
+    def test_incremental_refresh_by_staleness(self):
+        """Only registers older than their max age are read again, stalest first"""
+        self.mirror.refresh()
+        self.driver.reads.clear()
+
+        self.clock.now += 0.6
+        self.assertEqual(set(self.mirror.due()),
+                         {NPB1700Commands.FAULT_STATUS, NPB1700Commands.CHG_STATUS})
+        self.clock.now += 0.6
+        due = self.mirror.due()
+        # Status registers (0.5 s) are staler than telemetry (1 s)
+        self.assertEqual(set(due[:2]), {NPB1700Commands.FAULT_STATUS, NPB1700Commands.CHG_STATUS})
+        self.assertIn(NPB1700Commands.READ_VOUT, due)
+        self.assertNotIn(NPB1700Commands.MFR_MODEL_B0B5, due)
+
+        refreshed = self.mirror.refresh(max_reads=2)
+        self.assertEqual(refreshed, due[:2])
+        self.assertEqual(self.driver.reads, due[:2])
+
+    def test_decoded_value_follows_raw_change(self):
+        self.mirror.refresh()
+        self.assertAlmostEqual(self.mirror[NPB1700Commands.READ_VOUT], 24.1)
+        self.driver.set_word(NPB1700Commands.READ_VOUT, 2500)
+        self.mirror.invalidate(NPB1700Commands.READ_VOUT)
+        self.mirror.refresh()
+        self.assertAlmostEqual(self.mirror[NPB1700Commands.READ_VOUT], 25.0)
+
+    def test_refresh_limited_by_bus_budget(self):
+        budget = BusBudget(target_load=0.001)
+        refreshed = self.mirror.refresh(budget=budget)
+        self.assertTrue(0 < len(refreshed) < len(self.mirror.commands))
+
+    def test_budget_is_spent(self):
+        budget = BusBudget(target_load=0.01, clock=self.clock)
+        first = self.mirror.refresh(budget=budget)
+        self.assertTrue(first)
+        # Window is used up by the first refresh
+        self.assertEqual(self.mirror.refresh(budget=budget), [])
+        self.clock.now += 1.5
+        second = self.mirror.refresh(budget=budget)
+        self.assertTrue(second)
+        self.assertFalse(set(first) & set(second))
+
+    def test_missing_register_backs_off(self):
+        bus = LoopbackBus()
+        bus.attach(ChargerSimulator(0x03, {NPB1700Commands.READ_VOUT: word(2410)}))
+        driver = NPB1700(transport=bus.endpoint())
+        mirror = RegisterMirror(NPB1700Service(driver), clock=self.clock,
+                                commands=[NPB1700Commands.READ_VOUT, NPB1700Commands.READ_IOUT])
+
+        self.assertEqual(mirror.refresh(), [NPB1700Commands.READ_VOUT])
+        self.assertAlmostEqual(mirror[NPB1700Commands.READ_VOUT], 24.1)
+        self.assertEqual(mirror.due(), [])
+        self.clock.now += 1.0
+        self.assertIn(NPB1700Commands.READ_IOUT, mirror.due())
+        mirror.refresh()
+        # Second miss doubles the backoff
+        self.clock.now += 1.5
+        self.assertNotIn(NPB1700Commands.READ_IOUT, mirror.due())
+        self.clock.now += 0.5
+        self.assertIn(NPB1700Commands.READ_IOUT, mirror.due())
+
+    def test_image_feeds_profiles(self):
+        self.mirror.store(NPB1700Commands.CURVE_CV, word(2880))
+        image = self.mirror.image()
+        self.assertEqual(image, {NPB1700Commands.CURVE_CV: word(2880)})
+        self.assertEqual(self.mirror.raw(NPB1700Commands.CURVE_CV), 2880)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+
+from npbcharger.commands import NPB1700Commands
+from npbcharger.profiles import ChargingProfile, ProfileStore
+from npbcharger.services import NPB1700Service
+
+from fakes import FakeDriver
+
+
+def word(value: int) -> bytearray:
+    return bytearray(value.to_bytes(2, byteorder='little'))
+
+
+class TestChargingProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.agm = ChargingProfile(
+            "agm-100ah", chemistry="AGM",
+            constant_current=20.0, constant_voltage=28.8, float_voltage=27.6,
+            taper_current=3.0, cc_timeout=600,
+            curve_config={"CUVS": 0, "TCS": 2, "CUVE": True},
+        )
+        self.image = {
+            NPB1700Commands.CURVE_CC: word(2000),
+            NPB1700Commands.CURVE_CV: word(2880),
+            NPB1700Commands.CURVE_FV: word(2700),
+            NPB1700Commands.CURVE_TC: word(300),
+            NPB1700Commands.CURVE_CC_TIMEOUT: word(600),
+            # CUVE, TCS=2 and CCTOE already set
+            NPB1700Commands.CURVE_CONFIG: word(0x0188),
+        }
+
+    def test_json_round_trip(self):
+        restored = ChargingProfile.from_json(self.agm.to_json())
+        self.assertEqual(restored, self.agm)
+        self.assertNotIn("cv_timeout", self.agm.to_dict())
+
+    def test_unknown_setting_rejected(self):
+        with self.assertRaises(ValueError):
+            ChargingProfile.from_dict({"name": "x", "boost_voltage": 30.0})
+
+    def test_registers(self):
+        registers = self.agm.registers()
+        self.assertEqual(registers[NPB1700Commands.CURVE_CV], 28.8)
+        self.assertNotIn(NPB1700Commands.CURVE_CV_TIMEOUT, registers)
+
+    def test_diff_against_image(self):
+        """Only float voltage differs, config fields not in profile are kept"""
+        diff = self.agm.diff(self.image)
+        self.assertEqual(diff, {NPB1700Commands.CURVE_FV: word(2760)})
+
+    def test_diff_missing_registers_are_written(self):
+        diff = self.agm.diff({})
+        self.assertEqual(set(diff), set(self.agm.registers()))
+
+
+class TestProfileStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = ProfileStore([
+            ChargingProfile("lfp-8s", chemistry="LiFePO4", constant_voltage=28.4, float_voltage=27.2),
+            ChargingProfile("agm", chemistry="AGM", constant_voltage=28.8, float_voltage=27.6,
+                            curve_config={"TCS": 2}),
+            ChargingProfile("agm-cold", chemistry="AGM", constant_voltage=29.4, float_voltage=27.6),
+        ])
+
+    def test_indexes(self):
+        self.assertEqual(len(self.store), 3)
+        self.assertIn("agm", self.store)
+        self.assertEqual({profile.name for profile in self.store.by_chemistry("AGM")},
+                         {"agm", "agm-cold"})
+        self.assertEqual(self.store.by_chemistry("NiMH"), [])
+
+    def test_duplicate_and_replace(self):
+        with self.assertRaises(ValueError):
+            self.store.add(ChargingProfile("agm"))
+        self.store.add(ChargingProfile("agm", chemistry="Gel"), replace=True)
+        self.assertEqual([profile.name for profile in self.store.by_chemistry("AGM")], ["agm-cold"])
+        self.assertEqual(self.store.get("agm").chemistry, "Gel")
+
+    def test_remove(self):
+        self.store.remove("lfp-8s")
+        self.assertNotIn("LiFePO4", self.store.chemistries())
+        with self.assertRaises(KeyError):
+            self.store.get("lfp-8s")
+
+    def test_switch_diff(self):
+        """Switching between profiles writes only registers which differ"""
+        image = self.store.get("agm").encode()
+        self.assertEqual(self.store.diff("agm", image), {})
+        self.assertEqual(set(self.store.diff("agm-cold", image)), {NPB1700Commands.CURVE_CV})
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "profiles.json")
+            self.store.save(path)
+            loaded = ProfileStore.load(path)
+        self.assertEqual(loaded.names(), self.store.names())
+        self.assertEqual(loaded.get("agm"), self.store.get("agm"))
+
+    def test_apply_with_image_skips_read(self):
+        """Service applies profile diff using cached image without reading the bus first"""
+        driver = FakeDriver()
+        service = NPB1700Service(driver)
+        image = self.store.get("agm").encode()
+        driver.registers.update(image)
+
+        written = service.apply_profile(self.store.get("agm-cold"), image=image)
+
+        self.assertEqual(list(written), [NPB1700Commands.CURVE_CV])
+        # Only verification read of the changed register
+        self.assertEqual(driver.reads, [NPB1700Commands.CURVE_CV])
+
+
+if __name__ == '__main__':
+    unittest.main()
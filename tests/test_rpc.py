@@ -0,0 +1,136 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from can import Message
+
+from npbcharger.commands import NPB1700Commands
+from npbcharger.driver import NPB1700
+from npbcharger.exceptions import NPBCommunicationError
+from npbcharger.rpc import OP_PING, OP_READ, RemoteDriver, RpcClient, RpcError, RpcServer
+from npbcharger.services import NPB1700Service
+from npbcharger.transports import ChargerSimulator, LoopbackBus
+
+
+def word(value: int) -> bytearray:
+    return bytearray(value.to_bytes(2, byteorder='little'))
+
+
+class SlowCharger(ChargerSimulator):
+    """Answers after a delay, so pipelined requests overlap on the server"""
+
+    def __init__(self, address, registers):
+        super().__init__(address, registers)
+        self.delay = 0.05
+        self.request_times = []
+
+    def __call__(self, msg):
+        if msg.arbitration_id != 0x000C0100 | self.address:
+            return []
+        self.request_times.append(time.monotonic())
+        time.sleep(self.delay)
+        return super().__call__(msg)
+
+
+class TestRpc(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = LoopbackBus()
+        self.charger = SlowCharger(0x03, {NPB1700Commands.READ_VOUT: word(2400),
+                                          NPB1700Commands.READ_IOUT: word(1050),
+                                          NPB1700Commands.CURVE_CC: word(5000)})
+        self.bus.attach(self.charger)
+        self.driver = NPB1700(transport=self.bus.endpoint(), device_id=0x000C0100)
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "npb.sock")
+        self.server = RpcServer(self.driver, self.path)
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(self.server.start())
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.client = RpcClient(self.path)
+
+    def tearDown(self):
+        self.client.close()
+        asyncio.run_coroutine_threadsafe(self.server.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.driver.__exit__(None, None, None)
+        self.directory.cleanup()
+
+    def test_service_over_socket(self):
+        service = NPB1700Service(RemoteDriver(self.client, 0x000C0103))
+        self.assertEqual(service.get_voltage_current(), 24.0)
+        service.set_constant_current_curve(30.0)
+        self.assertEqual(self.charger.registers[NPB1700Commands.CURVE_CC], word(3000))
+        # Write dropped the cached value
+        self.assertEqual(service.get_constant_current_curve(), 30.0)
+
+    def test_pipelined_burst(self):
+        remote = RemoteDriver(self.client, 0x000C0103)
+        replies = remote.read_burst([NPB1700Commands.READ_VOUT, NPB1700Commands.READ_IOUT])
+        self.assertEqual(replies[NPB1700Commands.READ_IOUT].data, NPB1700Commands.READ_IOUT.value + word(1050))
+        self.assertEqual(replies[NPB1700Commands.READ_VOUT].arbitration_id, 0x000C0003)
+
+    def test_identical_reads_coalesced(self):
+        other = RpcClient(self.path)
+        try:
+            first = RemoteDriver(self.client, 0x000C0103, max_age=0.0)
+            second = RemoteDriver(other, 0x000C0103, max_age=0.0)
+            pending = [first._submit_read(NPB1700Commands.READ_VOUT),
+                       second._submit_read(NPB1700Commands.READ_VOUT)]
+            # Same payload, ages differ by the time between responses
+            self.assertEqual(self.client.result(pending[0])[4:], other.result(pending[1])[4:])
+        finally:
+            other.close()
+        self.assertEqual(self.server.bus_reads, 1)
+        self.assertEqual(self.server.coalesced, 1)
+        self.assertEqual(len(self.charger.requests), 1)
+
+    def test_fresh_value_from_cache(self):
+        service = NPB1700Service(RemoteDriver(self.client, 0x000C0103, max_age=10.0))
+        service.get_voltage_current()
+        self.charger.set_word(NPB1700Commands.READ_VOUT, 2500)
+        self.assertEqual(service.get_voltage_current(), 24.0)
+        self.assertEqual(self.server.cache_hits, 1)
+        # max_age 0 goes to the bus
+        fresh = NPB1700Service(RemoteDriver(self.client, 0x000C0103, max_age=0.0))
+        self.assertEqual(fresh.get_voltage_current(), 25.0)
+
+    def test_socket_owner_only(self):
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    def test_requests_paced(self):
+        self.charger.delay = 0.0
+        remote = RemoteDriver(self.client, 0x000C0103, max_age=0.0)
+        remote.read_burst([NPB1700Commands.READ_VOUT, NPB1700Commands.READ_IOUT, NPB1700Commands.CURVE_CC])
+        remote.write_burst([(NPB1700Commands.CURVE_CC, word(3000)), (NPB1700Commands.CURVE_CC, word(3100))])
+        times = self.charger.request_times
+        self.assertEqual(len(times), 5)
+        for earlier, later in zip(times, times[1:]):
+            self.assertGreaterEqual(later - earlier, 0.019)
+
+    def test_late_reply_not_taken_for_answer(self):
+        # Reply to a request nobody waits for anymore
+        self.bus.publish(Message(arbitration_id=0x000C0003, is_extended_id=True,
+                                 data=NPB1700Commands.READ_IOUT.value + word(1050)))
+        service = NPB1700Service(RemoteDriver(self.client, 0x000C0103))
+        self.assertEqual(service.get_voltage_current(), 24.0)
+        self.assertEqual(service.get_constant_current(), 10.5)
+
+    def test_errors(self):
+        self.assertEqual(self.client.call(OP_PING), b"")
+        with self.assertRaises(NPBCommunicationError):
+            RemoteDriver(self.client, 0x000C0105).read(NPB1700Commands.READ_VOUT)
+        with self.assertRaises(RpcError):
+            self.client.call(OP_READ, 0xFF, NPB1700Commands.READ_VOUT)
+        # Connection survives failed requests
+        self.assertEqual(RemoteDriver(self.client, 0x000C0103).read(NPB1700Commands.READ_IOUT).data[2:], word(1050))
+
+
+if __name__ == '__main__':
+    unittest.main()
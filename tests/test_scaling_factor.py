@@ -0,0 +1,83 @@
+import unittest
+from can import Message
+
+from npbcharger.commands import NPB1700Commands
+from npbcharger.parsers import ScalingFactorParser, scaling_from_fields, ParserFactory
+from npbcharger.services import NPB1700Service
+
+from fakes import FakeDriver
+
+
+def word(value: int) -> bytearray:
+    return bytearray(value.to_bytes(2, byteorder='little'))
+
+
+class TestScalingFactorParser(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = ScalingFactorParser()
+
+    def test_decode_factors(self):
+        # VOUT code 5 (0.01), IOUT code 6 (0.1), VIN code 7 (1.0)
+        msg = Message(data=bytearray([0xC0, 0x00]) + word(0x0765))
+        fields = self.parser.parse_read(msg)["fields"]
+
+        self.assertEqual(fields["VOUT_FACTOR"], 0.01)
+        self.assertEqual(fields["IOUT_FACTOR"], 0.1)
+        self.assertEqual(fields["VIN_FACTOR"], 1.0)
+        self.assertEqual(scaling_from_fields(fields), {"voltage": 0.01, "current": 0.1})
+
+    def test_unsupported_code(self):
+        msg = Message(data=bytearray([0xC0, 0x00]) + word(0x0000))
+        fields = self.parser.parse_read(msg)["fields"]
+        self.assertEqual(scaling_from_fields(fields), {"voltage": None, "current": None})
+
+
+class TestCalibration(unittest.TestCase):
+
+    def _driver(self, model: bytes, scaling_word: int) -> FakeDriver:
+        return FakeDriver({
+            NPB1700Commands.MFR_MODEL_B0B5: model[:6],
+            NPB1700Commands.MFR_MODEL_B6B11: model[6:],
+            NPB1700Commands.SCALING_FACTOR: word(scaling_word),
+            NPB1700Commands.READ_IOUT: word(425),
+            NPB1700Commands.READ_VOUT: word(2750),
+        })
+
+    def test_calibrate_at_connect(self):
+        """Current registers use factor reported by device, read on construction when asked"""
+        driver = self._driver(b'NPB-1700-24 ', 0x0065)
+        service = NPB1700Service(driver, calibrate=True)
+        self.assertIn(NPB1700Commands.SCALING_FACTOR, driver.reads)
+
+        self.assertAlmostEqual(service.get_constant_current(), 42.5)
+        self.assertAlmostEqual(service.get_voltage_current(), 27.5)
+        self.assertEqual(service.parser_factory.model_id, "NPB-1700-24")
+
+    def test_construction_stays_off_bus(self):
+        driver = self._driver(b'NPB-1700-24 ', 0x0065)
+        service = NPB1700Service(driver)
+        self.assertEqual(driver.reads, [])
+        # Hard-coded 0.01 factor
+        self.assertAlmostEqual(service.get_constant_current(), 4.25)
+
+    def test_given_model_reads_only_factors(self):
+        driver = self._driver(b'NPB-2000-24 ', 0x0065)
+        service = NPB1700Service(driver, model_id="NPB-1700-24", calibrate=True)
+        self.assertEqual(driver.reads, [NPB1700Commands.SCALING_FACTOR])
+        self.assertAlmostEqual(service.get_constant_current(), 42.5)
+
+    def test_registry_shared_by_identity(self):
+        first = NPB1700Service(self._driver(b'NPB-1700-24 ', 0x0055), calibrate=True)
+        second = NPB1700Service(self._driver(b'NPB-1700-24 ', 0x0055), calibrate=True)
+        self.assertIs(first.parser_factory, second.parser_factory)
+        self.assertIs(first.parser_factory, ParserFactory.for_model("NPB-1700-24"))
+
+    def test_unknown_model_rejected(self):
+        """Limits of another model would clamp setpoints wrongly"""
+        with self.assertRaises(ValueError):
+            NPB1700Service(self._driver(b'NPB-2000-24 ', 0x0055), calibrate=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+
+from npbcharger.commands import NPB1700Commands
+from npbcharger.parsers import ChargeStatus, FaultStatus
+from npbcharger.scheduler import PollingScheduler, STAGE_PERIODS, FAULT_PERIOD, IDLE_PERIOD
+from npbcharger.services import NPB1700Service
+
+from fakes import FakeDriver
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestPollingScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = PollingScheduler(clock=self.clock)
+
+    def _add(self, key, charge_word: int, fault_word: int = 0) -> FakeDriver:
+        driver = FakeDriver()
+        driver.set_word(NPB1700Commands.CHG_STATUS, charge_word)
+        driver.set_word(NPB1700Commands.FAULT_STATUS, fault_word)
+        self.scheduler.add_device(key, NPB1700Service(driver))
+        return driver
+
+    def test_period_follows_charge_stage(self):
+        """Each device gets the period of its decoded charge stage"""
+        self._add("cc", ChargeStatus.CCM.value)
+        self._add("float", ChargeStatus.FVM.value)
+        self._add("full", ChargeStatus.FULLM.value)
+        self._add("idle", 0)
+        self.scheduler.run_once()
+
+        periods = self.scheduler.poll_periods()
+        self.assertAlmostEqual(periods["cc"], STAGE_PERIODS[ChargeStatus.CCM])
+        self.assertAlmostEqual(periods["float"], STAGE_PERIODS[ChargeStatus.FVM])
+        self.assertAlmostEqual(periods["full"], STAGE_PERIODS[ChargeStatus.FULLM])
+        self.assertAlmostEqual(periods["idle"], IDLE_PERIOD)
+
+    def test_fault_speeds_up_polling(self):
+        self._add("unit", ChargeStatus.FULLM.value, FaultStatus.OTP.value)
+        self.scheduler.run_once()
+        self.assertAlmostEqual(self.scheduler.poll_periods()["unit"], FAULT_PERIOD)
+
+    def test_only_due_devices_are_polled(self):
+        """Fully charged device is not polled again before its period passes"""
+        busy = self._add("cc", ChargeStatus.CCM.value)
+        full = self._add("full", ChargeStatus.FULLM.value)
+        self.scheduler.run_once()
+        busy.reads.clear()
+        full.reads.clear()
+
+        self.clock.now = STAGE_PERIODS[ChargeStatus.CCM]
+        samples = self.scheduler.run_once()
+
+        self.assertTrue(busy.reads)
+        self.assertEqual(full.reads, [])
+        self.assertEqual({key for key, _, _ in samples}, {"cc"})
+
+    def test_budget_slows_regular_devices_first(self):
+        """When oversubscribed, faulted devices keep their period"""
+        self.scheduler = PollingScheduler(request_budget=100.0, clock=self.clock)
+        self._add("fault", ChargeStatus.CCM.value, FaultStatus.OLP.value)
+        for index in range(4):
+            self._add(index, ChargeStatus.CCM.value)
+        self.scheduler.run_once()
+
+        periods = self.scheduler.poll_periods()
+        self.assertAlmostEqual(periods["fault"], FAULT_PERIOD)
+        self.assertGreater(periods[0], STAGE_PERIODS[ChargeStatus.CCM])
+
+        devices = self.scheduler.devices()
+        total_rate = sum(device.requests_per_cycle / periods[key]
+                         for key, device in devices.items())
+        self.assertLessEqual(total_rate, 100.0 + 1e-9)
+
+    def test_samples_delivered_to_callback(self):
+        received = []
+        self.scheduler = PollingScheduler(on_sample=lambda *sample: received.append(sample),
+                                          clock=self.clock)
+        driver = self._add("unit", ChargeStatus.CVM.value)
+        driver.registers[NPB1700Commands.READ_VOUT] = bytearray((2400).to_bytes(2, 'little'))
+        self.scheduler.run_once()
+
+        vout = [value for _, command, value in received if command == NPB1700Commands.READ_VOUT]
+        self.assertAlmostEqual(vout[0], 24.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
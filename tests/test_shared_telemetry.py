@@ -0,0 +1,99 @@
+import os
+import subprocess
+import sys
+import unittest
+import uuid
+from unittest import mock
+
+from npbcharger import shared_telemetry
+from npbcharger.commands import NPB1700Commands
+from npbcharger.shared_telemetry import TelemetryPublisher, TelemetryReader
+from npbcharger.timing import Reading
+
+DEVICES = (0x000C0100, 0x000C0103)
+
+
+class TestSharedTelemetry(unittest.TestCase):
+
+    def setUp(self):
+        self.name = f"npb_test_{uuid.uuid4().hex[:12]}"
+        self.publisher = TelemetryPublisher(self.name, DEVICES, ring_size=4)
+        self.reader = TelemetryReader(self.name)
+
+    def tearDown(self):
+        self.reader.close()
+        self.publisher.close()
+
+    def test_layout_shared(self):
+        self.assertEqual(self.reader.device_ids, list(DEVICES))
+        self.assertIn(NPB1700Commands.READ_VOUT, self.reader.commands)
+        self.assertEqual(self.reader.latest(DEVICES[0]), {})
+
+    def test_latest_and_history(self):
+        for step in range(6):
+            self.publisher.publish(DEVICES[1], NPB1700Commands.READ_VOUT, 24.0 + step, float(step))
+        self.publisher.on_sample(DEVICES[1], NPB1700Commands.FAULT_STATUS, Reading({"raw_value": 0x02}, 6.0, 6.5))
+
+        latest = self.reader.latest(DEVICES[1])
+        self.assertEqual(latest[NPB1700Commands.READ_VOUT], (29.0, 5.0))
+        self.assertEqual(latest[NPB1700Commands.FAULT_STATUS], (2.0, 6.5))
+        self.assertEqual(self.reader.latest(DEVICES[0]), {})
+        # Ring keeps the last 4 samples
+        self.assertEqual(self.reader.history(DEVICES[1], NPB1700Commands.READ_VOUT),
+                         [(2.0, 26.0), (3.0, 27.0), (4.0, 28.0), (5.0, 29.0)])
+        self.assertEqual(self.reader.history(DEVICES[1], NPB1700Commands.READ_VOUT, 2), [(4.0, 28.0), (5.0, 29.0)])
+        self.assertEqual(self.reader.sequence(DEVICES[1]), 14)
+
+    def test_torn_slot_is_not_read(self):
+        self.publisher.publish(DEVICES[0], NPB1700Commands.READ_IOUT, 10.0, 1.0)
+        slot = self.publisher.layout.slot(0)
+        # Publisher died in the middle of an update
+        self.publisher._buffer[slot] += 1
+        with self.assertRaises(RuntimeError):
+            self.reader.latest(DEVICES[0])
+
+    def test_torn_read_retried(self):
+        self.publisher.publish(DEVICES[0], NPB1700Commands.READ_IOUT, 10.0, 1.0)
+        slot = self.publisher.layout.slot(0)
+        self.publisher._buffer[slot] += 1
+        calls = []
+
+        def finish_update(seconds):
+            # Publisher completes the update while the reader yields
+            calls.append(seconds)
+            if len(calls) == 3:
+                self.publisher._buffer[slot] += 1
+        with mock.patch("npbcharger.shared_telemetry.time.sleep", side_effect=finish_update):
+            self.assertEqual(self.reader.latest(DEVICES[0])[NPB1700Commands.READ_IOUT], (10.0, 1.0))
+        self.assertEqual(calls, [0, 0, 0])
+
+    def test_other_process_reads(self):
+        self.publisher.publish(DEVICES[0], NPB1700Commands.READ_IOUT, 12.5, 3.0)
+        code = (
+            "from npbcharger.commands import NPB1700Commands\n"
+            "from npbcharger.shared_telemetry import TelemetryReader\n"
+            f"with TelemetryReader({self.name!r}) as reader:\n"
+            f"    print(reader.latest({DEVICES[0]})[NPB1700Commands.READ_IOUT])\n"
+        )
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [
+            os.path.join(os.path.dirname(__file__), "..", "src"), os.environ.get("PYTHONPATH")])))
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+        self.assertEqual(output.stdout.strip(), "(12.5, 3.0)")
+        # Reader exiting must not remove the segment
+        with TelemetryReader(self.name) as reader:
+            self.assertEqual(reader.latest(DEVICES[0])[NPB1700Commands.READ_IOUT], (12.5, 3.0))
+
+    def test_rejects_foreign_segment(self):
+        from multiprocessing import shared_memory
+        other = shared_memory.SharedMemory(name=self.name + "x", create=True, size=64)
+        try:
+            # Created by this process, so the reader leaves its tracker registration alone
+            with mock.patch.object(shared_telemetry, "_created", {other.name}), self.assertRaises(ValueError):
+                TelemetryReader(other.name)
+        finally:
+            other.close()
+            other.unlink()
+
+
+if __name__ == '__main__':
+    unittest.main()
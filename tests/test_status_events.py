@@ -0,0 +1,99 @@
+import asyncio
+import unittest
+
+from npbcharger.commands import NPB1700Commands
+from npbcharger.parsers import ChargeStatus, FaultStatus, SystemStatus
+from npbcharger.parsers.factories import Severity
+from npbcharger.services import NPB1700Service
+
+from fakes import FakeDriver
+
+
+class TestStatusEvents(unittest.TestCase):
+
+    def setUp(self):
+        self.driver = FakeDriver()
+        self.driver.set_word(NPB1700Commands.FAULT_STATUS, 0x0000)
+        self.driver.set_word(NPB1700Commands.CHG_STATUS, ChargeStatus.CCM.value)
+        # DC_OK is active low, bit set means output is fine
+        self.driver.set_word(NPB1700Commands.SYSTEM_STATUS, SystemStatus.DC_OK.value)
+        self.service = NPB1700Service(self.driver)
+        self.received = []
+
+    def test_first_poll_reports_active_states(self):
+        """First poll reports every active flag as set"""
+        self.service.subscribe_status(self.received.append)
+        events = self.service.poll_status_changes()
+
+        self.assertEqual(events, self.received)
+        self.assertEqual([event.state for event in events], [ChargeStatus.CCM])
+        self.assertTrue(events[0].active)
+        self.assertIsNone(events[0].previous_raw)
+
+    def test_unchanged_words_emit_nothing(self):
+        """Repeated equal words produce no events"""
+        self.service.subscribe_status(self.received.append)
+        self.service.poll_status_changes()
+        self.received.clear()
+
+        self.assertEqual(self.service.poll_status_changes(), [])
+        self.assertEqual(self.received, [])
+
+    def test_set_and_cleared_edges(self):
+        """Only changed flags are reported with their severity"""
+        self.service.subscribe_status(self.received.append)
+        self.service.poll_status_changes()
+        self.received.clear()
+
+        self.driver.set_word(NPB1700Commands.FAULT_STATUS, FaultStatus.OTP.value)
+        self.driver.set_word(NPB1700Commands.CHG_STATUS, ChargeStatus.CVM.value)
+        self.driver.set_word(NPB1700Commands.SYSTEM_STATUS, 0x0000)
+        self.service.poll_status_changes()
+
+        edges = {(event.state, event.active) for event in self.received}
+        self.assertEqual(edges, {
+            (FaultStatus.OTP, True),
+            (ChargeStatus.CCM, False),
+            (ChargeStatus.CVM, True),
+            (SystemStatus.DC_OK, True),
+        })
+        otp = [event for event in self.received if event.state == FaultStatus.OTP][0]
+        self.assertEqual(otp.severity, Severity.CRITICAL)
+        self.assertEqual(otp.previous_raw, 0)
+
+    def test_subscription_filters_commands(self):
+        """Subscribers receive events only for their commands and polls read only watched registers"""
+        self.service.subscribe_status(self.received.append, [NPB1700Commands.FAULT_STATUS])
+        self.driver.set_word(NPB1700Commands.FAULT_STATUS, FaultStatus.OP_OFF.value)
+        self.service.poll_status_changes()
+
+        self.assertEqual(self.driver.reads, [NPB1700Commands.FAULT_STATUS])
+        self.assertEqual([event.state for event in self.received], [FaultStatus.OP_OFF])
+
+    def test_unsubscribe(self):
+        unsubscribe = self.service.subscribe_status(self.received.append)
+        unsubscribe()
+        self.service.poll_status_changes()
+        self.assertEqual(self.received, [])
+
+    def test_non_status_command_rejected(self):
+        with self.assertRaises(ValueError):
+            self.service.subscribe_status(self.received.append, [NPB1700Commands.READ_VOUT])
+
+    def test_broadcast_skips_poll(self):
+        service = NPB1700Service(FakeDriver(is_broadcast=True))
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(service.poll_status_changes(), [])
+
+    def test_async_iterator(self):
+        """status_events yields the same edges as poll_status_changes"""
+        async def first_event():
+            async for event in self.service.status_events(period=0):
+                return event
+
+        event = asyncio.run(first_event())
+        self.assertEqual(event.state, ChargeStatus.CCM)
+
+
+if __name__ == '__main__':
+    unittest.main()
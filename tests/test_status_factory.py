@@ -1,3 +1,4 @@
+import threading
 import unittest
 from enum import Flag
 from can import Message
@@ -74,3 +75,53 @@ class TestStatusFactory(unittest.TestCase):
         active_state = result["active_states"][0]
         self.assertEqual(active_state["name"], "Error State")
         self.assertEqual(active_state["severity"], Severity.CRITICAL)
+
+    def test_results_memoized_by_word(self):
+        first = self.parser.parse_word(0x0003)
+        self.assertIs(self.parser.parse_word(0x0003), first)
+        self.assertIsNot(self.parser.parse_word(0x0001), first)
+
+    def test_results_read_only(self):
+        result = self.parser.parse_word(0x0001)
+        with self.assertRaises(TypeError):
+            result["has_critical"] = False
+        with self.assertRaises(TypeError):
+            result["active_states"][0]["name"] = "Changed"
+        self.assertEqual(result["severities"], frozenset({Severity.CRITICAL, Severity.INFO}))
+        # Mutable copy on request
+        copy = dict(result)
+        copy["has_critical"] = False
+        self.assertTrue(self.parser.parse_word(0x0001)["has_critical"])
+
+    def test_memo_bounded_and_prefilled(self):
+        parser = self.TestParser(memo_size=2, prefill=[0x0001, 0x0002])
+        parser.parse_word(0x0004)
+        # Oldest word dropped, newest ones kept
+        self.assertEqual(len(parser._memo), 2)
+        self.assertNotIn(0x0001, parser._memo)
+        self.assertIn(0x0002, parser._memo)
+        self.assertIs(parser.parse_word(0x0002), parser._memo[0x0002])
+
+    def test_shared_parser_across_threads(self):
+        parser = self.TestParser(memo_size=4)
+        errors = []
+
+        def decode(offset):
+            try:
+                for step in range(2000):
+                    word = (step + offset) % 16
+                    self.assertEqual(parser.parse_word(word)["raw_value"], word)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=decode, args=(offset,)) for offset in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(parser._memo), 4)
+
+    def test_memo_disabled(self):
+        parser = self.TestParser(memo_size=0)
+        self.assertEqual(parser.parse_word(0x0001), parser.parse_word(0x0001))
+        self.assertEqual(len(parser._memo), 0)
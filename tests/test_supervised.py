@@ -0,0 +1,150 @@
+import unittest
+import can
+from can import Message
+
+from npbcharger.commands import NPB1700Commands
+from npbcharger.driver import NPB1700
+from npbcharger.exceptions import NPBTransportError
+from npbcharger.mirror import RegisterMirror
+from npbcharger.services import NPB1700Service
+from npbcharger.transports import ChargerSimulator, LoopbackBus, PythonCanTransport, SupervisedTransport
+
+
+def word(value: int) -> bytearray:
+    return bytearray(value.to_bytes(2, byteorder='little'))
+
+
+class FlakyAdapter:
+    """Opens loopback endpoints, can fail opens and drop the open endpoint"""
+
+    def __init__(self, bus: LoopbackBus):
+        self.bus = bus
+        self.fail_opens = 0
+        self.opened = []
+
+    def __call__(self):
+        if self.fail_opens:
+            self.fail_opens -= 1
+            raise NPBTransportError("adapter not found")
+        self.opened.append(self.bus.endpoint())
+        return self.opened[-1]
+
+    def drop(self):
+        self.opened[-1].shutdown()
+
+
+class TestSupervisedTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = LoopbackBus()
+        self.charger = ChargerSimulator(0x03, {
+            NPB1700Commands.READ_VOUT: word(2400),
+            NPB1700Commands.CURVE_CC: word(2000),
+        })
+        self.bus.attach(self.charger)
+        self.adapter = FlakyAdapter(self.bus)
+        self.sleeps = []
+        self.transport = SupervisedTransport(self.adapter, sleep=self.sleeps.append)
+        self.driver = NPB1700(transport=self.transport)
+
+    def test_read_survives_adapter_drop(self):
+        self.adapter.drop()
+        reply = self.driver.read(NPB1700Commands.READ_VOUT)
+
+        self.assertEqual(reply.data[2:4], word(2400))
+        self.assertEqual(self.transport.reconnects, 1)
+        self.assertEqual(len(self.adapter.opened), 2)
+        self.assertIsNotNone(self.transport.last_recovery_time)
+
+    def test_backoff_between_failed_opens(self):
+        self.adapter.fail_opens = 3
+        self.adapter.drop()
+        self.driver.read(NPB1700Commands.READ_VOUT)
+        self.assertEqual(self.sleeps, [0.05, 0.1, 0.2])
+        self.assertEqual(self.transport.failed_attempts, 3)
+
+    def test_gives_up_after_max_attempts(self):
+        transport = SupervisedTransport(self.adapter, max_attempts=2, sleep=self.sleeps.append)
+        self.adapter.fail_opens = 5
+        self.adapter.drop()
+        with self.assertRaises(NPBTransportError):
+            transport.send(Message(arbitration_id=0x000C0103, is_extended_id=True, data=b'\x60\x00'))
+
+    def test_pending_read_is_replayed(self):
+        request = Message(arbitration_id=0x000C0103, is_extended_id=True, data=b'\x60\x00')
+        self.charger.silent = True
+        self.transport.send(request)
+        # Reply would have come, but the adapter went away
+        self.charger.silent = False
+        self.adapter.drop()
+
+        reply = self.transport.recv(0.1)
+        self.assertEqual(reply.data, bytearray(b'\x60\x00\x60\x09'))
+
+    def test_answered_read_is_not_replayed(self):
+        service = NPB1700Service(self.driver)
+        self.assertAlmostEqual(service.get_voltage_current(), 24.0)
+        self.adapter.drop()
+        self.assertAlmostEqual(service.get_constant_current_curve(), 20.0)
+        self.assertAlmostEqual(service.get_voltage_current(), 24.0)
+
+    def test_link_drop_between_request_and_reply(self):
+        service = NPB1700Service(self.driver)
+        self.assertAlmostEqual(service.get_voltage_current(), 24.0)
+        drops = [NPB1700Commands.CURVE_CC]
+
+        def drop_before_reply(msg):
+            if drops and bytes(msg.data) == bytes(drops[0].value):
+                drops.pop()
+                self.adapter.drop()
+            return self.charger(msg)
+        self.bus.detach(self.charger)
+        self.bus.attach(drop_before_reply)
+
+        self.assertAlmostEqual(service.get_constant_current_curve(), 20.0)
+        self.assertEqual(self.transport.reconnects, 1)
+        # Only the unanswered request went out again
+        self.assertEqual([bytes(msg.data) for msg in self.charger.requests],
+                         [b'\x60\x00', b'\xb0\x00', b'\xb0\x00'])
+        self.assertAlmostEqual(service.get_voltage_current(), 24.0)
+
+    def test_warm_restore_keeps_settings(self):
+        service = NPB1700Service(self.driver)
+        mirror = RegisterMirror(service, commands=[NPB1700Commands.READ_VOUT, NPB1700Commands.CURVE_CC])
+        mirror.refresh()
+        self.transport.subscribe(mirror.invalidate_volatile)
+        self.assertEqual(mirror.due(), [])
+
+        self.adapter.drop()
+        self.driver.read(NPB1700Commands.CURVE_CC)
+
+        self.assertEqual(mirror.due(), [NPB1700Commands.READ_VOUT])
+        self.assertAlmostEqual(mirror.get(NPB1700Commands.CURVE_CC), 20.0)
+
+    def test_filters_restored_after_reconnect(self):
+        self.adapter.drop()
+        self.driver.read(NPB1700Commands.READ_VOUT)
+        self.assertEqual(self.adapter.opened[-1].filters[0]["can_id"], 0x000C0003)
+
+    def test_shutdown_stops_reconnecting(self):
+        self.transport.shutdown()
+        with self.assertRaises(NPBTransportError):
+            self.driver.read(NPB1700Commands.READ_VOUT)
+
+
+class TestBusOff(unittest.TestCase):
+
+    def test_bus_off_error_frame_raises(self):
+        transport = PythonCanTransport('virtual', 'bus_off_test', 250000)
+        peer = can.Bus(interface='virtual', channel='bus_off_test')
+        try:
+            peer.send(Message(arbitration_id=0x40, is_error_frame=True, is_extended_id=False))
+            with self.assertRaises(NPBTransportError):
+                transport.recv(0.1)
+        finally:
+            peer.shutdown()
+            transport.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
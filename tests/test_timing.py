@@ -0,0 +1,86 @@
+import unittest
+
+from npbcharger.commands import NPB1700Commands
+from npbcharger.driver import NPB1700
+from npbcharger.services import NPB1700Service
+from npbcharger.timing import ClockAligner, Reading
+from npbcharger.transports import ChargerSimulator, LoopbackBus
+
+from fakes import FakeDriver
+
+
+def word(value: int) -> bytearray:
+    return bytearray(value.to_bytes(2, byteorder='little'))
+
+
+class TestClockAligner(unittest.TestCase):
+
+    def test_minimum_offset_excludes_latency(self):
+        aligner = ClockAligner()
+        self.assertIsNone(aligner.offset)
+        # Adapter clock is 1000 s behind host, frames wait 0.2..2 ms in queues
+        for index, delay in enumerate([0.002, 0.0002, 0.001]):
+            aligner.observe(5.0 + index, 1005.0 + index + delay)
+        self.assertAlmostEqual(aligner.offset, 1000.0002)
+        self.assertAlmostEqual(aligner.to_host(7.5), 1007.5002)
+
+    def test_window_follows_drift(self):
+        aligner = ClockAligner(window=4)
+        for index in range(10):
+            # Host clock runs 1 ms per frame faster
+            aligner.observe(float(index), index + 100 + index * 0.001)
+        self.assertAlmostEqual(aligner.offset, 100.006)
+
+    def test_jump_restarts_estimate(self):
+        aligner = ClockAligner()
+        aligner.observe(10.0, 20.0)
+        aligner.observe(0.5, 21.0)
+        self.assertAlmostEqual(aligner.offset, 20.5)
+
+    def test_to_host_needs_frames(self):
+        with self.assertRaises(ValueError):
+            ClockAligner().to_host(1.0)
+
+
+class TestTimedReadings(unittest.TestCase):
+
+    def test_getter_with_timestamp(self):
+        driver = FakeDriver()
+        driver.set_word(NPB1700Commands.READ_VOUT, 2400)
+        service = NPB1700Service(driver)
+        self.assertEqual(service.get_voltage_current(), 24.0)
+
+        reading = service.get_voltage_current(with_timestamp=True)
+        self.assertIsInstance(reading, Reading)
+        self.assertEqual(reading.value, 24.0)
+        self.assertAlmostEqual(reading.latency, 0.001)
+        self.assertAlmostEqual(reading.received_at, 0.04)
+
+    def test_status_and_fixed_with_timestamp(self):
+        driver = FakeDriver()
+        driver.set_word(NPB1700Commands.READ_IOUT, 1234)
+        service = NPB1700Service(driver)
+        self.assertEqual(service.read_fixed(NPB1700Commands.READ_IOUT, with_timestamp=True).value, 1234)
+        status = service.get_fault_status(with_timestamp=True)
+        self.assertGreater(status.received_at, status.sent_at)
+        self.assertIn("raw_value", status.value)
+
+    def test_driver_stamps_exchange(self):
+        bus = LoopbackBus()
+        bus.attach(ChargerSimulator(0x03, {NPB1700Commands.READ_VOUT: word(2400)}))
+        with NPB1700(transport=bus.endpoint()) as driver:
+            reading = NPB1700Service(driver).get_voltage_current(with_timestamp=True)
+        self.assertEqual(reading.value, 24.0)
+        self.assertGreater(reading.sent_at, 0)
+        self.assertGreaterEqual(reading.latency, 0)
+
+    def test_driver_aligns_adapter_timestamps(self):
+        bus = LoopbackBus()
+        with NPB1700(transport=bus.endpoint()) as driver:
+            driver.clock_aligner.observe(50.0, 1050.0)
+            reply = driver._message_type(timestamp=51.0, arbitration_id=0x000C0003, is_extended_id=True)
+            self.assertAlmostEqual(driver.received_at(reply), 1051.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,354 @@
+import errno
+import gc
+import os
+import socket
+import time
+import unittest
+import weakref
+from unittest import mock
+from can import Message
+
+from npbcharger.commands import NPB1700Commands
+from npbcharger.driver import NPB1700
+from npbcharger.exceptions import NPBCommunicationError, NPBTransportError
+from npbcharger.services import NPB1700Service
+from npbcharger.transports import (AcceptanceFilter, ChargerSimulator, LoopbackBus, SlcanTransport,
+                                   SocketCanTransport, reply_filters)
+from npbcharger.transports.slcan import decode_frame, encode_frame
+from npbcharger.transports.socketcan import (CAN_EFF_FLAG, CAN_ERR_BUSOFF, CAN_ERR_FLAG, CAN_FILTER, CAN_FRAME,
+                                             CAN_RAW_ERR_FILTER, SO_TIMESTAMP, TIMEVAL, pack_filters, pack_frame,
+                                             unpack_frame)
+
+# Virtual SocketCAN interface for tests: ip link add dev vcan0 type vcan && ip link set up vcan0
+VCAN_CHANNEL = "vcan0"
+
+
+def word(value: int) -> bytearray:
+    return bytearray(value.to_bytes(2, byteorder='little'))
+
+
+class TestLoopback(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = LoopbackBus()
+        self.charger = ChargerSimulator(0x03, {NPB1700Commands.READ_VOUT: word(2400)})
+        self.bus.attach(self.charger)
+        self.transport = self.bus.endpoint()
+        self.driver = NPB1700(transport=self.transport, device_id=0x000C0103)
+
+    def test_endpoints_see_each_other(self):
+        other = self.bus.endpoint()
+        self.transport.send(Message(arbitration_id=0x123, data=b'\x01'))
+        self.assertEqual(other.recv(0).data, bytearray(b'\x01'))
+        # Sender does not receive own frame
+        self.assertIsNone(self.transport.recv(0))
+
+    def test_service_over_simulator(self):
+        service = NPB1700Service(self.driver)
+        self.assertAlmostEqual(service.get_voltage_current(), 24.0)
+        service.set_constant_current_curve(25.0)
+        self.assertEqual(self.charger.registers[NPB1700Commands.CURVE_CC], word(2500))
+
+    def test_missing_reply_raises(self):
+        self.charger.silent = True
+        with self.assertRaises(NPBCommunicationError):
+            self.driver.read(NPB1700Commands.READ_VOUT)
+
+    def test_burst_write_checks_every_frame(self):
+        failed = Message(error_state_indicator=True)
+        with mock.patch.object(self.driver, "spin", return_value=failed) as spin:
+            with self.assertRaises(NPBCommunicationError):
+                self.driver.write_burst([(NPB1700Commands.CURVE_CC, word(2500)),
+                                         (NPB1700Commands.CURVE_CV, word(2800))])
+        # Stopped at the failed frame
+        self.assertEqual(spin.call_count, 1)
+
+    def test_injected_transport_not_shut_down(self):
+        with self.driver:
+            pass
+        self.assertFalse(self.transport.closed)
+        self.transport.shutdown()
+        with self.assertRaises(NPBTransportError):
+            self.driver.read(NPB1700Commands.READ_VOUT)
+
+
+class TestAcceptanceFilter(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = LoopbackBus()
+        for address in (3, 4):
+            self.bus.attach(ChargerSimulator(address, {NPB1700Commands.READ_VOUT: word(2400 + address)}))
+        self.transport = self.bus.endpoint()
+        self.driver = NPB1700(transport=self.transport, device_id=0x000C0103)
+
+    def test_reply_filters(self):
+        self.assertIsNone(reply_filters([]))
+        self.assertEqual(reply_filters([0x000C0003]),
+                         [{"can_id": 0x000C0003, "can_mask": 0x1FFFFFFF, "extended": True}])
+        # Too many devices collapse into one NPB reply pattern
+        self.assertEqual(reply_filters(range(0x000C0000, 0x000C0010), max_filters=8),
+                         [{"can_id": 0x000C0000, "can_mask": 0x1FFFFF00, "extended": True}])
+
+    def test_driver_installs_own_reply_id(self):
+        self.assertEqual(self.transport.filters[0]["can_id"], 0x000C0003)
+        other = self.bus.endpoint()
+        other.send(Message(arbitration_id=0x000C0004, is_extended_id=True, data=b'\x60\x00\x00\x00'))
+        other.send(Message(arbitration_id=0x123, data=b'\x01'))
+        self.assertEqual(self.transport.dropped, 2)
+        self.assertAlmostEqual(NPB1700Service(self.driver).get_voltage_current(), 24.03)
+
+    def test_siblings_add_and_remove_ids(self):
+        sibling = self.driver.sibling(0x000C0104)
+        self.assertEqual(self.driver.acceptance_filter.reply_ids, [0x000C0003, 0x000C0004])
+        self.assertEqual(sibling.read(NPB1700Commands.READ_VOUT).data[2:4], word(2404))
+
+        with sibling:
+            pass
+        self.assertEqual(self.driver.acceptance_filter.reply_ids, [0x000C0003])
+        # Broadcast drivers don't read
+        self.driver.sibling(0x000C01FF)
+        self.assertEqual(self.driver.acceptance_filter.reply_ids, [0x000C0003])
+
+    def test_shared_between_drivers_of_transport(self):
+        second = NPB1700(transport=self.transport, device_id=0x000C0104)
+        self.assertIs(second.acceptance_filter, AcceptanceFilter.for_transport(self.transport))
+        self.assertEqual(len(self.transport.filters), 2)
+
+    def test_transport_not_kept_alive(self):
+        transport = self.bus.endpoint()
+        with NPB1700(transport=transport, device_id=0x000C0103):
+            pass
+        transport.shutdown()
+        alive = weakref.ref(transport)
+        del transport
+        gc.collect()
+        # Its shared filter went with it
+        self.assertIsNone(alive())
+
+    def test_fleet_read_accepts_its_devices(self):
+        replies = self.driver.read_fleet([0x000C0103, 0x000C0104], [NPB1700Commands.READ_VOUT], period=0)
+        self.assertEqual(replies[0x000C0104][NPB1700Commands.READ_VOUT].data[2:4], word(2404))
+        self.assertEqual(self.driver.acceptance_filter.reply_ids, [0x000C0003])
+
+
+class TestDriverInit(unittest.TestCase):
+
+    def test_failed_bus_raises(self):
+        with self.assertRaises(NPBTransportError):
+            NPB1700(channel="none", interface="no_such_interface")
+
+
+class FakeSerial:
+    """Serial port with scripted input"""
+
+    def __init__(self, incoming: bytes = b""):
+        self.incoming = bytearray(incoming)
+        self.written = bytearray()
+        self.closed = False
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self.incoming)
+
+    def read(self, size: int = 1) -> bytes:
+        chunk = bytes(self.incoming[:size])
+        del self.incoming[:size]
+        return chunk
+
+    def write(self, data: bytes) -> int:
+        self.written += data
+        return len(data)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class TestSlcan(unittest.TestCase):
+
+    def test_encode_extended(self):
+        msg = Message(arbitration_id=0x000C0103, is_extended_id=True, data=b'\x60\x00')
+        self.assertEqual(encode_frame(msg), b"T000C010326000\r")
+
+    def test_decode(self):
+        msg = decode_frame(b"T000C0003460006009")
+        self.assertEqual(msg.arbitration_id, 0x000C0003)
+        self.assertTrue(msg.is_extended_id)
+        self.assertEqual(msg.data, bytearray(b'\x60\x00\x60\x09'))
+        self.assertIsNone(decode_frame(b"z"))
+        self.assertIsNone(decode_frame(b"T000C00034600"))
+
+    def test_transport_open_send_recv(self):
+        port = FakeSerial(b"z\r\x07T000C0003460006009\rT000C00042")
+        transport = SlcanTransport(serial_port=port)
+        self.assertTrue(port.written.endswith(b"S5\rO\r"))
+
+        transport.send(Message(arbitration_id=0x000C0103, is_extended_id=True, data=b'\x60\x00'))
+        self.assertTrue(port.written.endswith(b"T000C010326000\r"))
+
+        self.assertEqual(transport.recv(0.01).arbitration_id, 0x000C0003)
+        # Partial line stays buffered
+        self.assertIsNone(transport.recv(0.01))
+        port.incoming += b"4000\r"
+        self.assertEqual(transport.recv(0.01).data, bytearray(b'\x40\x00'))
+
+        transport.shutdown()
+        self.assertTrue(port.closed)
+        self.assertTrue(port.written.endswith(b"C\r"))
+
+    def test_nonblocking_recv_reads_port(self):
+        port = FakeSerial()
+        transport = SlcanTransport(serial_port=port)
+        port.incoming += b"T000C0003460006009\r"
+        self.assertEqual(transport.recv(0).arbitration_id, 0x000C0003)
+        self.assertIsNone(transport.recv(0))
+
+    def test_rejected_transmit_raises(self):
+        # Setup replies, rejected C of a closed channel among them
+        port = FakeSerial(b"\r\r\r\x07\r\r")
+        transport = SlcanTransport(serial_port=port)
+        msg = Message(arbitration_id=0x000C0103, is_extended_id=True, data=b'\x60\x00')
+        transport.send(msg)
+        transport.send(msg)
+        port.incoming += b"Z\r\x07"
+        with self.assertRaises(NPBTransportError):
+            transport.recv(0)
+        self.assertIsNone(transport.recv(0))
+
+    def test_unsupported_bitrate(self):
+        with self.assertRaises(ValueError):
+            SlcanTransport(serial_port=FakeSerial(), bitrate=33333)
+
+
+class TestSocketCanFrames(unittest.TestCase):
+
+    def test_frame_round_trip(self):
+        msg = Message(arbitration_id=0x000C0103, is_extended_id=True, data=b'\x60\x00')
+        frame = pack_frame(msg)
+        self.assertEqual(len(frame), 16)
+        self.assertEqual(CAN_FRAME.unpack(frame), (0x000C0103 | CAN_EFF_FLAG, 2, b'\x60\x00' + bytes(6)))
+        decoded = unpack_frame(frame, 12.5, "vcan0")
+        self.assertEqual(decoded.arbitration_id, 0x000C0103)
+        self.assertTrue(decoded.is_extended_id)
+        self.assertEqual(decoded.data, bytearray(b'\x60\x00'))
+        self.assertEqual(decoded.timestamp, 12.5)
+
+    def test_filters(self):
+        packed = pack_filters(reply_filters([0x000C0003]))
+        self.assertEqual(CAN_FILTER.unpack(packed), (0x000C0003 | CAN_EFF_FLAG, 0x1FFFFFFF | CAN_EFF_FLAG))
+        # No filters accept everything
+        self.assertEqual(CAN_FILTER.unpack(pack_filters(None)), (0, 0))
+
+
+class FakeCanSocket:
+    """Raw CAN socket stand-in, selectors wait on a pipe"""
+
+    def __init__(self, family, kind, protocol):
+        self.options = []
+        self.bound = None
+        self.blocking = True
+        self.frames = []
+        self.send_error = None
+        self.sent = []
+        self._pipe = os.pipe()
+
+    def setsockopt(self, level, option, value):
+        self.options.append((level, option, value))
+
+    def bind(self, address):
+        self.bound = address
+
+    def setblocking(self, flag):
+        self.blocking = flag
+
+    def fileno(self):
+        return self._pipe[0]
+
+    def send(self, frame):
+        if self.send_error is not None:
+            raise self.send_error
+        self.sent.append(frame)
+
+    def recvmsg(self, size, ancillary_size):
+        if not self.frames:
+            raise BlockingIOError
+        return self.frames.pop(0), [(socket.SOL_SOCKET, SO_TIMESTAMP, TIMEVAL.pack(100, 500000))], 0, None
+
+    def close(self):
+        for end in self._pipe:
+            os.close(end)
+
+
+@unittest.skipUnless(hasattr(socket, "AF_CAN"), "SocketCAN is not available on this platform")
+class TestSocketCanMockedSocket(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch("npbcharger.transports.socketcan.socket.socket", FakeCanSocket)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.transport = SocketCanTransport("vcan0")
+        self.addCleanup(self.transport.shutdown)
+        self.socket = self.transport._socket
+
+    def test_construction(self):
+        self.assertIn((socket.SOL_CAN_RAW, CAN_RAW_ERR_FILTER, CAN_ERR_BUSOFF.to_bytes(4, 'little')),
+                      self.socket.options)
+        self.assertIn((socket.SOL_SOCKET, SO_TIMESTAMP, 1), self.socket.options)
+        self.assertEqual(self.socket.bound, ("vcan0",))
+        self.assertFalse(self.socket.blocking)
+
+    def test_recv_and_bus_off(self):
+        self.socket.frames.append(pack_frame(Message(arbitration_id=0x000C0003, is_extended_id=True,
+                                                     data=b'\x60\x00\x60\x09')))
+        msg = self.transport.recv(0)
+        self.assertEqual(msg.data, bytearray(b'\x60\x00\x60\x09'))
+        self.assertEqual(msg.timestamp, 100.5)
+
+        self.socket.frames.append(CAN_FRAME.pack(CAN_ERR_FLAG | CAN_ERR_BUSOFF, 8, bytes(8)))
+        with self.assertRaises(NPBTransportError):
+            self.transport.recv(0)
+
+    def test_send_gives_up_on_full_queue(self):
+        msg = Message(arbitration_id=0x000C0103, is_extended_id=True, data=b'\x60\x00')
+        self.transport.send(msg)
+        self.assertEqual(self.socket.sent, [pack_frame(msg)])
+        self.transport.send_timeout = 0.02
+        for error in (BlockingIOError(), OSError(errno.ENOBUFS, "No buffer space available")):
+            self.socket.send_error = error
+            started = time.monotonic()
+            with self.assertRaises(NPBTransportError):
+                self.transport.send(msg)
+            self.assertLess(time.monotonic() - started, 1.0)
+
+
+@unittest.skipUnless(os.path.exists(f"/sys/class/net/{VCAN_CHANNEL}"), f"{VCAN_CHANNEL} is not available")
+class TestSocketCanVcan(unittest.TestCase):
+
+    def setUp(self):
+        self.charger = SocketCanTransport(VCAN_CHANNEL)
+        self.controller = SocketCanTransport(VCAN_CHANNEL)
+
+    def tearDown(self):
+        self.charger.shutdown()
+        self.controller.shutdown()
+
+    def test_send_recv_batch(self):
+        for address in range(4):
+            self.charger.send(Message(arbitration_id=0x000C0000 | address, is_extended_id=True,
+                                      data=b'\x60\x00\x60\x09'))
+        first = self.controller.recv(0.1)
+        self.assertEqual(first.arbitration_id, 0x000C0000)
+        self.assertGreater(first.timestamp, 0)
+        rest = self.controller.recv_batch(0.1)
+        self.assertEqual([msg.arbitration_id for msg in rest], [0x000C0001, 0x000C0002, 0x000C0003])
+        self.assertIsNone(self.controller.recv(0.01))
+
+    def test_kernel_filters(self):
+        self.controller.set_filters(reply_filters([0x000C0003]))
+        self.charger.send(Message(arbitration_id=0x000C0004, is_extended_id=True, data=b'\x60\x00'))
+        self.charger.send(Message(arbitration_id=0x000C0003, is_extended_id=True, data=b'\x60\x00'))
+        self.assertEqual(self.controller.recv(0.1).arbitration_id, 0x000C0003)
+        self.assertIsNone(self.controller.recv(0.01))
+
+
+if __name__ == '__main__':
+    unittest.main()